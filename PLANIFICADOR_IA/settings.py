@@ -98,6 +98,28 @@ DATABASES = {
     }
 }
 
+# -----------------------------------------------------------------------------
+# CACHÉ
+# -----------------------------------------------------------------------------
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Sugerencias del optimizador por usuario (ver planner/suggestion_cache.py)
+    'optimizer': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'planner-optimizer',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    # Rejilla semanal renderizada de calendar_view (ver planner/calendar_cache.py); la versión
+    # de cada semana sale de la base de datos, así que puede ser local a cada proceso
+    'calendar': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'planner-calendar',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
 # -----------------------------------------------------------------------------
 # VALIDACIÓN DE CONTRASEÑAS
 # -----------------------------------------------------------------------------
@@ -188,6 +210,20 @@ SITE_URL = 'http://localhost:8000'
 DEFAULT_CHARSET = 'utf-8'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Optimizador de horarios: usar la tabla de probabilidades precalculada (modo compilado)
+SMART_SCHEDULER_COMPILED = os.getenv('SMART_SCHEDULER_COMPILED', 'True').lower() == 'true'
+# Granularidad en minutos de los inicios que propone el optimizador (15, 30 o 60)
+SMART_SCHEDULER_SLOT_MINUTES = int(os.getenv('SMART_SCHEDULER_SLOT_MINUTES', '30'))
+# Actualizar el modelo con las respuestas a las sugerencias después de cada lote guardado
+SMART_SCHEDULER_FEEDBACK_AUTO_UPDATE = os.getenv('SMART_SCHEDULER_FEEDBACK_AUTO_UPDATE', 'True').lower() == 'true'
+# Modelos por usuario (train_scheduler --per-user) y memoria máxima de su caché LRU por proceso
+SMART_SCHEDULER_USER_MODELS = os.getenv('SMART_SCHEDULER_USER_MODELS', 'True').lower() == 'true'
+SMART_SCHEDULER_USER_MODEL_CACHE_MB = int(os.getenv('SMART_SCHEDULER_USER_MODEL_CACHE_MB', '64'))
+# Peso de la productividad estimada (planner/ml/productividad_model.pkl) en el score; 0 la desactiva
+SMART_SCHEDULER_PRODUCTIVITY_WEIGHT = float(os.getenv('SMART_SCHEDULER_PRODUCTIVITY_WEIGHT', '0'))
+# Hilos por proceso para las optimizaciones en segundo plano (/planner/optimize/ con async)
+OPTIMIZATION_JOB_WORKERS = int(os.getenv('OPTIMIZATION_JOB_WORKERS', '2'))
+
 MESSAGE_TAGS = {
     messages.DEBUG: 'debug',
     messages.INFO: 'info',
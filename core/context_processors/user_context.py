@@ -3,6 +3,7 @@ from core.models import UserProfile
 import unicodedata
 from datetime import date
 from planner.models import BloqueEstudio, Event
+from planner.date_windows import date_window
 
 def normalize_text(text):
     """Normaliza el texto para manejar correctamente caracteres especiales"""
@@ -83,7 +84,7 @@ def get_productividad_hoy(usuario):
     # Obtener eventos completados hoy
     eventos = Event.objects.filter(
         user=usuario,
-        start_time__date=hoy,
+        **date_window(hoy),
         is_completed=True,
         event_type__in=['tarea', 'clase']
     )
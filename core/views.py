@@ -25,6 +25,8 @@ from django.utils import timezone
 def home(request):
     from planner.models import Event, BloqueEstudio
     from planner.views import get_productividad_hoy
+    from planner.date_windows import date_window, day_bounds
+    from planner.recurrence import window_events
     from datetime import timedelta
     
     # Obtener zona horaria del usuario
@@ -36,24 +38,22 @@ def home(request):
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=6)
     
-    # Filtrar eventos del usuario para la semana actual
-    user_events = Event.objects.filter(
-        user=request.user,
-        start_time__date__gte=start_of_week,
-        start_time__date__lte=end_of_week
-    ).order_by('start_time')
+    # Filtrar eventos del usuario para la semana actual (con las ocurrencias de sus series)
+    user_events = list(window_events(
+        Event.objects.filter(user=request.user), *day_bounds(start_of_week, end_of_week)
+    ))
     
     # Separar tareas por estado
-    pending_tasks = user_events.filter(is_completed=False)
-    completed_tasks = user_events.filter(is_completed=True)
-    in_progress_tasks = pending_tasks.filter(start_time__lte=now, end_time__gte=now)
+    pending_tasks = [event for event in user_events if not event.is_completed]
+    completed_tasks = [event for event in user_events if event.is_completed]
+    in_progress_tasks = [event for event in pending_tasks if event.start_time <= now <= event.end_time]
     
     # Obtener próximas entregas (tareas futuras no completadas)
-    upcoming_tasks = Event.objects.filter(
-        user=request.user,
-        start_time__gte=now,  # Solo tareas futuras
-        is_completed=False    # Solo tareas no completadas
-    ).order_by('start_time')[:5]  # Limitar a las próximas 5 tareas
+    upcoming_tasks = window_events(
+        Event.objects.filter(user=request.user, is_completed=False),  # Solo tareas no completadas
+        now,  # Solo tareas futuras
+        limit=5  # Limitar a las próximas 5 tareas
+    )
     
     # Organizar eventos por día de la semana para la vista semanal
     week_events = {i: [] for i in range(7)}  # 0=Lunes, 6=Domingo
@@ -156,7 +156,7 @@ def home(request):
     # Obtener eventos completados para la semana
     eventos_completados = Event.objects.filter(
         user=request.user,
-        start_time__date__range=(week_start, week_start + timedelta(days=6)),
+        **date_window(week_start, week_start + timedelta(days=6)),
         is_completed=True,
         event_type__in=['tarea', 'clase']
     )
@@ -229,9 +229,9 @@ def home(request):
         'pending_tasks': pending_tasks,
         'completed_tasks': completed_tasks,
         'in_progress_tasks': in_progress_tasks,
-        'pending_count': pending_tasks.count(),
-        'completed_count': completed_tasks.count(),
-        'in_progress_count': in_progress_tasks.count(),
+        'pending_count': len(pending_tasks),
+        'completed_count': len(completed_tasks),
+        'in_progress_count': len(in_progress_tasks),
         'upcoming_tasks': upcoming_tasks_data,
         'week_days_data': week_days_data,
         'extract_subject': extract_subject_from_title,
@@ -770,6 +770,8 @@ def get_current_datetime(request):
 def weekly_view(request):
     """Vista para mostrar la vista semanal completa"""
     from planner.models import Event
+    from planner.date_windows import day_bounds
+    from planner.recurrence import window_events
     from datetime import timedelta
     
     # Obtener datos de la semana actual
@@ -790,11 +792,7 @@ def weekly_view(request):
     
     # Obtener eventos de la semana
     end_of_week = start_of_week + timedelta(days=6)
-    events = Event.objects.filter(
-        user=request.user,
-        start_time__date__gte=start_of_week,
-        start_time__date__lte=end_of_week
-    ).order_by('start_time')
+    events = window_events(Event.objects.filter(user=request.user), *day_bounds(start_of_week, end_of_week))
     
     # Formatear eventos para el template
     formatted_events = []
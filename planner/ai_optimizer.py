@@ -1,55 +1,60 @@
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import GradientBoostingClassifier
-import joblib
-import os
-import json
-from django.conf import settings
+from django.utils import timezone
+from planner.model_registry import get_model_registry, DEFAULT_MODEL_PATH
+from planner.availability import BusyIntervalIndex
+from planner.candidate_slots import CandidateSlots
+from planner.schedule_solver import solve_schedule
+from planner.user_models import DEFAULT_FOCUS_HOURS, get_user_artifacts
+from planner.productivity import productivity_weight, score_slots
+from planner.scheduler_training import EVENT_TYPES, PRIORITIES
 
 class SmartScheduleOptimizer:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, user_id=None):
         if model_path is None:
-            model_path = os.path.join(os.path.dirname(__file__), 'trained_models')
+            model_path = DEFAULT_MODEL_PATH
         
         self.model_path = model_path
+        self.user_id = user_id
+        self.personalized = False
+        self.focus_hours = DEFAULT_FOCUS_HOURS
         self.model = None
         self.encoders = None
         self.scaler = None
+        self.lookup = None
+        self.preprocessor = None
         self.metadata = None
+        self.model_version = None
         self.is_loaded = False
         
         self.load_model()
     
     def load_model(self):
+        """
+        Obtiene los artefactos del registro del proceso (se cargan del disco una sola vez).
+        Si el usuario tiene un modelo propio (ver planner.user_models) se usa ese.
+        """
         try:
-            model_file = os.path.join(self.model_path, 'smart_scheduler_model.joblib')
-            encoders_file = os.path.join(self.model_path, 'smart_scheduler_encoders.joblib')
-            scaler_file = os.path.join(self.model_path, 'smart_scheduler_scaler.joblib')
-            metadata_file = os.path.join(self.model_path, 'smart_scheduler_metadata.json')
-            
-            if all(os.path.exists(f) for f in [model_file, encoders_file, scaler_file]):
-                self.model = joblib.load(model_file)
-                self.encoders = joblib.load(encoders_file)
-                self.scaler = joblib.load(scaler_file)
-                
-                # Cargar metadatos si existe
-                if os.path.exists(metadata_file):
-                    with open(metadata_file, 'r') as f:
-                        self.metadata = json.load(f)
-                
-                self.is_loaded = True
-                print(f"✅ Modelo cargado exitosamente desde {self.model_path}")
-                
-                if self.metadata:
-                    print(f"📊 Versión del modelo: {self.metadata.get('version', 'N/A')}")
-                    print(f"📅 Entrenado el: {self.metadata.get('trained_date', 'N/A')}")
-                
-            else:
-                print(f"❌ No se encontraron todos los archivos del modelo en {self.model_path}")
+            artifacts = None
+            if self.model_path == DEFAULT_MODEL_PATH:
+                artifacts = get_user_artifacts(self.user_id)
+            self.personalized = artifacts is not None
+            if artifacts is None:
+                artifacts = get_model_registry(self.model_path).get()
+            if artifacts is None:
                 self.is_loaded = False
-                
+                return
+
+            self.model = artifacts.model
+            self.encoders = artifacts.encoders
+            self.scaler = artifacts.scaler
+            self.lookup = artifacts.lookup
+            self.preprocessor = artifacts.preprocessor
+            self.metadata = artifacts.metadata
+            self.model_version = artifacts.version
+            self.focus_hours = artifacts.metadata.get('focus_hours') or DEFAULT_FOCUS_HOURS
+            self.is_loaded = True
+
         except Exception as e:
             print(f"❌ Error al cargar el modelo: {str(e)}")
             self.is_loaded = False
@@ -60,12 +65,10 @@ class SmartScheduleOptimizer:
             if field not in event_data:
                 raise ValueError(f"Campo requerido faltante: {field}")
         
-        valid_event_types = ["tarea", "clase", "examen", "proyecto", "estudio", "descanso", "personal", "otro"]
-        if event_data['event_type'] not in valid_event_types:
+        if event_data['event_type'] not in EVENT_TYPES:
             raise ValueError(f"Tipo de evento no válido: {event_data['event_type']}")
         
-        valid_priorities = ["alta", "media", "baja"]
-        if event_data['priority'] not in valid_priorities:
+        if event_data['priority'] not in PRIORITIES:
             raise ValueError(f"Prioridad no válida: {event_data['priority']}")
         
         return True
@@ -98,6 +101,11 @@ class SmartScheduleOptimizer:
     def transform_data(self, df):
         if not self.is_loaded:
             raise ValueError("El modelo no está cargado. Verifica los archivos del modelo.")
+
+        if self.preprocessor is not None:
+            import pandas as pd
+            columns = {name: df[name].to_numpy() for name in df.columns}
+            return pd.DataFrame(self.preprocessor.transform(columns), columns=self.preprocessor.features)
         
         df = df.copy()
         
@@ -110,92 +118,272 @@ class SmartScheduleOptimizer:
         return df[['start_hour', 'duration', 'event_type_encoded',
                  'priority_encoded', 'weekday', 'days_to_deadline']]
 
+    def _build_candidates_frame(self, events_data, slots, days_to_deadline):
+        """
+        Construye las características ya transformadas de la matriz eventos x inicios
+        (una fila por cada inicio candidato de cada evento), con las mismas columnas
+        que devuelve transform_data. Tipo y prioridad se codifican una vez por evento.
+
+        Con el motor NumPy devuelve directamente la matriz de NumPy, sin pandas.
+        """
+        n_slots = len(slots)
+        tipos = [e['event_type'] for e in events_data]
+        prioridades = [e['priority'] for e in events_data]
+        start_hour = np.tile(slots.hours, len(events_data))
+        duration = np.repeat(np.array([e['duration'] for e in events_data], dtype=float), n_slots)
+        weekday = np.tile(slots.weekdays, len(events_data))
+
+        if self.preprocessor is not None:
+            pre = self.preprocessor
+            columnas = {
+                'start_hour': pre.scale('start_hour', start_hour),
+                'duration': pre.scale('duration', duration),
+                'event_type_encoded': np.repeat(pre.encode('event_type', tipos), n_slots),
+                'priority_encoded': np.repeat(pre.encode('priority', prioridades), n_slots),
+                'weekday': pre.scale('weekday', weekday),
+                'days_to_deadline': pre.scale('days_to_deadline', days_to_deadline.ravel()),
+            }
+            return np.column_stack([columnas[name] for name in pre.features]).astype(np.float64)
+
+        import pandas as pd
+        event_type = self.encoders['event_type'].transform(tipos)
+        priority = self.encoders['priority'].transform(prioridades)
+
+        numeric = pd.DataFrame({
+            'start_hour': start_hour,
+            'duration': duration,
+            'weekday': weekday,
+            'days_to_deadline': days_to_deadline.ravel(),
+        })
+        scaled = self.scaler.transform(numeric)
+
+        return pd.DataFrame({
+            'start_hour': scaled[:, 0],
+            'duration': scaled[:, 1],
+            'event_type_encoded': np.repeat(event_type, n_slots),
+            'priority_encoded': np.repeat(priority, n_slots),
+            'weekday': scaled[:, 2],
+            'days_to_deadline': scaled[:, 3],
+        })
+
     def predict_best_schedule(self, event_data, user_events=None):
         """Predice el mejor horario para un evento verificando disponibilidad"""
+        return self.predict_many([event_data], user_events)[0]
+
+    def predict_many(self, events_data, user_events=None, slots=None):
+        """
+        Predice el mejor horario para varios eventos con una sola llamada al modelo.
+
+        Cada evento puede incluir 'event_id' para que no se cuente a sí mismo como
+        conflicto al revisar la disponibilidad contra user_events. Devuelve una
+        predicción por evento, en el mismo orden, con sus opciones ordenadas por score.
+        """
+        if not events_data:
+            return []
+
+        slots, probs, scores, disponibles = self.score_matrix(events_data, user_events, slots)
+        return [
+            self._build_prediction(slots, probs[i], scores[i], disponibles[i])
+            for i in range(len(events_data))
+        ]
+
+    def candidate_slots(self, start_date, end_date=None, minutes=None):
+        """Rejilla de inicios candidatos de la ventana (ver planner.candidate_slots)"""
+        return CandidateSlots.window(self._as_date(start_date), self._as_date(end_date or start_date), minutes)
+
+    def score_matrix(self, events_data, user_events=None, slots=None):
+        """
+        Calcula las matrices eventos x inicios candidatos (probabilidad, score y
+        disponibilidad) con una sola llamada al modelo. Devuelve
+        (slots, probs, scores, disponibles).
+
+        Sin `slots` se evalúan las horas del día indicado en 'start_date' del primer
+        evento. El día de la semana y los días al vencimiento se toman de cada inicio
+        candidato; los inicios posteriores al vencimiento se marcan como no disponibles.
+        """
         if not self.is_loaded:
             raise ValueError("El modelo no está cargado. Verifica los archivos del modelo.")
 
-        self.validate_event_data(event_data)
+        for event_data in events_data:
+            self.validate_event_data(event_data)
 
-        due_date, days_to_deadline = self.process_due_date(
-            event_data.get('due_date'), 
-            event_data.get('start_date')
-        )
+        if slots is None:
+            slots = self.candidate_slots(events_data[0].get('start_date'), minutes=60)
+        n_eventos, n_slots = len(events_data), len(slots)
+
+        # Días al vencimiento de cada evento desde cada día candidato (999 si no tiene)
+        vencimientos = np.array([
+            self._due_ordinal(e.get('due_date'), e.get('start_date')) for e in events_data
+        ], dtype=float)[:, np.newaxis]
+        con_vencimiento = ~np.isnan(vencimientos)
+        days_to_deadline = np.where(
+            con_vencimiento,
+            np.maximum(0, np.nan_to_num(vencimientos) - slots.ordinals[np.newaxis, :]),
+            999
+        ).astype(np.int64)
+
+        X = self._build_candidates_frame(events_data, slots, days_to_deadline)
+        probs = self._predict_proba(X).reshape(n_eventos, n_slots)
+
+        # Los factores del score se aplican sobre toda la matriz (eventos en filas, inicios en columnas)
+        scores = self._calculate_score(probs, slots.hours[np.newaxis, :], {
+            'event_type': np.array([e['event_type'] for e in events_data])[:, np.newaxis],
+            'priority': np.array([e['priority'] for e in events_data])[:, np.newaxis],
+            'days_to_deadline': days_to_deadline,
+        })
 
-        resultados = []
-        for hora in range(6, 23):  
-            event_test = event_data.copy()
-            event_test['start_hour'] = hora
-            event_test['days_to_deadline'] = days_to_deadline
+        scores = scores * self._productivity_factor(events_data, slots)
 
-            is_available = self._check_time_availability(
-                hora, event_data.get('duration', 1), 
-                event_data.get('start_date'), user_events
+        disponibles = self._availability_matrix(events_data, slots, user_events)
+        disponibles &= ~(con_vencimiento & (slots.ordinals[np.newaxis, :] > vencimientos))
+        scores = np.where(disponibles, scores, scores * 0.1)
+
+        return slots, probs, scores, disponibles
+
+    def assign_schedule(self, events_data, slots, scores, disponibles, current_starts,
+                        user_events=None, **limites):
+        """
+        Elige a lo sumo un inicio nuevo por evento sin que las sugerencias del mismo día
+        se solapen, maximizando la mejora total de score respecto al inicio actual.
+        `current_starts` son los inicios actuales como datetime local sin zona horaria;
+        los que no caen en la rejilla se evalúan a su hora exacta con `user_events`.
+        Devuelve por evento el índice de la columna elegida en `slots` o -1.
+        """
+        indice_actual = slots.index_of(current_starts)
+        en_rango = indice_actual >= 0
+        score_actual = np.zeros(len(scores))
+        score_actual[en_rango] = scores[np.flatnonzero(en_rango), indice_actual[en_rango]]
+        fuera = np.flatnonzero(~en_rango)
+        if len(fuera):
+            score_actual[fuera] = self._score_at(
+                [events_data[i] for i in fuera], [current_starts[i] for i in fuera], user_events
             )
 
-            df_test = pd.DataFrame([event_test])
-            X = self.transform_data(df_test)
+        gains = scores - score_actual[:, np.newaxis]
+        allowed = disponibles & (np.arange(len(slots))[np.newaxis, :] != indice_actual[:, np.newaxis])
+        durations = [e['duration'] for e in events_data]
+        return solve_schedule(gains, allowed, slots.hours, durations, slots.day_index, **limites)
 
-            prob = self.model.predict_proba(X)[0][1]
-            score = self._calculate_score(prob, hora, event_test)
-            
+    def _score_at(self, events_data, moments, user_events=None):
+        """Score de cada evento en su propio inicio (datetime local sin zona horaria)"""
+        slots = CandidateSlots(
+            [m.date() for m in moments],
+            np.arange(len(moments)),
+            [m.hour + m.minute / 60.0 + m.second / 3600.0 for m in moments],
+            None,
+        )
+        # Cada evento se evalúa solo en su columna: la diagonal de la matriz
+        _, _, scores, _ = self.score_matrix(events_data, user_events, slots)
+        return np.diagonal(scores)
 
-            if not is_available:
-                score *= 0.1  
+    def _predict_proba(self, X):
+        """Probabilidad de éxito por fila: tabla compilada si existe, si no el modelo en vivo"""
+        if self.lookup is not None:
+            return self.lookup.predict_proba(X)[:, 1]
+        return self.model.predict_proba(X)[:, 1]
 
-            resultados.append({
-                'hora': hora,
-                'probabilidad': prob,
-                'score': score,
-                'hora_formateada': f"{hora:02d}:00",
-                'disponible': is_available  
-            })
+    def _due_ordinal(self, due_date, start_date):
+        """Fecha de vencimiento como ordinal, o NaN si no tiene"""
+        due, _ = self.process_due_date(due_date, start_date)
+        return due.toordinal() if due else np.nan
 
-        df_result = pd.DataFrame(resultados)
-        mejor = df_result.loc[df_result['score'].idxmax()]
+    def _availability_matrix(self, events_data, slots, user_events):
+        """Matriz booleana eventos x inicios indicando si cada inicio candidato está libre"""
+        disponibles = np.ones((len(events_data), len(slots)), dtype=bool)
+        if not user_events:
+            return disponibles
+
+        # El índice se arma una sola vez y se consulta para todos los inicios de todos los eventos
+        index = user_events if isinstance(user_events, BusyIntervalIndex) else BusyIntervalIndex(user_events)
+        if not index:
+            return disponibles
+
+        return index.free_matrix(
+            slots,
+            [e.get('duration', 1) for e in events_data],
+            exclude_pks=[e.get('event_id') for e in events_data],
+        )
+
+    def _build_prediction(self, slots, probs, scores, disponibles, elegido=None):
+        """
+        Arma el diccionario de resultado a partir de los arreglos de una fila de candidatos.
+        Por defecto el mejor inicio es el de mayor score; `elegido` permite fijar otro.
+        Las opciones listadas son las del día del inicio elegido.
+        """
+        mejor = int(np.argmax(scores)) if elegido is None else int(elegido)
+        del_dia = np.flatnonzero(slots.day_index == slots.day_index[mejor])
+        todas_opciones = [
+            {
+                'hora': float(slots.hours[j]),
+                'fecha': slots.date(j).isoformat(),
+                'probabilidad': float(probs[j]),
+                'score': float(scores[j]),
+                'hora_formateada': slots.label(j),
+                'disponible': bool(disponibles[j])
+            }
+            for j in del_dia
+        ]
 
         return {
-            'mejor_hora': int(mejor['hora']),
-            'mejor_hora_formateada': mejor['hora_formateada'],
-            'probabilidad': float(mejor['probabilidad']),
-            'score': float(mejor['score']),
-            'confianza': self._calculate_confidence(df_result),
-            'disponible': bool(mejor['disponible']),  # ✅ NUEVO
-            'todas_opciones': df_result.to_dict('records')
+            'mejor_hora': float(slots.hours[mejor]),
+            'mejor_hora_formateada': slots.label(mejor),
+            'mejor_inicio': slots.datetime(mejor),
+            'probabilidad': float(probs[mejor]),
+            'score': float(scores[mejor]),
+            'confianza': self._calculate_confidence(scores),
+            'disponible': bool(disponibles[mejor]),
+            'todas_opciones': todas_opciones,
+            'ranking': [float(slots.hours[j]) for j in del_dia[np.argsort(-scores[del_dia], kind='stable')]]
         }
 
     def _calculate_score(self, prob, hora, event):
-        """Calcula el score mejorado con más factores"""
-        score = prob
-        
-        if event['priority'] == 'alta':
-            score *= 1.3
-        elif event['priority'] == 'baja':
-            score *= 0.8
-
-        if event['event_type'] in ['estudio', 'tarea', 'proyecto']:
-            if 9 <= hora <= 11 or 15 <= hora <= 17:  # Horas de mayor concentración
-                score *= 1.3
-            elif hora >= 20:
-                score *= 0.7
-        elif event['event_type'] == 'clase':
-            if 8 <= hora <= 18:  
-                score *= 1.1
-        elif event['event_type'] in ['descanso', 'personal']:
-            if hora >= 18 or hora <= 8: 
-                score *= 1.2
-
-
-        if event.get('days_to_deadline', 999) <= 1:
-            score *= 1.4
-        elif event.get('days_to_deadline', 999) <= 3:
-            score *= 1.2
+        """Calcula el score mejorado con más factores (acepta escalares o arreglos de NumPy)"""
+        score = np.asarray(prob, dtype=float)
+        hora = np.asarray(hora)
+        priority = np.asarray(event['priority'])
+        event_type = np.asarray(event['event_type'])
+        days_to_deadline = np.asarray(event.get('days_to_deadline', 999))
+
+        score = score * np.where(priority == 'alta', 1.3, np.where(priority == 'baja', 0.8, 1.0))
+
+        # Horas de mayor concentración para actividades de estudio (del usuario si tiene modelo propio)
+        es_estudio = np.isin(event_type, ['estudio', 'tarea', 'proyecto'])
+        hora_concentracion = np.zeros(np.shape(hora), dtype=bool)
+        for desde, hasta in self.focus_hours:
+            hora_concentracion = hora_concentracion | ((hora >= desde) & (hora <= hasta))
+        factor_estudio = np.where(hora_concentracion, 1.3, np.where(hora >= 20, 0.7, 1.0))
+
+        es_clase = event_type == 'clase'
+        factor_clase = np.where((hora >= 8) & (hora <= 18), 1.1, 1.0)
+
+        es_descanso = np.isin(event_type, ['descanso', 'personal'])
+        factor_descanso = np.where((hora >= 18) | (hora <= 8), 1.2, 1.0)
+
+        score = score * np.where(es_estudio, factor_estudio,
+                                 np.where(es_clase, factor_clase,
+                                          np.where(es_descanso, factor_descanso, 1.0)))
+
+        score = score * np.where(days_to_deadline <= 1, 1.4, np.where(days_to_deadline <= 3, 1.2, 1.0))
 
         return score
 
-    def _calculate_confidence(self, df_result):
+    def _productivity_factor(self, events_data, slots):
+        """
+        Factor del score según la productividad estimada por el regresor de
+        productividad (una sola predicción para todas las duraciones e inicios).
+        Con settings.SMART_SCHEDULER_PRODUCTIVITY_WEIGHT en 0 no se aplica.
+        """
+        peso = productivity_weight()
+        if not peso:
+            return 1.0
+        productividad = score_slots(slots, [e['duration'] * 60 for e in events_data])
+        if productividad is None:
+            return 1.0
+        # 50 es neutro: por encima sube el score y por debajo lo baja
+        return 1.0 + peso * (productividad / 100.0 - 0.5)
 
-        scores = df_result['score'].values
+    def _calculate_confidence(self, scores):
+        scores = np.asarray(scores, dtype=float)
         max_score = scores.max()
         mean_score = scores.mean()
         
@@ -203,45 +391,50 @@ class SmartScheduleOptimizer:
         return float(confidence)
 
     def optimize_schedule(self, events_queryset, start_date, end_date):
+        """
+        Sugerencias para los eventos de la ventana con el mismo criterio que la vista:
+        solo inicios futuros y asignación global sin solapamientos en un mismo día.
+        """
         if not self.is_loaded:
             raise ValueError("El modelo no está cargado. Verifica los archivos del modelo.")
         
         suggestions = []
+        events = list(events_queryset)
+        if not events:
+            return suggestions
+        events_data = [self.event_to_data(event, start_date) for event in events]
+        # Se busca en todos los días de la ventana, sin proponer inicios que ya pasaron
+        slots = self.candidate_slots(start_date, end_date).after(timezone.localtime().replace(tzinfo=None))
+        if not len(slots):
+            return suggestions
+        slots, probs, scores, disponibles = self.score_matrix(events_data, events, slots)
+        current_starts = [self._local_naive(event.start_time) for event in events]
+        asignacion = self.assign_schedule(
+            events_data, slots, scores, disponibles, current_starts, user_events=events
+        )
         
-        for event in events_queryset:
+        for i, (event, event_data) in enumerate(zip(events, events_data)):
+            if asignacion[i] < 0:
+                continue
             try:
-                event_data = {
-                    'event_type': self._map_django_event_type(event.event_type),
-                    'priority': self._map_django_priority(event.priority),
-                    'duration': self._calculate_duration(event.start_time, event.end_time),
-                    'weekday': event.start_time.weekday(),
-                    'due_date': event.due_date,
-                    'start_date': start_date
-                }
-                
-                
-                prediction = self.predict_best_schedule(event_data)
-                
-                current_date = event.start_time.date()
-                suggested_datetime = datetime.combine(
-                    current_date, 
-                    datetime.min.time().replace(hour=prediction['mejor_hora'])
+                prediction = self._build_prediction(
+                    slots, probs[i], scores[i], disponibles[i], elegido=asignacion[i]
                 )
+                suggested_datetime = prediction['mejor_inicio']
                 suggested_end_datetime = suggested_datetime + timedelta(hours=event_data['duration'])
                 
-                if suggested_datetime.hour != event.start_time.hour:
-                    suggestions.append({
-                        'event_id': event.id,
-                        'title': event.title,
-                        'current_time': event.start_time.isoformat(),
-                        'suggested_time': suggested_datetime.isoformat(),
-                        'suggested_end_time': suggested_end_datetime.isoformat(),
-                        'improvement_score': round((prediction['score'] - 0.5) * 100, 1),
-                        'confianza': prediction['confianza'],
-                        'mejor_hora': prediction['mejor_hora'],
-                        'todas_opciones': prediction['todas_opciones'],
-                        'reason': self._generate_reason(event_data, prediction)
-                    })
+                suggestions.append({
+                    'event_id': event.id,
+                    'title': event.title,
+                    'current_time': event.start_time.isoformat(),
+                    'suggested_time': suggested_datetime.isoformat(),
+                    'suggested_end_time': suggested_end_datetime.isoformat(),
+                    'improvement_score': round((prediction['score'] - 0.5) * 100, 1),
+                    'confianza': prediction['confianza'],
+                    'mejor_hora': prediction['mejor_hora'],
+                    'todas_opciones': prediction['todas_opciones'],
+                    'reason': self._generate_reason(event_data, prediction)
+                })
                     
             except Exception as e:
                 print(f"Error procesando evento {event.id}: {str(e)}")
@@ -249,7 +442,22 @@ class SmartScheduleOptimizer:
         
         return suggestions
 
+    def event_to_data(self, event, start_date):
+        """Convierte un Event de Django en el diccionario de características del optimizador"""
+        return {
+            'event_id': event.pk,
+            'event_type': self._map_django_event_type(event.event_type),
+            'priority': self._map_django_priority(event.priority),
+            'duration': self._calculate_duration(event.start_time, event.end_time),
+            'weekday': event.start_time.weekday(),
+            'due_date': event.due_date,
+            'start_date': start_date
+        }
+
     def _map_django_event_type(self, django_type):
+        # Los valores de Event.event_type ya son los del entrenamiento (igual que en feedback_row)
+        if django_type in EVENT_TYPES:
+            return django_type
         mapping = {
             'task': 'tarea',
             'class': 'clase', 
@@ -263,6 +471,8 @@ class SmartScheduleOptimizer:
         return mapping.get(django_type, 'otro')
 
     def _map_django_priority(self, django_priority):
+        if django_priority in PRIORITIES:
+            return django_priority
         mapping = {
             'high': 'alta',
             'medium': 'media',
@@ -297,34 +507,26 @@ class SmartScheduleOptimizer:
         
         return ". ".join(reasons) if reasons else "Optimización basada en patrones de productividad"
 
+    def _local_naive(self, moment):
+        """Datetime en la zona horaria local y sin tzinfo, como los inicios de la rejilla"""
+        if timezone.is_aware(moment):
+            return timezone.localtime(moment).replace(tzinfo=None)
+        return moment
+
+    def _as_date(self, start_date):
+        if start_date is None:
+            return datetime.now().date()
+        if isinstance(start_date, str):
+            return datetime.strptime(start_date, '%Y-%m-%d').date()
+        if isinstance(start_date, datetime):
+            return start_date.date()
+        return start_date
+
     def _check_time_availability(self, hora, duration, start_date, user_events):
-      
+        """Revisa una sola hora; user_events puede ser una lista de eventos o un BusyIntervalIndex"""
         if not user_events:
             return True
-            
-        from django.utils import timezone
-            
-        if isinstance(start_date, str):
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        elif isinstance(start_date, datetime):
-            start_date = start_date.date()
-            
-        proposed_start = datetime.combine(start_date, datetime.min.time().replace(hour=hora))
-        proposed_end = proposed_start + timedelta(hours=duration)
-        
-        if timezone.is_aware(user_events[0].start_time if user_events else None):
-            proposed_start = timezone.make_aware(proposed_start)
-            proposed_end = timezone.make_aware(proposed_end)
-        
 
-        for event in user_events:
-            if (event.start_time <= proposed_start < event.end_time):
-                return False
-                
-            if (event.start_time < proposed_end <= event.end_time):
-                return False
-                
-            if (proposed_start <= event.start_time and proposed_end >= event.end_time):
-                return False
-        
-        return True
+        index = user_events if isinstance(user_events, BusyIntervalIndex) else BusyIntervalIndex(user_events)
+        starts, ends = index.hour_slots(self._as_date(start_date), [hora], duration)
+        return bool(index.free_mask(starts, ends)[0])
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PlannerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'planner'
+
+    def ready(self):
+        """Importar señales cuando la app esté lista"""
+        import planner.signals  # noqa
@@ -0,0 +1,98 @@
+"""
+Índice de intervalos ocupados de un usuario para revisar disponibilidad en O(log n).
+
+Se construye una sola vez por ejecución del optimizador a partir de los eventos
+del usuario: los inicios y los fines se guardan por separado en arreglos de NumPy
+ordenados (segundos desde epoch). La cantidad de eventos que se cruzan con un
+intervalo propuesto (a, b) es
+
+    #(inicio < b) - #(fin <= a)
+
+y ambos conteos salen de una búsqueda binaria (np.searchsorted), así que se
+pueden consultar todas las horas candidatas de golpe.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+
+class BusyIntervalIndex:
+    def __init__(self, events):
+        events = list(events or [])
+        self.is_aware = bool(events) and timezone.is_aware(events[0].start_time)
+
+        starts = np.array([e.start_time.timestamp() for e in events], dtype=np.float64)
+        ends = np.array([e.end_time.timestamp() for e in events], dtype=np.float64)
+        self.starts = np.sort(starts)
+        self.ends = np.sort(ends)
+        # Intervalo de cada evento para poder excluir al que se está reubicando
+        self.by_pk = {e.pk: (s, f) for e, s, f in zip(events, starts, ends)}
+        self._day_cache = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return len(self.starts) > 0
+
+    def count_overlaps(self, starts, ends, exclude_pk=None):
+        """Cantidad de eventos que se cruzan con cada intervalo (starts[i], ends[i])"""
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        conteo = (np.searchsorted(self.starts, ends, side='left')
+                  - np.searchsorted(self.ends, starts, side='right'))
+
+        if exclude_pk is not None and exclude_pk in self.by_pk:
+            propio_inicio, propio_fin = self.by_pk[exclude_pk]
+            conteo = conteo - ((propio_inicio < ends) & (propio_fin > starts))
+
+        return conteo
+
+    def free_mask(self, starts, ends, exclude_pk=None):
+        """Máscara booleana: True si el intervalo no se cruza con ningún evento"""
+        return self.count_overlaps(starts, ends, exclude_pk) <= 0
+
+    def _to_timestamp(self, naive_dt):
+        if self.is_aware:
+            return timezone.make_aware(naive_dt).timestamp()
+        return naive_dt.timestamp()
+
+    def hour_slots(self, day, horas, duration):
+        """
+        Intervalos (inicio, fin) en segundos para cada hora de inicio del día indicado.
+        Los inicios se calculan una vez por día y se reutilizan entre eventos.
+        """
+        clave = (day, tuple(int(h) for h in horas))
+        starts = self._day_cache.get(clave)
+        if starts is None:
+            starts = np.array([
+                self._to_timestamp(datetime.combine(day, datetime.min.time().replace(hour=int(h))))
+                for h in horas
+            ], dtype=np.float64)
+            self._day_cache[clave] = starts
+        return starts, starts + timedelta(hours=duration).total_seconds()
+
+    def slot_starts(self, slots):
+        """Inicio en segundos de cada columna de una rejilla CandidateSlots"""
+        return np.array([self._to_timestamp(slots.datetime(j)) for j in range(len(slots))], dtype=np.float64)
+
+    def free_matrix(self, slots, durations, exclude_pks=None):
+        """
+        Matriz booleana eventos x columnas: True si el evento (con su duración en horas)
+        cabe en ese inicio sin cruzarse con ningún otro evento del usuario.
+        """
+        starts = self.slot_starts(slots)[np.newaxis, :]
+        ends = starts + np.asarray(durations, dtype=np.float64)[:, np.newaxis] * 3600
+        starts = np.broadcast_to(starts, ends.shape)
+        conteo = (np.searchsorted(self.starts, ends, side='left')
+                  - np.searchsorted(self.ends, starts, side='right'))
+
+        if exclude_pks is not None:
+            # Cada evento no cuenta como conflicto consigo mismo
+            propios = np.array([self.by_pk.get(pk, (np.nan, np.nan)) for pk in exclude_pks],
+                               dtype=np.float64).reshape(-1, 2)
+            propio_inicio, propio_fin = propios[:, :1], propios[:, 1:]
+            conteo = conteo - ((propio_inicio < ends) & (propio_fin > starts))
+
+        return conteo <= 0
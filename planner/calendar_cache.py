@@ -0,0 +1,81 @@
+"""
+Caché de la rejilla semanal renderizada de calendar_view.
+
+La clave del HTML incluye la versión de la semana, calculada en la base de datos
+con una sola consulta: el último updated_at y la cantidad de eventos que pueden
+aparecer en la semana (los que empiezan en ella, las series activas y las
+ocurrencias modificadas), más la última eliminación del usuario (EventTombstone).
+Crear, mover, modificar o eliminar un evento cambia la versión para todos los
+procesos aunque el backend 'calendar' sea local a cada uno (LocMemCache): una
+semana que no cambió se sirve desde la caché sin cargar sus eventos ni renderizar
+la plantilla otra vez, y una que cambió nunca se sirve vieja.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max, Q, Subquery
+
+from .models import Event, EventTombstone
+
+CACHE_ALIAS = 'calendar'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache():
+    alias = CACHE_ALIAS if CACHE_ALIAS in getattr(settings, 'CACHES', {}) else 'default'
+    return caches[alias]
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _window_condition(start, end):
+    """Eventos que pueden aparecer en [start, end) (ver recurrence.window_events)"""
+    normales = Q(recurrence_rule='', start_time__gte=start, start_time__lt=end)
+    series = ~Q(recurrence_rule='') & Q(start_time__lt=end) & (
+        Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=start)
+    )
+    # Una ocurrencia modificada también libera su inicio original
+    reemplazadas = Q(recurrence_id__gte=start, recurrence_id__lt=end)
+    return normales | series | reemplazadas
+
+
+def week_version(user_id, start, end):
+    """Versión de los eventos del usuario en [start, end); cambia con cada cambio que los afecta"""
+    ultima_eliminacion = EventTombstone.objects.filter(user_id=user_id).order_by('-deleted_at').values('deleted_at')[:1]
+    resumen = (
+        Event.objects.filter(Q(user_id=user_id) & _window_condition(start, end))
+        .order_by()
+        .aggregate(
+            ultimo=Max('updated_at'),
+            total=Count('id'),
+            eliminado=Max(Subquery(ultima_eliminacion)),
+        )
+    )
+    valores = [
+        valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+        for valor in (resumen['ultimo'], resumen['total'], resumen['eliminado'])
+    ]
+    return hashlib.sha1('|'.join(valores).encode()).hexdigest()[:16]
+
+
+def _fragment_key(user_id, start_of_week, version, extra):
+    huella = hashlib.sha1('|'.join(str(v) for v in extra).encode()).hexdigest()[:16]
+    return f'planner:calendar:grid:{user_id}:{start_of_week.isoformat()}:{version}:{huella}'
+
+
+def week_fragment_key(user_id, start_of_week, bounds, *extra):
+    """Clave de la rejilla de la semana con la versión actual; `bounds` es (inicio, fin) de la semana"""
+    return _fragment_key(user_id, start_of_week, week_version(user_id, *bounds), extra)
+
+
+def get_week_fragment(key):
+    """HTML de la rejilla guardado con `key` (de week_fragment_key), o None"""
+    return _cache().get(key)
+
+
+def set_week_fragment(key, html):
+    _cache().set(key, html, CACHE_TIMEOUT)
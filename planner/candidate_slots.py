@@ -0,0 +1,89 @@
+"""
+Rejilla de inicios candidatos (día x hora) para el optimizador de horarios.
+
+Cada columna de la rejilla es un posible inicio: un día de la ventana de
+optimización y una hora del día con la granularidad configurada (por ejemplo
+cada 15, 30 o 60 minutos entre las 06:00 y las 22:00). Los datos de cada columna
+se guardan en arreglos de NumPy para que el optimizador arme las características
+del modelo, los scores y la disponibilidad de todos los eventos de una vez.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+
+PRIMERA_HORA = 6
+ULTIMA_HORA = 22
+DEFAULT_SLOT_MINUTES = 60
+
+
+def slot_minutes():
+    """Granularidad configurada en settings.SMART_SCHEDULER_SLOT_MINUTES (por defecto 60)"""
+    minutos = int(getattr(settings, 'SMART_SCHEDULER_SLOT_MINUTES', DEFAULT_SLOT_MINUTES))
+    if minutos <= 0 or 60 % minutos:
+        raise ValueError(f"La granularidad debe dividir la hora en partes iguales: {minutos}")
+    return minutos
+
+
+class CandidateSlots:
+    def __init__(self, days, day_index, hours, minutes):
+        self.days = list(days)
+        self.day_index = np.asarray(day_index, dtype=np.int64)
+        # Hora del día en horas decimales (9.5 = 09:30), que es como la recibe el modelo
+        self.hours = np.asarray(hours, dtype=np.float64)
+        self.minutes = minutes
+
+        ordinales = np.array([d.toordinal() for d in self.days], dtype=np.int64)
+        dias_semana = np.array([d.weekday() for d in self.days], dtype=np.int64)
+        self.ordinals = ordinales[self.day_index] if len(self.days) else np.empty(0, dtype=np.int64)
+        self.weekdays = dias_semana[self.day_index] if len(self.days) else np.empty(0, dtype=np.int64)
+        self.minute_of_day = np.rint(self.hours * 60).astype(np.int64)
+        self._posiciones = None
+
+    @classmethod
+    def window(cls, start_date, end_date=None, minutes=None,
+               first_hour=PRIMERA_HORA, last_hour=ULTIMA_HORA):
+        """Todos los inicios de start_date a end_date (ambos incluidos)"""
+        minutes = minutes or slot_minutes()
+        end_date = end_date or start_date
+        days = [start_date + timedelta(days=k) for k in range((end_date - start_date).days + 1)]
+        horas_dia = np.arange(first_hour * 60, last_hour * 60 + 1, minutes) / 60.0
+        return cls(
+            days,
+            np.repeat(np.arange(len(days)), len(horas_dia)),
+            np.tile(horas_dia, len(days)),
+            minutes,
+        )
+
+    def __len__(self):
+        return len(self.hours)
+
+    def after(self, moment):
+        """Solo los inicios posteriores a `moment` (datetime local sin zona horaria)"""
+        minuto = moment.hour * 60 + moment.minute
+        ordinal = moment.date().toordinal()
+        mask = (self.ordinals > ordinal) | ((self.ordinals == ordinal) & (self.minute_of_day > minuto))
+        return CandidateSlots(self.days, self.day_index[mask], self.hours[mask], self.minutes)
+
+    def date(self, j):
+        return self.days[self.day_index[j]]
+
+    def datetime(self, j):
+        """Inicio de la columna j como datetime local sin zona horaria"""
+        return datetime.combine(self.date(j), datetime.min.time()) + timedelta(minutes=int(self.minute_of_day[j]))
+
+    def label(self, j):
+        minuto = int(self.minute_of_day[j])
+        return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+    def index_of(self, moments):
+        """Columna de cada datetime local de `moments`, o -1 si no cae en la rejilla"""
+        if self._posiciones is None:
+            self._posiciones = {
+                (int(o), int(m)): j for j, (o, m) in enumerate(zip(self.ordinals, self.minute_of_day))
+            }
+        return np.array([
+            self._posiciones.get((m.date().toordinal(), m.hour * 60 + m.minute), -1)
+            if m.second == 0 and m.microsecond == 0 else -1
+            for m in moments
+        ], dtype=np.int64)
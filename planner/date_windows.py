@@ -0,0 +1,37 @@
+"""
+Rangos de fechas locales convertidos en límites de fecha y hora con zona horaria.
+
+Los filtros como start_time__date=... o start_time__date__range=(...) convierten
+la columna a fecha en cada fila, así la base de datos no puede usar los índices
+(user, start_time) de Event y recorre todos los eventos del usuario. date_window()
+devuelve los mismos eventos con start_time__gte/__lt sobre la columna tal cual:
+
+    Event.objects.filter(user=user, **date_window(inicio_semana, fin_semana))
+
+Sin `tz` se usa la zona horaria actual, la misma con la que Django resuelve __date.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def local_midnight(day, tz=None):
+    """Inicio (00:00) de `day` en la zona horaria `tz`"""
+    tz = tz or timezone.get_current_timezone()
+    moment = datetime.combine(day, time.min)
+    # Las zonas de pytz necesitan localize() para usar el desfase correcto
+    if hasattr(tz, 'localize'):
+        return tz.localize(moment)
+    return moment.replace(tzinfo=tz)
+
+
+def day_bounds(start_date, end_date=None, tz=None):
+    """(inicio, fin): desde las 00:00 de start_date hasta las 00:00 del día siguiente a end_date"""
+    end_date = end_date or start_date
+    return local_midnight(start_date, tz), local_midnight(end_date + timedelta(days=1), tz)
+
+
+def date_window(start_date, end_date=None, tz=None, field='start_time'):
+    """Filtro de `field` entre los días start_date y end_date (incluidos)"""
+    inicio, fin = day_bounds(start_date, end_date, tz)
+    return {f'{field}__gte': inicio, f'{field}__lt': fin}
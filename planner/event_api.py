@@ -0,0 +1,149 @@
+"""
+Consultas y serialización de la API JSON de eventos (list_user_events).
+
+Los eventos se leen con values_list solo con los campos pedidos, dentro de una
+ventana [start, end) sobre start_time y paginados por cursor (start_time, id),
+así la respuesta tiene un tamaño acotado aunque el usuario tenga miles de eventos.
+El ETag se calcula con max(updated_at) y la cantidad de eventos de la ventana.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime, time
+
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Event
+
+DEFAULT_FIELDS = ('id', 'title', 'start_time', 'end_time', 'is_completed')
+ALLOWED_FIELDS = DEFAULT_FIELDS + (
+    'description', 'event_type', 'priority', 'category', 'due_date', 'updated_at', 'recurrence_rule',
+)
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+
+
+class EventQueryError(ValueError):
+    """Parámetro inválido en la consulta de eventos"""
+
+
+def parse_moment(value, name):
+    """Fecha (YYYY-MM-DD, desde las 00:00) o datetime ISO; sin zona horaria se usa la actual"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise EventQueryError(f"'{name}' debe ser una fecha o fecha y hora ISO")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_fields(value):
+    """Campos pedidos en `fields` (separados por coma); 'id' siempre se incluye"""
+    fields = tuple(f.strip() for f in value.split(',') if f.strip()) if value else DEFAULT_FIELDS
+    invalidos = [f for f in fields if f not in ALLOWED_FIELDS]
+    if invalidos:
+        raise EventQueryError(f"Campos no permitidos: {', '.join(invalidos)}")
+    return fields if 'id' in fields else ('id',) + fields
+
+
+def encode_token(valor):
+    """Valor JSON como texto opaco apto para la URL (cursores de la API)"""
+    return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except ValueError:
+        raise EventQueryError("Cursor inválido")
+
+
+def encode_cursor(start_time, pk):
+    return encode_token([start_time.isoformat(), pk])
+
+
+def decode_cursor(cursor):
+    try:
+        start_time, pk = decode_token(cursor)
+        return datetime.fromisoformat(start_time), int(pk)
+    except (ValueError, TypeError):
+        raise EventQueryError("Cursor inválido")
+
+
+class EventQuery:
+    """Parámetros de una consulta a la API de eventos, validados a partir de request.GET"""
+
+    def __init__(self, params):
+        self.start = parse_moment(params.get('start'), 'start')
+        self.end = parse_moment(params.get('end'), 'end')
+        if self.start and self.end and self.end <= self.start:
+            raise EventQueryError("'end' debe ser posterior a 'start'")
+
+        try:
+            self.limit = int(params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise EventQueryError("'limit' debe ser un número")
+        if not 1 <= self.limit <= MAX_LIMIT:
+            raise EventQueryError(f"'limit' debe estar entre 1 y {MAX_LIMIT}")
+
+        self.fields = parse_fields(params.get('fields'))
+
+        self.cursor = params.get('cursor') or None
+        self.after = decode_cursor(self.cursor) if self.cursor else None
+
+    def window(self, user):
+        """Eventos del usuario dentro de la ventana (sin el cursor)"""
+        queryset = Event.objects.filter(user=user)
+        if self.start:
+            queryset = queryset.filter(start_time__gte=self.start)
+        if self.end:
+            queryset = queryset.filter(start_time__lt=self.end)
+        return queryset
+
+    def etag(self, user):
+        """Cambia si se crea, modifica o elimina un evento de la ventana, o con otros parámetros"""
+        resumen = self.window(user).order_by().aggregate(ultimo=Max('updated_at'), total=Count('id'))
+        sha = hashlib.sha1()
+        sha.update(json.dumps([
+            user.pk,
+            resumen['ultimo'].isoformat() if resumen['ultimo'] else None,
+            resumen['total'],
+            self.start.isoformat() if self.start else None,
+            self.end.isoformat() if self.end else None,
+            self.fields, self.limit, self.cursor,
+        ]).encode())
+        return sha.hexdigest()
+
+    def page(self, user):
+        """(eventos, next_cursor) de la página actual"""
+        queryset = self.window(user)
+        if self.after:
+            start_time, pk = self.after
+            queryset = queryset.filter(Q(start_time__gt=start_time) | Q(start_time=start_time, id__gt=pk))
+        campos = self.fields
+        # start_time siempre se lee porque forma parte del cursor
+        columnas = campos if 'start_time' in campos else campos + ('start_time',)
+        filas = list(queryset.order_by('start_time', 'id').values_list(*columnas)[:self.limit + 1])
+
+        next_cursor = None
+        if len(filas) > self.limit:
+            filas = filas[:self.limit]
+            ultima = dict(zip(columnas, filas[-1]))
+            next_cursor = encode_cursor(ultima['start_time'], ultima['id'])
+
+        eventos = [
+            {campo: serialize_value(valor) for campo, valor in zip(campos, fila)}
+            for fila in filas
+        ]
+        return eventos, next_cursor
+
+
+def serialize_value(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
@@ -0,0 +1,86 @@
+"""
+Sincronización incremental de los eventos del usuario.
+
+El cliente guarda el cursor de la última sincronización y pide solo los eventos
+creados o modificados (Event.updated_at) y los eliminados (EventTombstone) desde
+ese momento, en lugar de volver a consultar y renderizar toda la semana después
+de mover o completar un evento.
+
+El cursor es la hora del servidor al responder. Como un evento se guarda con su
+updated_at antes de que la transacción se confirme, cada consulta vuelve a mirar
+SYNC_OVERLAP hacia atrás; el cliente aplica los cambios por id, así que recibir
+dos veces el mismo evento no tiene efecto. Si el cursor es más viejo que
+TOMBSTONE_RETENTION (las eliminaciones anteriores ya se borraron) o hay más de
+MAX_CHANGES cambios, la respuesta pide recargar todo (reset).
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .event_api import MAX_LIMIT, EventQueryError, decode_token, encode_token, serialize_value
+from .models import Event, EventTombstone
+
+SYNC_OVERLAP = timedelta(seconds=5)
+TOMBSTONE_RETENTION = timedelta(days=30)
+MAX_CHANGES = MAX_LIMIT
+
+
+def encode_sync_cursor(moment):
+    return encode_token(moment.isoformat())
+
+
+def decode_sync_cursor(cursor):
+    try:
+        moment = datetime.fromisoformat(decode_token(cursor))
+    except (TypeError, ValueError):
+        raise EventQueryError("Cursor inválido")
+    if timezone.is_naive(moment):
+        raise EventQueryError("Cursor inválido")
+    return moment
+
+
+def current_sync_cursor():
+    """Cursor para una página que se acaba de renderizar con los eventos actuales"""
+    return encode_sync_cursor(timezone.now())
+
+
+def changes_since(user, cursor, fields):
+    """
+    {'events', 'deleted', 'cursor', 'reset'}: eventos creados o modificados y ids
+    eliminados desde `cursor`, y el cursor para la próxima consulta.
+    """
+    ahora = timezone.now()
+    respuesta = {'events': [], 'deleted': [], 'cursor': encode_sync_cursor(ahora), 'reset': False}
+    desde = decode_sync_cursor(cursor) if cursor else None
+    if desde is None or desde < ahora - TOMBSTONE_RETENTION:
+        respuesta['reset'] = True
+        return respuesta
+    desde -= SYNC_OVERLAP
+
+    filas = list(
+        Event.objects.filter(user=user, updated_at__gt=desde)
+        .order_by('updated_at', 'id')
+        .values_list(*fields)[:MAX_CHANGES + 1]
+    )
+    if len(filas) > MAX_CHANGES:
+        respuesta['reset'] = True
+        return respuesta
+
+    respuesta['events'] = [
+        {campo: serialize_value(valor) for campo, valor in zip(fields, fila)}
+        for fila in filas
+    ]
+    respuesta['deleted'] = sorted(set(
+        EventTombstone.objects.filter(user=user, deleted_at__gt=desde).values_list('event_id', flat=True)
+    ))
+    return respuesta
+
+
+def record_tombstone(event):
+    EventTombstone.objects.create(user_id=event.user_id, event_id=event.pk)
+
+
+def prune_tombstones(older_than=TOMBSTONE_RETENTION):
+    """Borra las eliminaciones que ya ningún cursor válido puede pedir"""
+    borrados, _ = EventTombstone.objects.filter(deleted_at__lt=timezone.now() - older_than).delete()
+    return borrados
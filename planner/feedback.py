@@ -0,0 +1,210 @@
+"""
+Respuestas de los usuarios a las sugerencias del optimizador y actualización
+incremental del modelo.
+
+Cuando se aplica una sugerencia (event_update_ajax con from_suggestion) o se
+descarta desde el modal, se arma una fila de SuggestionFeedback con las
+características del evento en el horario sugerido. Las filas de una ronda de
+sugerencias se guardan con un solo bulk_create dentro de la misma petición (y
+de su transacción), así no se pierden si el proceso se reinicia.
+
+incremental_update() agrega unos pocos árboles al GradientBoostingClassifier
+(warm_start) entrenados solo con las respuestas nuevas, guarda el resultado como
+una versión nueva y la publica igual que train_scheduler; no reentrena con todo
+el historial. Se ejecuta con el comando update_scheduler_feedback o, si
+settings.SMART_SCHEDULER_FEEDBACK_AUTO_UPDATE está activo, en el pool de
+planner.jobs después de guardar respuestas. Cada actualización toma un bloqueo de
+archivo (fcntl.flock) en la carpeta de versiones, así dos procesos nunca leen el
+mismo feedback_last_id ni escriben la misma versión.
+"""
+import io
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import SuggestionFeedback
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo queda el bloqueo del proceso
+    fcntl = None
+
+FEEDBACK_BATCH_SIZE = 50
+UPDATE_LOCK_FILE = '.feedback_update.lock'
+# Respuestas nuevas necesarias para actualizar el modelo
+FEEDBACK_MIN_UPDATE = 50
+# Árboles agregados en cada actualización y máximo antes de pedir un reentrenamiento
+FEEDBACK_TREES = 10
+FEEDBACK_MAX_TREES = 400
+
+_update_lock = threading.Lock()
+
+
+def _local_naive(moment):
+    if timezone.is_aware(moment):
+        return timezone.localtime(moment).replace(tzinfo=None)
+    return moment
+
+
+def feedback_row(event, suggested_start, accepted):
+    """Fila (sin guardar) con las características de `event` empezando en `suggested_start`"""
+    from .scheduler_training import EVENT_TYPES, PRIORITIES
+
+    inicio = _local_naive(suggested_start)
+    days_to_deadline = max(0, (event.due_date - inicio.date()).days) if event.due_date else 999
+    return SuggestionFeedback(
+        user_id=event.user_id,
+        event_type=event.event_type if event.event_type in EVENT_TYPES else 'otro',
+        priority=event.priority if event.priority in PRIORITIES else 'media',
+        duration=(event.end_time - event.start_time).total_seconds() / 3600,
+        suggested_hour=inicio.hour + inicio.minute / 60,
+        weekday=inicio.weekday(),
+        days_to_deadline=min(days_to_deadline, 999),
+        accepted=accepted,
+    )
+
+
+def record_feedback(rows):
+    """Guarda las filas con un solo bulk_create en la transacción de la petición"""
+    rows = list(rows)
+    if not rows:
+        return 0
+    SuggestionFeedback.objects.bulk_create(rows, batch_size=FEEDBACK_BATCH_SIZE)
+    if getattr(settings, 'SMART_SCHEDULER_FEEDBACK_AUTO_UPDATE', False):
+        transaction.on_commit(_submit_update)
+    return len(rows)
+
+
+def _submit_update():
+    from .jobs import get_executor
+    get_executor().submit(run_feedback_update)
+
+
+def run_feedback_update():
+    """Tarea del pool: si ya hay una actualización en curso (en este u otro proceso) no hace nada"""
+    if not _update_lock.acquire(blocking=False):
+        return None
+    close_old_connections()
+    try:
+        return incremental_update()
+    except Exception as e:
+        logger.exception(f"Error en la actualización incremental del modelo: {str(e)}")
+        return None
+    finally:
+        _update_lock.release()
+        connection.close()
+
+
+@contextmanager
+def update_lock(model_path):
+    """
+    Bloqueo exclusivo de las actualizaciones del modelo en `model_path`, entre
+    procesos. El valor del with es False (sin esperar) si otro proceso ya lo tiene.
+    """
+    from .scheduler_training import VERSIONS_DIR
+
+    if fcntl is None:
+        yield True
+        return
+    carpeta = os.path.join(model_path, VERSIONS_DIR)
+    os.makedirs(carpeta, exist_ok=True)
+    with open(os.path.join(carpeta, UPDATE_LOCK_FILE), 'a') as archivo:
+        try:
+            fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def _export_silencioso(carpeta):
+    from django.core.management import call_command
+    call_command('export_scheduler_model', model_path=carpeta, stdout=io.StringIO())
+
+
+def incremental_update(model_path=None, min_rows=FEEDBACK_MIN_UPDATE,
+                       n_trees=FEEDBACK_TREES, export=_export_silencioso, publish=True, log=None):
+    """
+    Agrega n_trees árboles al modelo publicado entrenados con las respuestas
+    posteriores a metadata['feedback_last_id']. Devuelve los metadatos de la
+    versión nueva, o None si no hay suficientes respuestas o si otro proceso
+    está actualizando el mismo modelo.
+    """
+    from .model_registry import DEFAULT_MODEL_PATH
+
+    model_path = model_path or DEFAULT_MODEL_PATH
+    log = log or (lambda mensaje: None)
+    with update_lock(model_path) as adquirido:
+        if not adquirido:
+            log("ℹ️ Otro proceso está actualizando el modelo")
+            return None
+        # Los metadatos se leen con el bloqueo tomado: otra actualización ya no los cambia
+        return _incremental_update(model_path, min_rows, n_trees, export, publish, log)
+
+
+def _incremental_update(model_path, min_rows, n_trees, export, publish, log):
+    import joblib
+    import numpy as np
+    from .model_registry import MODEL_FILE, ENCODERS_FILE, SCALER_FILE
+    from .scheduler_training import (
+        TrainingArrays, feature_frame, next_version, publish_version, read_metadata, save_version,
+    )
+
+    metadata = read_metadata(model_path)
+    ultimo_id = metadata.get('feedback_last_id', 0)
+
+    filas = list(SuggestionFeedback.objects.filter(id__gt=ultimo_id).order_by('id').values_list(
+        'id', 'suggested_hour', 'duration', 'event_type', 'priority', 'weekday', 'days_to_deadline', 'accepted'
+    ))
+    if len(filas) < min_rows:
+        log(f"ℹ️ {len(filas)} respuestas nuevas (se necesitan {min_rows})")
+        return None
+
+    arrays = TrainingArrays(len(filas))
+    for _, hora, duracion, tipo, prioridad, weekday, dtd, aceptada in filas:
+        arrays.append(hora, duracion, tipo, prioridad, weekday, dtd, aceptada)
+    columns = arrays.columns()
+    y = columns['label'].astype(np.int64)
+    if len(np.unique(y)) < 2:
+        log("ℹ️ Las respuestas nuevas son todas aceptadas o todas descartadas; se espera a tener ambas")
+        return None
+
+    model = joblib.load(os.path.join(model_path, MODEL_FILE))
+    encoders = joblib.load(os.path.join(model_path, ENCODERS_FILE))
+    scaler = joblib.load(os.path.join(model_path, SCALER_FILE))
+    if model.n_estimators + n_trees > FEEDBACK_MAX_TREES:
+        mensaje = (f"⚠️ El modelo ya tiene {model.n_estimators} árboles y {len(filas)} respuestas "
+                   f"esperan: ejecuta train_scheduler para reentrenarlo")
+        # Sin este aviso las actualizaciones automáticas se detendrían sin dejar rastro
+        logger.warning(mensaje)
+        log(mensaje)
+        return None
+
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + n_trees)
+    model.fit(feature_frame(columns, scaler), y)
+    model.set_params(warm_start=False)
+
+    version = next_version(model_path)
+    metadata.update({
+        'version': version,
+        'feedback_count': metadata.get('feedback_count', 0) + len(filas),
+        'feedback_last_id': filas[-1][0],
+        'feedback_updated_date': datetime.now().isoformat(),
+    })
+    version_dir = save_version(model, encoders, scaler, metadata, model_path=model_path, export=export)
+    log(f"✅ Versión {version} con {len(filas)} respuestas nuevas ({model.n_estimators} árboles)")
+
+    if publish:
+        publish_version(version_dir, model_path=model_path)
+    return metadata
@@ -0,0 +1,379 @@
+"""
+Formato plano (arreglos NumPy) para el modelo del SmartScheduleOptimizer.
+
+Los árboles del GradientBoostingClassifier se guardan como arreglos contiguos
+(.npy) que se abren con np.load(mmap_mode='r'). Así todos los workers de un
+mismo servidor comparten una sola copia del modelo en la caché de páginas del
+sistema operativo, en lugar de tener cada uno su propia copia deserializada.
+
+Junto al modelo se exportan los encoders y el scaler como tablas simples y
+arreglos afines (preprocessing.json). Con ambos artefactos el optimizador puede
+predecir solo con NumPy, sin cargar joblib, sklearn ni pandas.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from functools import cached_property
+
+import numpy as np
+
+FLAT_MODEL_DIR = 'smart_scheduler_model_flat'
+FLAT_META_FILE = 'meta.json'
+PREPROCESSING_FILE = 'preprocessing.json'
+FLAT_FORMAT_VERSION = 1
+
+# Índice que usa sklearn para marcar las hojas en children_left/children_right
+TREE_LEAF = -1
+
+# Filas por bloque al evaluar con vectores de bits (mantiene los bloques en caché)
+BITVECTOR_CHUNK_SIZE = 2048
+
+
+def float32_floor(value):
+    """
+    Mayor float32 que no supera a `value`. Para un x en float32 se cumple
+    x <= value  <=>  x <= float32_floor(value), así los cortes se pueden comparar
+    en float32 sin cambiar el resultado.
+    """
+    valor = np.float32(value)
+    if valor > value:
+        valor = np.nextafter(valor, np.float32(-np.inf))
+    return valor
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+@contextmanager
+def atomic_output_dir(output_dir):
+    """
+    Entrega una carpeta temporal junto a output_dir y, si todo sale bien, la mueve
+    a su lugar final; así los workers nunca leen una exportación a medias.
+    """
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    tmp_dir = tempfile.mkdtemp(prefix='.export-', dir=parent)
+    try:
+        # mkdtemp crea la carpeta con 0700 y os.replace la conserva: los workers que
+        # corren con otro usuario no podrían abrirla y volverían a joblib/sklearn
+        os.chmod(tmp_dir, 0o755)
+        yield tmp_dir
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+class FlatTreeEnsemble:
+    """
+    Evaluador vectorizado de un ensamble de árboles de gradient boosting binario.
+
+    Expone predict_proba como el modelo de sklearn, de modo que puede usarse en su
+    lugar dentro del optimizador.
+
+    Si cada árbol tiene a lo sumo 64 hojas se evalúa con vectores de bits (el
+    esquema de QuickScorer): cada nodo guarda una máscara que apaga las hojas de su
+    subárbol izquierdo, y como las máscaras de cada característica están ordenadas
+    por umbral, las de todos los nodos cuya condición es falsa para un valor x se
+    combinan de antemano en un AND acumulado. Predecir es una búsqueda binaria por
+    característica, un AND entre seis tablas y tomar el bit más bajo encendido,
+    que es la hoja de salida de cada árbol. Si algún árbol tiene más hojas se
+    recorren los árboles nivel por nivel.
+    """
+
+    def __init__(self, feature, threshold, children_left, children_right, value, roots, meta):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.meta = meta
+        self.learning_rate = float(meta['learning_rate'])
+        self.init_raw = float(meta['init_raw'])
+        self.max_depth = int(meta['max_depth'])
+        self.classes_ = np.array(meta['classes'])
+        self.n_features_in_ = int(meta['n_features'])
+        self.feature_names_in_ = np.array(meta.get('feature_names') or [])
+
+    def _tree_leaves(self, root):
+        """Hojas del árbol de izquierda a derecha y, por nodo interno, las hojas de su rama izquierda"""
+        left, right = self.children_left, self.children_right
+        hojas, rama_izquierda = [], {}
+        # Recorrido en orden sin recursión: (nodo, ya_visitado)
+        pila = [(int(root), False)]
+        inicio_rama = {}
+        while pila:
+            nodo, visitado = pila.pop()
+            if left[nodo] == TREE_LEAF:
+                hojas.append(nodo)
+                continue
+            if visitado:
+                # Se terminó la rama izquierda: sus hojas son las agregadas desde que se entró al nodo
+                rama_izquierda[nodo] = (inicio_rama[nodo], len(hojas))
+                pila.append((int(right[nodo]), False))
+                continue
+            inicio_rama[nodo] = len(hojas)
+            pila.append((nodo, True))
+            pila.append((int(left[nodo]), False))
+        return hojas, rama_izquierda
+
+    @cached_property
+    def _bitvectors(self):
+        """
+        Tablas de vectores de bits, armadas en la primera predicción: son varios MB
+        por proceso y no hacen falta cuando se usa la tabla compilada.
+        """
+        return self._build_bitvectors()
+
+    def _build_bitvectors(self):
+        arboles = [self._tree_leaves(root) for root in self.roots]
+        max_hojas = max((len(hojas) for hojas, _ in arboles), default=0)
+        if max_hojas > 64:
+            return None
+        dtype = np.uint32 if max_hojas <= 32 else np.uint64
+        todos = dtype(np.iinfo(dtype).max)
+
+        n_arboles = len(arboles)
+        valores_hoja = np.zeros((n_arboles, max_hojas), dtype=np.float64)
+        nodos = [[] for _ in range(self.n_features_in_)]
+        for t, (hojas, rama_izquierda) in enumerate(arboles):
+            valores_hoja[t, :len(hojas)] = self.value[hojas]
+            for nodo, (desde, hasta) in rama_izquierda.items():
+                bits = ((1 << (hasta - desde)) - 1) << desde
+                nodos[int(self.feature[nodo])].append(
+                    (float32_floor(self.threshold[nodo]), t, dtype(~bits & int(todos)))
+                )
+
+        umbrales, mascaras = [], []
+        for lista in nodos:
+            lista.sort(key=lambda nodo: nodo[0])
+            # Fila k: AND de las máscaras de los k nodos con menor umbral, por árbol
+            acumuladas = np.full((len(lista) + 1, n_arboles), todos, dtype=dtype)
+            for k, (_, t, mascara) in enumerate(lista):
+                acumuladas[k + 1] = acumuladas[k]
+                acumuladas[k + 1, t] &= mascara
+            umbrales.append(np.array([nodo[0] for nodo in lista], dtype=np.float32))
+            mascaras.append(acumuladas)
+        return umbrales, mascaras, valores_hoja
+
+    def _accumulate(self, hojas):
+        """
+        init_raw + learning_rate * valor de cada árbol, sumando árbol por árbol en el
+        mismo orden que sklearn (predict_stages) para obtener exactamente el mismo valor
+        """
+        raw = np.full(hojas.shape[0], self.init_raw)
+        for t in range(hojas.shape[1]):
+            raw += self.learning_rate * hojas[:, t]
+        return raw
+
+    def _raw_bitvectors(self, X):
+        umbrales, mascaras, valores_hoja = self._bitvectors
+        arboles = np.arange(valores_hoja.shape[0])
+        raw = np.empty(X.shape[0], dtype=np.float64)
+        for inicio in range(0, X.shape[0], BITVECTOR_CHUNK_SIZE):
+            bloque = X[inicio:inicio + BITVECTOR_CHUNK_SIZE]
+            bits = None
+            for k in range(len(umbrales)):
+                # Nodos de la característica k cuya condición x <= umbral es falsa
+                falsos = np.searchsorted(umbrales[k], bloque[:, k], side='left')
+                if bits is None:
+                    bits = mascaras[k][falsos]
+                else:
+                    bits &= mascaras[k][falsos]
+            # Bit más bajo encendido; las potencias de 2 son exactas en float32
+            bajo = bits & (~bits + bits.dtype.type(1))
+            hoja = np.log2(bajo.astype(np.float32)).astype(np.intp)
+            raw[inicio:inicio + BITVECTOR_CHUNK_SIZE] = self._accumulate(valores_hoja[arboles, hoja])
+        return raw
+
+    def _raw_traversal(self, X):
+        filas = np.arange(X.shape[0])[:, np.newaxis]
+        nodos = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+
+        for _ in range(self.max_depth):
+            izquierdo = self.children_left[nodos]
+            es_hoja = izquierdo == TREE_LEAF
+            if es_hoja.all():
+                break
+            # Las hojas tienen feature negativo; se usa 0 solo para poder indexar
+            columna = np.maximum(self.feature[nodos], 0)
+            va_izquierda = X[filas, columna] <= self.threshold[nodos]
+            siguiente = np.where(va_izquierda, izquierdo, self.children_right[nodos])
+            nodos = np.where(es_hoja, nodos, siguiente)
+
+        return self._accumulate(self.value[nodos])
+
+    def decision_function(self, X):
+        # sklearn evalúa los árboles con X en float32; se replica para obtener los mismos cortes
+        X = np.asarray(X, dtype=np.float32)
+        return self._raw_bitvectors(X) if self._bitvectors is not None else self._raw_traversal(X)
+
+    def predict_proba(self, X):
+        proba = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+
+class FlatPreprocessor:
+    """
+    Encoders y scaler del modelo como tablas simples: cada LabelEncoder es un
+    diccionario valor -> código y el StandardScaler un par de arreglos (media,
+    escala) por columna. Reemplaza a los objetos de sklearn al armar las
+    características.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.features = list(data['features'])
+        self.codes = {
+            name: {valor: codigo for codigo, valor in enumerate(clases)}
+            for name, clases in data['encoders'].items()
+        }
+        self.scaled_columns = list(data['scaler']['columns'])
+        self.offset = np.array(data['scaler']['offset'], dtype=np.float64)
+        self.scale_ = np.array(data['scaler']['scale'], dtype=np.float64)
+
+    def encode(self, name, values):
+        codes = self.codes[name]
+        try:
+            return np.array([codes[valor] for valor in values], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Valor no reconocido para {name}: {e.args[0]}")
+
+    def scale(self, name, values):
+        k = self.scaled_columns.index(name)
+        return (np.asarray(values, dtype=np.float64) - self.offset[k]) / self.scale_[k]
+
+    def transform(self, columns):
+        """Matriz de características (en el orden del modelo) a partir de las columnas sin procesar"""
+        salida = []
+        for name in self.features:
+            if name.endswith('_encoded'):
+                salida.append(self.encode(name[:-len('_encoded')], columns[name[:-len('_encoded')]]))
+            elif name in self.scaled_columns:
+                salida.append(self.scale(name, columns[name]))
+            else:
+                salida.append(np.asarray(columns[name], dtype=np.float64))
+        return np.column_stack(salida).astype(np.float64)
+
+
+def preprocessing_to_dict(model, encoders, scaler, encoders_file=None, scaler_file=None):
+    """Convierte los LabelEncoder y el StandardScaler de sklearn al formato de FlatPreprocessor"""
+    n_columnas = len(scaler.feature_names_in_)
+    mean = scaler.mean_ if getattr(scaler, 'with_mean', True) and scaler.mean_ is not None else np.zeros(n_columnas)
+    scale = scaler.scale_ if getattr(scaler, 'with_std', True) and scaler.scale_ is not None else np.ones(n_columnas)
+    return {
+        'features': [str(f) for f in model.feature_names_in_],
+        'encoders': {
+            name: [c.item() if hasattr(c, 'item') else c for c in encoder.classes_]
+            for name, encoder in encoders.items()
+        },
+        'scaler': {
+            'columns': [str(c) for c in scaler.feature_names_in_],
+            'offset': [float(v) for v in mean],
+            'scale': [float(v) for v in scale],
+        },
+        'encoders_sha256': file_sha256(encoders_file) if encoders_file else None,
+        'scaler_sha256': file_sha256(scaler_file) if scaler_file else None,
+    }
+
+
+def export_flat_model(model, output_dir, source_file=None, preprocessing=None):
+    """
+    Exporta un GradientBoostingClassifier binario ya entrenado al formato plano.
+    `preprocessing` (ver preprocessing_to_dict) se guarda junto al modelo.
+
+    La carpeta se escribe de forma atómica (ver atomic_output_dir).
+    """
+    if model.n_classes_ != 2 or model.estimators_.shape[1] != 1:
+        raise ValueError("Solo se soportan modelos de clasificación binaria")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        roots.append(offset)
+        features.append(tree.feature.astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(left == TREE_LEAF, TREE_LEAF, left + offset).astype(np.int32))
+        rights.append(np.where(right == TREE_LEAF, TREE_LEAF, right + offset).astype(np.int32))
+        values.append(tree.value[:, 0, 0].astype(np.float64))
+        offset += tree.node_count
+
+    n_features = int(model.n_features_in_)
+    meta = {
+        'format_version': FLAT_FORMAT_VERSION,
+        'learning_rate': float(model.learning_rate),
+        'init_raw': float(model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0, 0]),
+        'max_depth': int(max(e.tree_.max_depth for e in model.estimators_[:, 0])),
+        'classes': [int(c) for c in model.classes_],
+        'n_features': n_features,
+        'feature_names': [str(f) for f in getattr(model, 'feature_names_in_', [])],
+        'n_trees': len(roots),
+        'n_nodes': offset,
+        'source_sha256': file_sha256(source_file) if source_file else None,
+    }
+
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'children_left': np.concatenate(lefts),
+        'children_right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int32),
+    }
+
+    with atomic_output_dir(output_dir) as tmp_dir:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        if preprocessing is not None:
+            with open(os.path.join(tmp_dir, PREPROCESSING_FILE), 'w') as f:
+                json.dump(preprocessing, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, FLAT_META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    return meta
+
+
+def load_preprocessing(model_dir):
+    """FlatPreprocessor guardado junto al modelo plano, o None si no se exportó"""
+    path = os.path.join(model_dir, PREPROCESSING_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return FlatPreprocessor(json.load(f))
+
+
+def load_flat_model(model_dir, mmap_mode='r'):
+    """Abre un modelo exportado; con mmap_mode='r' los arreglos quedan mapeados en memoria"""
+    with open(os.path.join(model_dir, FLAT_META_FILE), 'r') as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FLAT_FORMAT_VERSION:
+        raise ValueError(f"Versión de formato no soportada: {meta.get('format_version')}")
+
+    def cargar(name):
+        return np.load(os.path.join(model_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+
+    return FlatTreeEnsemble(
+        feature=cargar('feature'),
+        threshold=cargar('threshold'),
+        children_left=cargar('children_left'),
+        children_right=cargar('children_right'),
+        value=cargar('value'),
+        roots=cargar('roots'),
+        meta=meta,
+    )
@@ -3,9 +3,33 @@ from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta
 from django.utils import timezone
 from .models import Event
+from .overlaps import overlap_condition
+from .recurrence import (
+    RECURRENCE_VALUES, REPEAT_CHOICES, WEEKDAYS, RecurrenceRule, expand_overlapping_values, overlap_candidates,
+)
+from django.db.models import Q
 import re
 
+# Tipos de evento que cuentan como carga de trabajo/estudio del día
+WORKLOAD_EVENT_TYPES = ('tarea', 'clase')
+# Datos de cada evento cercano que usan las validaciones de conflictos y de carga diaria
+NEARBY_FIELDS = ('title', 'event_type', 'start_time', 'end_time')
+
 class EventForm(forms.ModelForm):
+    # Repetición simple; se guarda en recurrence_rule (ver planner.recurrence)
+    repeat = forms.ChoiceField(
+        choices=REPEAT_CHOICES, required=False, label='Repetir',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    repeat_until = forms.DateField(
+        required=False, label='Repetir hasta',
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'form-control',
+            'style': 'min-width: 250px;'
+        }, format='%Y-%m-%d')
+    )
+
     class Meta:
         model = Event
         fields = ['title', 'description', 'event_type', 'priority', 'start_time', 'end_time', 'due_date', 'is_completed']
@@ -105,6 +129,13 @@ class EventForm(forms.ModelForm):
             # Convertir due_date al formato date
             if self.instance.due_date:
                 self.fields['due_date'].widget.attrs['value'] = self.instance.due_date.strftime('%Y-%m-%d')
+            
+            # Repetición actual de la serie
+            if self.instance.recurrence_rule:
+                rule = RecurrenceRule.parse(self.instance.recurrence_rule)
+                self.initial.setdefault('repeat', rule.freq)
+                if rule.until:
+                    self.initial.setdefault('repeat_until', rule.until.date())
 
     def clean_title(self):
         title = self.cleaned_data.get('title')
@@ -285,41 +316,103 @@ class EventForm(forms.ModelForm):
                 if duration > timedelta(hours=8):
                     self.add_error('end_time', "Eventos personales muy largos. ¿Dividir en múltiples eventos?")
         
+        # Una sola consulta con los eventos que necesitan las dos validaciones siguientes
+        check_workload = bool(start_time) and event_type in WORKLOAD_EVENT_TYPES
+        nearby_events = self._nearby_events(start_time, end_time, check_workload)
+        
         # Validar conflictos de horarios si tenemos usuario
         if self.user and start_time and end_time:
-            self._validate_schedule_conflicts(start_time, end_time)
+            self._validate_schedule_conflicts(start_time, end_time, nearby_events)
         
         # Validar coherencia título-tipo
         if title and event_type:
             self._validate_title_type_consistency(title, event_type)
         
         # Validar carga de trabajo diaria
-        if start_time and event_type in ['tarea', 'clase']:
-            self._validate_daily_workload(start_time)
+        if check_workload:
+            self._validate_daily_workload(start_time, nearby_events)
+        
+        # Regla de repetición del evento
+        if not self.instance.recurrence_parent_id:
+            self.instance.recurrence_rule = self._build_recurrence_rule(
+                cleaned_data.get('repeat'), cleaned_data.get('repeat_until'), start_time
+            )
         
         return cleaned_data
     
-    def _validate_schedule_conflicts(self, start_time, end_time):
-        """Validar conflictos de horarios con otros eventos del usuario"""
-        if not self.user:
-            return
-            
-        # Buscar eventos superpuestos
-        conflicting_events = Event.objects.filter(
-            user=self.user,
-            start_time__lt=end_time,
-            end_time__gt=start_time
-        )
+    def _build_recurrence_rule(self, repeat, repeat_until, start_time):
+        """Texto RRULE para la repetición elegida; conserva la regla actual si no cambió"""
+        if not repeat:
+            return ''
+        if repeat_until and start_time and repeat_until < timezone.localtime(start_time).date():
+            self.add_error('repeat_until', "La repetición no puede terminar antes del inicio del evento.")
+            return self.instance.recurrence_rule
+        if (self.instance.recurrence_rule
+                and repeat == self.initial.get('repeat')
+                and repeat_until == self.initial.get('repeat_until')):
+            rule = RecurrenceRule.parse(self.instance.recurrence_rule)
+            # Con otro día de inicio la regla semanal se arma de nuevo
+            if rule.freq != 'WEEKLY' or not start_time or timezone.localtime(start_time).weekday() in rule.byday:
+                return self.instance.recurrence_rule
+        partes = [f'FREQ={repeat}']
+        if repeat == 'WEEKLY' and start_time:
+            partes.append(f'BYDAY={WEEKDAYS[timezone.localtime(start_time).weekday()]}')
+        if repeat_until:
+            partes.append(f"UNTIL={repeat_until.strftime('%Y%m%d')}")
+        return ';'.join(partes)
+    
+    @staticmethod
+    def _day_bounds(start_time):
+        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day_start, day_start + timedelta(days=1)
+    
+    def _nearby_events(self, start_time, end_time, check_workload):
+        """
+        Otros eventos del usuario que se cruzan con el horario y, si se valida la
+        carga diaria, los que empiezan el mismo día, como tuplas de NEARBY_FIELDS.
+        Las series se leen en la misma consulta y se cambian por sus ocurrencias.
+        """
+        if not self.user or not start_time or not (end_time or check_workload):
+            return []
+        
+        queryset = Event.objects.filter(user=self.user)
+        condition = None
+        window_start, window_end = start_time, end_time
+        if end_time:
+            queryset, condition = overlap_condition(queryset, start_time, end_time)
+        if check_workload:
+            day_start, day_end = self._day_bounds(start_time)
+            same_day = Q(start_time__gte=day_start, start_time__lt=day_end,
+                         event_type__in=WORKLOAD_EVENT_TYPES)
+            condition = same_day if condition is None else condition | same_day
+            window_start = min(start_time, day_start)
+            window_end = max(end_time, day_end) if end_time else day_end
         
+        queryset = queryset.filter(condition | overlap_candidates(window_start, window_end))
+        replaced = ()
         # Excluir el evento actual si estamos editando
         if self.instance and self.instance.pk:
-            conflicting_events = conflicting_events.exclude(pk=self.instance.pk)
-        
-        if conflicting_events.exists():
-            conflict_titles = [event.title for event in conflicting_events[:3]]
-            error_msg = f"Conflicto de horario con: {', '.join(conflict_titles)}"
-            if conflicting_events.count() > 3:
-                error_msg += f" y {conflicting_events.count() - 3} más"
+            queryset = queryset.exclude(pk=self.instance.pk)
+            if self.instance.recurrence_parent_id:
+                # La ocurrencia que reemplaza este evento tampoco cuenta
+                replaced = [(self.instance.recurrence_parent_id, self.instance.recurrence_id)]
+        # Solo las columnas necesarias; las series traen además las de su regla
+        rows = queryset.values_list(*NEARBY_FIELDS, *RECURRENCE_VALUES)
+        return sorted(
+            expand_overlapping_values(rows, NEARBY_FIELDS, window_start, window_end, replaced),
+            key=lambda row: row[2],
+        )
+    
+    def _validate_schedule_conflicts(self, start_time, end_time, nearby_events):
+        """Validar conflictos de horarios con otros eventos del usuario"""
+        conflict_titles = [
+            title for title, _, event_start, event_end in nearby_events
+            if event_start < end_time and event_end > start_time
+        ]
+        if conflict_titles:
+            error_msg = f"Conflicto de horario con: {', '.join(conflict_titles[:3])}"
+            if len(conflict_titles) > 3:
+                error_msg += f" y {len(conflict_titles) - 3} más"
             self.add_error('start_time', error_msg)
     
     def _validate_title_type_consistency(self, title, event_type):
@@ -341,31 +434,20 @@ class EventForm(forms.ModelForm):
                     f"El título sugiere que es '{tipo}', ¿es correcto el tipo seleccionado?")
                 break
     
-    def _validate_daily_workload(self, start_time):
+    def _validate_daily_workload(self, start_time, nearby_events):
         """Validar que no haya sobrecarga de trabajo en un día"""
         if not self.user:
             return
             
-        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
+        day_start, day_end = self._day_bounds(start_time)
         
         # Calcular horas de trabajo/estudio del día
-        day_events = Event.objects.filter(
-            user=self.user,
-            start_time__gte=day_start,
-            start_time__lt=day_end,
-            event_type__in=['tarea', 'clase']
+        total_work_minutes = sum(
+            (event_end - event_start).total_seconds() / 60
+            for _, event_type, event_start, event_end in nearby_events
+            if event_type in WORKLOAD_EVENT_TYPES and day_start <= event_start < day_end
         )
         
-        # Excluir evento actual si editamos
-        if self.instance and self.instance.pk:
-            day_events = day_events.exclude(pk=self.instance.pk)
-        
-        total_work_minutes = sum([
-            (event.end_time - event.start_time).total_seconds() / 60
-            for event in day_events
-        ])
-        
         # Agregar duración del evento actual
         end_time = self.cleaned_data.get('end_time')
         if end_time:
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta, time
 from django.utils import timezone
 from django.utils.timezone import make_aware
 from .models import Event
+from .date_windows import date_window
 import pytz
 from core.models import UserSettings
 
@@ -26,52 +27,77 @@ def generar_bloques_enfocados_semana(user, duracion_enfoque=25, duracion_descans
     except (UserSettings.DoesNotExist, pytz.exceptions.UnknownTimeZoneError):
         user_tz = pytz.timezone('America/Guayaquil')
 
-    for offset in range(7):
-        dia = hoy + timedelta(days=offset)
-        eventos = Event.objects.filter(user=user, start_time__date=dia).order_by("start_time")
+    # Una sola consulta para los 7 días, en el mismo orden que día por día
+    eventos = Event.objects.filter(user=user, **date_window(hoy, hoy + timedelta(days=6))).order_by("start_time")
 
-        for evento in eventos:
-            tipo = evento.event_type.lower()
-            # Convertir los tiempos del evento a la zona horaria del usuario
-            inicio = evento.start_time.astimezone(user_tz)
-            fin = evento.end_time.astimezone(user_tz)
+    for evento in eventos:
+        tipo = evento.event_type.lower()
+        # Convertir los tiempos del evento a la zona horaria del usuario
+        inicio = evento.start_time.astimezone(user_tz)
+        fin = evento.end_time.astimezone(user_tz)
 
-            if tipo in ["descanso", "descanso/ocio", "recreación"]:
+        if tipo in ["descanso", "descanso/ocio", "recreación"]:
+            bloques.append({
+                "title": evento.title,
+                "start_time": inicio,
+                "end_time": fin,
+                "event_type": "descanso_real"
+            })
+        elif tipo in ["tarea", "tarea/estudio", "estudio", "clase", "clase/academico"]:
+            # Mantener el tiempo original del evento
+            tiempo_actual = inicio
+            while tiempo_actual + timedelta(minutes=duracion_enfoque) <= fin:
                 bloques.append({
-                    "title": evento.title,
-                    "start_time": inicio,
-                    "end_time": fin,
-                    "event_type": "descanso_real"
+                    "title": f"{evento.title} - Bloque de Estudio",
+                    "start_time": tiempo_actual,
+                    "end_time": tiempo_actual + timedelta(minutes=duracion_enfoque),
+                    "event_type": "bloque_estudio"
                 })
-            elif tipo in ["tarea", "tarea/estudio", "estudio", "clase", "clase/academico"]:
-                # Mantener el tiempo original del evento
-                tiempo_actual = inicio
-                while tiempo_actual + timedelta(minutes=duracion_enfoque) <= fin:
+                tiempo_actual += timedelta(minutes=duracion_enfoque)
+
+                # Solo agregar descanso si hay suficiente tiempo
+                tiempo_restante = (fin - tiempo_actual).total_seconds() / 60
+                if tiempo_actual < fin and tiempo_restante >= duracion_descanso:
+                    descanso_fin = min(fin, tiempo_actual + timedelta(minutes=duracion_descanso))
                     bloques.append({
-                        "title": f"{evento.title} - Bloque de Estudio",
+                        "title": f"Descanso - {evento.title}",
                         "start_time": tiempo_actual,
-                        "end_time": tiempo_actual + timedelta(minutes=duracion_enfoque),
-                        "event_type": "bloque_estudio"
+                        "end_time": descanso_fin,
+                        "event_type": "descanso_recomendado"
                     })
-                    tiempo_actual += timedelta(minutes=duracion_enfoque)
+                    tiempo_actual = descanso_fin
+        else:
+            bloques.append({
+                "title": evento.title,
+                "start_time": inicio,
+                "end_time": fin,
+                "event_type": "otro"
+            })
 
-                    # Solo agregar descanso si hay suficiente tiempo
-                    tiempo_restante = (fin - tiempo_actual).total_seconds() / 60
-                    if tiempo_actual < fin and tiempo_restante >= duracion_descanso:
-                        descanso_fin = min(fin, tiempo_actual + timedelta(minutes=duracion_descanso))
-                        bloques.append({
-                            "title": f"Descanso - {evento.title}",
-                            "start_time": tiempo_actual,
-                            "end_time": descanso_fin,
-                            "event_type": "descanso_recomendado"
-                        })
-                        tiempo_actual = descanso_fin
-            else:
-                bloques.append({
-                    "title": evento.title,
-                    "start_time": inicio,
-                    "end_time": fin,
-                    "event_type": "otro"
-                })
+    _agregar_productividad(bloques, user_tz)
+    return bloques
 
-    return bloques
\ No newline at end of file
+
+def _agregar_productividad(bloques, user_tz):
+    """Productividad estimada de cada bloque de estudio, con una sola predicción para toda la semana"""
+    from .productivity import predict_productivity, productivity_model_current, warm_up_productivity_model
+
+    estudio = [b for b in bloques if b["event_type"] == "bloque_estudio"]
+    if not estudio:
+        return
+    if not productivity_model_current():
+        # joblib, sklearn y pandas se cargan en segundo plano y no en la petición;
+        # mientras tanto los bloques se muestran sin la productividad estimada
+        from .jobs import get_executor
+        get_executor().submit(warm_up_productivity_model)
+        return
+    inicios = [b["start_time"].astimezone(user_tz) for b in estudio]
+    productividad = predict_productivity(
+        [(b["end_time"] - b["start_time"]).total_seconds() / 60 for b in estudio],
+        [inicio.hour + inicio.minute / 60 for inicio in inicios],
+        [inicio.weekday() for inicio in inicios],
+    )
+    if productividad is None:
+        return
+    for bloque, valor in zip(estudio, productividad):
+        bloque["productividad"] = round(float(valor))
\ No newline at end of file
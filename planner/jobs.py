@@ -0,0 +1,131 @@
+"""
+Ejecución en segundo plano de las optimizaciones de horario.
+
+La petición POST solo crea un OptimizationJob y lo encola en un pool de hilos del
+proceso; el cálculo corre fuera del ciclo de la petición (sin transacción abierta
+ni worker web ocupado) y el resultado queda guardado en la base de datos, de modo
+que cualquier worker puede responder la consulta de estado.
+
+El pool vive en el proceso: si el worker se reinicia a mitad de un cálculo el
+trabajo queda 'pending' o 'running' para siempre. Los que pasan JOB_TIMEOUT en
+ese estado se marcan como fallidos y ya no impiden encolar uno nuevo.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OptimizationJob
+
+# Trabajos más antiguos que esto se eliminan al encolar uno nuevo
+JOB_RETENTION = timedelta(days=1)
+# Un trabajo pendiente o en ejecución por más tiempo que esto se da por perdido
+JOB_TIMEOUT = timedelta(minutes=5)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'OPTIMIZATION_JOB_WORKERS', 2),
+                    thread_name_prefix='optimizacion',
+                )
+    return _executor
+
+
+def _prune_old_jobs(user):
+    OptimizationJob.objects.filter(
+        user=user, created_at__lt=timezone.now() - JOB_RETENTION
+    ).delete()
+
+
+def store_result(user, result):
+    """
+    Guarda un resultado calculado en la petición como un trabajo terminado y
+    devuelve su id: cualquier worker puede renderizar el modal a partir de él.
+    """
+    _prune_old_jobs(user)
+    ahora = timezone.now()
+    job = OptimizationJob.objects.create(
+        user=user, status='done', result=result, started_at=ahora, finished_at=ahora,
+    )
+    return str(job.pk)
+
+
+def get_stored_result(user, result_id):
+    """Resultado de un trabajo terminado del usuario, o None"""
+    try:
+        job_id = uuid.UUID(str(result_id))
+    except ValueError:
+        return None
+    job = OptimizationJob.objects.filter(pk=job_id, user=user, status='done').only('result').first()
+    return job.result if job is not None else None
+
+
+def expire_stale_jobs(user):
+    """Marca como fallidos los trabajos del usuario que quedaron colgados; devuelve cuántos"""
+    ahora = timezone.now()
+    limite = ahora - JOB_TIMEOUT
+    return OptimizationJob.objects.filter(user=user).filter(
+        Q(status='pending', created_at__lt=limite) | Q(status='running', started_at__lt=limite)
+    ).update(
+        status='failed',
+        error='El trabajo no terminó a tiempo (el proceso pudo reiniciarse). Intenta de nuevo.',
+        finished_at=ahora,
+    )
+
+
+def enqueue_optimization(user):
+    """
+    Crea (o reutiliza, si ya hay uno en curso) un trabajo de optimización del usuario
+    y lo envía al pool cuando la transacción actual se confirma.
+    """
+    _prune_old_jobs(user)
+    expire_stale_jobs(user)
+
+    job = OptimizationJob.objects.filter(user=user, status__in=['pending', 'running']).first()
+    if job is not None:
+        return job
+
+    job = OptimizationJob.objects.create(user=user)
+    transaction.on_commit(lambda: get_executor().submit(run_optimization_job, job.pk))
+    return job
+
+
+def run_optimization_job(job_id):
+    """Tarea del pool: calcula las sugerencias y guarda el resultado en el trabajo"""
+    from .optimization import compute_schedule_suggestions
+
+    close_old_connections()
+    try:
+        # Solo si sigue pendiente: un trabajo que ya se dio por perdido no se ejecuta
+        iniciado = OptimizationJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        if not iniciado:
+            return
+        job = OptimizationJob.objects.select_related('user').get(pk=job_id)
+
+        try:
+            job.result = compute_schedule_suggestions(job.user)
+            job.status = 'done'
+        except Exception as e:
+            print(f"Error en optimización {job_id}: {str(e)}")
+            job.error = str(e)
+            job.status = 'failed'
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    finally:
+        # Los hilos del pool no pasan por el ciclo de peticiones de Django
+        connection.close()
@@ -0,0 +1,131 @@
+"""
+Modo "compilado" del modelo del SmartScheduleOptimizer.
+
+Un ensamble de árboles solo compara cada característica contra un conjunto finito
+de umbrales, así que su salida es constante dentro de cada intervalo entre dos
+umbrales consecutivos. Al cargar el modelo se evalúa una sola vez sobre todas las
+combinaciones de intervalos (tipo, prioridad, hora, día, duración y días al
+vencimiento) y se guarda el resultado en un tensor de NumPy. Predecir pasa a ser
+ubicar cada valor en su intervalo (searchsorted) e indexar el tensor.
+
+Como el primer y el último intervalo de cada característica son abiertos, la
+tabla cubre cualquier valor de entrada y da exactamente la misma probabilidad
+que el modelo. Si la rejilla de un modelo es demasiado grande no se compila y el
+optimizador sigue usando el modelo en vivo.
+"""
+import os
+import json
+import warnings
+
+import numpy as np
+
+from planner.flat_model import atomic_output_dir
+
+LOOKUP_DIR = 'smart_scheduler_lookup'
+LOOKUP_META_FILE = 'meta.json'
+
+# Tamaño máximo del tensor (celdas float64); por encima se usa el modelo en vivo
+DEFAULT_MAX_CELLS = 5_000_000
+COMPILE_CHUNK_SIZE = 50_000
+
+
+def _tree_splits(model):
+    """Pares (feature, threshold) de todos los nodos internos del ensamble"""
+    if hasattr(model, 'children_left'):
+        # Modelo plano (planner.flat_model.FlatTreeEnsemble)
+        internos = np.asarray(model.children_left) != -1
+        return np.asarray(model.feature)[internos], np.asarray(model.threshold)[internos]
+
+    features, thresholds = [], []
+    for estimator in np.ravel(model.estimators_):
+        tree = estimator.tree_
+        internos = tree.children_left != -1
+        features.append(tree.feature[internos])
+        thresholds.append(tree.threshold[internos])
+    return np.concatenate(features), np.concatenate(thresholds)
+
+
+def _representatives(thresholds):
+    """
+    Un valor float32 dentro de cada intervalo (-inf, t0], (t0, t1], ..., (tn, inf).
+    Los árboles comparan X en float32 contra umbrales float64 con '<='.
+    """
+    valores = []
+    for umbral in thresholds:
+        valor = np.float32(umbral)
+        if valor > umbral:
+            valor = np.nextafter(valor, np.float32(-np.inf))
+        valores.append(valor)
+    ultimo = np.float32(thresholds[-1] + 1.0) if len(thresholds) else np.float32(0.0)
+    valores.append(ultimo)
+    return np.array(valores, dtype=np.float32)
+
+
+class CompiledLookupTable:
+    """Tensor de probabilidades indexado por el intervalo de cada característica"""
+
+    def __init__(self, thresholds, table):
+        self.thresholds = thresholds
+        self.table = table
+
+    @property
+    def shape(self):
+        return self.table.shape
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        indices = tuple(
+            np.searchsorted(umbrales, X[:, k], side='left')
+            for k, umbrales in enumerate(self.thresholds)
+        )
+        proba = self.table[indices]
+        return np.column_stack([1.0 - proba, proba])
+
+
+def compile_lookup_table(model, max_cells=DEFAULT_MAX_CELLS):
+    """
+    Evalúa el modelo sobre toda la rejilla de intervalos y devuelve la tabla compilada,
+    o None si la rejilla supera max_cells (en ese caso se sigue usando el modelo).
+    """
+    n_features = int(model.n_features_in_)
+    features, thresholds = _tree_splits(model)
+    umbrales = [np.unique(thresholds[features == k]) for k in range(n_features)]
+    shape = tuple(len(u) + 1 for u in umbrales)
+    if int(np.prod(shape)) > max_cells:
+        return None
+
+    representantes = [_representatives(u) for u in umbrales]
+    indices = np.indices(shape).reshape(n_features, -1)
+    grid = np.column_stack([representantes[k][indices[k]] for k in range(n_features)])
+
+    probas = np.empty(grid.shape[0], dtype=np.float64)
+    with warnings.catch_warnings():
+        # sklearn avisa que la rejilla no trae nombres de columnas; no afecta el resultado
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        for inicio in range(0, grid.shape[0], COMPILE_CHUNK_SIZE):
+            bloque = grid[inicio:inicio + COMPILE_CHUNK_SIZE]
+            probas[inicio:inicio + COMPILE_CHUNK_SIZE] = model.predict_proba(bloque)[:, 1]
+
+    return CompiledLookupTable(umbrales, probas.reshape(shape))
+
+
+def save_lookup_table(lookup, output_dir, source_sha256=None):
+    """Guarda la tabla compilada para que los workers la abran con mmap en vez de recompilarla"""
+    with atomic_output_dir(output_dir) as tmp_dir:
+        np.save(os.path.join(tmp_dir, 'table.npy'), np.ascontiguousarray(lookup.table))
+        np.savez(
+            os.path.join(tmp_dir, 'thresholds.npz'),
+            **{f'feature_{k}': umbrales for k, umbrales in enumerate(lookup.thresholds)}
+        )
+        with open(os.path.join(tmp_dir, LOOKUP_META_FILE), 'w') as f:
+            json.dump({'shape': list(lookup.shape), 'source_sha256': source_sha256}, f, indent=2)
+
+
+def load_lookup_table(model_dir, mmap_mode='r'):
+    """Devuelve (tabla, metadatos) de una tabla compilada guardada con save_lookup_table"""
+    with open(os.path.join(model_dir, LOOKUP_META_FILE), 'r') as f:
+        meta = json.load(f)
+    table = np.load(os.path.join(model_dir, 'table.npy'), mmap_mode=mmap_mode)
+    with np.load(os.path.join(model_dir, 'thresholds.npz')) as data:
+        thresholds = [data[f'feature_{k}'] for k in range(table.ndim)]
+    return CompiledLookupTable(thresholds, table), meta
@@ -0,0 +1 @@
+# Este archivo permite que Django reconozca el directorio management como un paquete Python
@@ -0,0 +1 @@
+# Este archivo permite que Django reconozca el directorio commands como un paquete Python
@@ -0,0 +1,240 @@
+"""
+Benchmark de latencia del optimizador de horarios.
+
+Crea una base de datos de prueba en SQLite, genera usuarios sintéticos con
+distintas cantidades de eventos en la semana y mide:
+
+- predict_best_schedule: predicción de un solo evento contra los eventos del usuario
+- check_time_availability: revisión de disponibilidad de una hora
+- optimize_schedule: SmartScheduleOptimizer.optimize_schedule sobre la semana
+- compute_suggestions: cálculo completo de sugerencias (lo que usa la vista)
+- view_optimize: POST /planner/optimize/ con el cliente de pruebas de Django,
+  sin caché (view_optimize_cached mide la respuesta desde la caché)
+
+Por cada medición se reportan p50/p95 en milisegundos y las llamadas al modelo
+por ejecución, y todo se guarda en un archivo JSON para comparar versiones.
+
+Uso:
+    DB_ENGINE=django.db.backends.sqlite3 python manage.py benchmark_optimizer --sizes 10,200,2000
+"""
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+DEFAULT_SIZES = '10,50,200,500,2000'
+DEFAULT_OUTPUT = 'optimizer_benchmark.json'
+
+
+def percentile(valores, q):
+    """Percentil q (0-100) por interpolación lineal, como numpy.percentile"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicion = (len(ordenados) - 1) * q / 100
+    base = int(posicion)
+    siguiente = min(base + 1, len(ordenados) - 1)
+    return ordenados[base] + (ordenados[siguiente] - ordenados[base]) * (posicion - base)
+
+
+class ModelCallCounter:
+    """Cuenta las llamadas al modelo (SmartScheduleOptimizer._predict_proba) mientras está activo"""
+
+    def __init__(self, optimizer_class):
+        self.optimizer_class = optimizer_class
+        self.calls = 0
+        self.rows = 0
+
+    def __enter__(self):
+        original = self.original = self.optimizer_class._predict_proba
+        counter = self
+
+        def contar(optimizer, X):
+            counter.calls += 1
+            counter.rows += len(X)
+            return original(optimizer, X)
+
+        self.optimizer_class._predict_proba = contar
+        return self
+
+    def __exit__(self, *exc):
+        self.optimizer_class._predict_proba = self.original
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia del optimizador de horarios con usuarios sintéticos y guarda los resultados en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                            help=f'Cantidades de eventos por usuario, separadas por coma (default: {DEFAULT_SIZES})')
+        parser.add_argument('--repeat', type=int, default=10,
+                            help='Ejecuciones medidas por benchmark (default: 10)')
+        parser.add_argument('--warmup', type=int, default=1,
+                            help='Ejecuciones previas que no se miden (default: 1)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                            help=f'Archivo JSON de resultados (default: {DEFAULT_OUTPUT})')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('El benchmark usa SQLite: ejecútalo con DB_ENGINE=django.db.backends.sqlite3')
+        try:
+            sizes = [int(n) for n in options['sizes'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError(f"--sizes inválido: {options['sizes']}")
+
+        from django.test.utils import setup_test_environment, teardown_test_environment
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = self.run_benchmarks(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {options['output']}"))
+
+    def run_benchmarks(self, sizes, options):
+        from planner.ai_optimizer import SmartScheduleOptimizer
+        from planner.model_registry import get_model_registry
+        from planner.user_models import get_user_model_cache
+
+        optimizer = SmartScheduleOptimizer()
+        if not optimizer.is_loaded:
+            raise CommandError('El modelo del optimizador no está disponible')
+
+        self.repeat = max(1, options['repeat'])
+        self.warmup = max(0, options['warmup'])
+        self.optimizer_class = SmartScheduleOptimizer
+        random.seed(options['seed'])
+
+        results = []
+        for size in sizes:
+            user = self.create_user(size)
+            self.stdout.write(f"👤 Usuario con {size} eventos")
+            for result in self.benchmark_user(user, optimizer):
+                result['events'] = size
+                results.append(result)
+                self.stdout.write(
+                    f"  {result['benchmark']:<24} p50 {result['p50_ms']:>9.2f} ms   "
+                    f"p95 {result['p95_ms']:>9.2f} ms   llamadas al modelo {result['model_calls_per_run']:.2f}"
+                )
+
+        registry = get_model_registry().stats()
+        return {
+            'generated_at': timezone.now().isoformat(),
+            'git_commit': self.git_commit(),
+            'python': platform.python_version(),
+            'model_version': registry['version'],
+            'engine': registry['engine'],
+            'compiled': registry['compiled'],
+            'slot_minutes': getattr(settings, 'SMART_SCHEDULER_SLOT_MINUTES', None),
+            'user_models': get_user_model_cache().stats(),
+            'repeat': self.repeat,
+            'warmup': self.warmup,
+            'results': results,
+        }
+
+    def create_user(self, size):
+        """Usuario con `size` eventos pendientes repartidos en los próximos 7 días"""
+        from django.contrib.auth.models import User
+        from planner.models import Event
+
+        user = User.objects.create_user(f'bench_{size}_{random.randint(0, 10**9)}', password='bench')
+        hoy = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+        tipos = [choice for choice, _ in Event.EVENT_TYPE_CHOICES]
+        prioridades = [choice for choice, _ in Event.PRIORITY_CHOICES]
+        eventos = []
+        for i in range(size):
+            inicio = hoy.replace(hour=random.randint(6, 21)) + timedelta(days=random.randint(0, 6),
+                                                                      minutes=random.choice([0, 15, 30, 45]))
+            eventos.append(Event(
+                user=user,
+                title=f'Evento {i}',
+                event_type=random.choice(tipos),
+                priority=random.choice(prioridades),
+                start_time=inicio,
+                end_time=inicio + timedelta(minutes=random.choice([30, 60, 90, 120])),
+                due_date=(inicio + timedelta(days=random.randint(0, 5))).date() if random.random() < 0.5 else None,
+            ))
+        Event.objects.bulk_create(eventos, batch_size=500)
+        return user
+
+    def measure(self, name, func):
+        for _ in range(self.warmup):
+            func()
+        tiempos = []
+        with ModelCallCounter(self.optimizer_class) as counter:
+            for _ in range(self.repeat):
+                inicio = time.perf_counter()
+                func()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+        return {
+            'benchmark': name,
+            'runs': len(tiempos),
+            'p50_ms': round(percentile(tiempos, 50), 3),
+            'p95_ms': round(percentile(tiempos, 95), 3),
+            'mean_ms': round(sum(tiempos) / len(tiempos), 3),
+            'min_ms': round(min(tiempos), 3),
+            'max_ms': round(max(tiempos), 3),
+            'model_calls_per_run': counter.calls / len(tiempos),
+            'model_rows_per_run': counter.rows / len(tiempos),
+        }
+
+    def benchmark_user(self, user, optimizer):
+        from django.test import Client
+        from planner.date_windows import date_window
+        from planner.models import Event
+        from planner.optimization import compute_schedule_suggestions
+        from planner.suggestion_cache import invalidate_user_suggestions
+
+        hoy = timezone.localdate()
+        semana = Event.objects.filter(user=user, **date_window(hoy, hoy + timedelta(days=7)))
+        eventos = list(semana)
+        objetivo = eventos[0]
+        event_data = optimizer.event_to_data(objetivo, hoy)
+        client = Client()
+        client.force_login(user)
+        url = reverse('planner:optimize_schedule')
+
+        def sin_cache(func):
+            def ejecutar():
+                invalidate_user_suggestions(user.pk)
+                return func()
+            return ejecutar
+
+        def post_optimize():
+            response = client.post(url, data='{}', content_type='application/json')
+            if response.status_code != 200 or not response.json().get('success'):
+                raise CommandError(f'La vista respondió {response.status_code}: {response.content[:200]!r}')
+
+        return [
+            self.measure('predict_best_schedule', lambda: optimizer.predict_best_schedule(event_data, eventos)),
+            self.measure('check_time_availability', lambda: optimizer._check_time_availability(
+                10, event_data['duration'], hoy, eventos)),
+            self.measure('optimize_schedule', lambda: optimizer.optimize_schedule(
+                semana.filter(is_completed=False), hoy, hoy + timedelta(days=7))),
+            self.measure('compute_suggestions', sin_cache(lambda: compute_schedule_suggestions(user))),
+            self.measure('view_optimize', sin_cache(post_optimize)),
+            self.measure('view_optimize_cached', post_optimize),
+        ]
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=10,
+            ).stdout.strip() or None
+        except Exception:
+            return None
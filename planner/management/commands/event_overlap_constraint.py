@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from planner.overlaps import EXCLUSION_CONSTRAINT_NAME, RANGE_SQL, supports_ranges
+
+
+class Command(BaseCommand):
+    help = 'Agrega (o quita con --disable) la restricción que impide eventos superpuestos de un mismo usuario (solo PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--disable', action='store_true',
+                            help='Quitar la restricción y volver a permitir eventos superpuestos')
+
+    def handle(self, *args, **options):
+        if not supports_ranges():
+            raise CommandError('La restricción de exclusión necesita PostgreSQL')
+
+        with connection.cursor() as cursor:
+            if options['disable']:
+                cursor.execute(f'ALTER TABLE planner_event DROP CONSTRAINT IF EXISTS {EXCLUSION_CONSTRAINT_NAME}')
+                self.stdout.write(self.style.SUCCESS('✅ Restricción de eventos superpuestos eliminada'))
+                return
+
+            # Los eventos que ya se cruzan impedirían crear la restricción
+            cursor.execute("""
+                SELECT count(*) FROM planner_event a JOIN planner_event b
+                  ON a.user_id = b.user_id AND a.id < b.id
+                 AND tstzrange(a.start_time, a.end_time, '[)') && tstzrange(b.start_time, b.end_time, '[)')
+            """)
+            superpuestos = cursor.fetchone()[0]
+            if superpuestos:
+                raise CommandError(f'Hay {superpuestos} pares de eventos superpuestos; hay que moverlos antes de activar la restricción')
+
+            cursor.execute(f"""
+                ALTER TABLE planner_event ADD CONSTRAINT {EXCLUSION_CONSTRAINT_NAME}
+                EXCLUDE USING gist (user_id WITH =, {RANGE_SQL} WITH &&)
+            """)
+        self.stdout.write(self.style.SUCCESS('✅ Los eventos superpuestos de un mismo usuario ahora se rechazan'))
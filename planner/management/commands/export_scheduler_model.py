@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+import joblib
+import os
+
+from planner.flat_model import FLAT_MODEL_DIR, export_flat_model, file_sha256, preprocessing_to_dict
+from planner.lookup_table import LOOKUP_DIR, compile_lookup_table, save_lookup_table
+from planner.model_registry import DEFAULT_MODEL_PATH, MODEL_FILE, ENCODERS_FILE, SCALER_FILE
+
+
+class Command(BaseCommand):
+    help = 'Exporta el modelo del optimizador (arreglos planos, encoders y tabla compilada) para servirlo solo con NumPy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model-path',
+            default=DEFAULT_MODEL_PATH,
+            help='Carpeta con los artefactos del modelo (default: planner/trained_models)',
+        )
+        parser.add_argument('--no-lookup', action='store_true',
+                            help='No compilar la tabla de probabilidades (modelos por usuario)')
+
+    def handle(self, *args, **options):
+        model_path = options['model_path']
+        model_file = os.path.join(model_path, MODEL_FILE)
+        if not os.path.exists(model_file):
+            raise CommandError(f'No se encontró el modelo en {model_file}')
+
+        encoders_file = os.path.join(model_path, ENCODERS_FILE)
+        scaler_file = os.path.join(model_path, SCALER_FILE)
+        for path in (encoders_file, scaler_file):
+            if not os.path.exists(path):
+                raise CommandError(f'No se encontró {path}')
+
+        model = joblib.load(model_file)
+        preprocessing = preprocessing_to_dict(
+            model, joblib.load(encoders_file), joblib.load(scaler_file),
+            encoders_file=encoders_file, scaler_file=scaler_file,
+        )
+        output_dir = os.path.join(model_path, FLAT_MODEL_DIR)
+        meta = export_flat_model(model, output_dir, source_file=model_file, preprocessing=preprocessing)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Modelo exportado en {output_dir}\n'
+                f'- {meta["n_trees"]} árboles, {meta["n_nodes"]} nodos'
+            )
+        )
+
+        if options['no_lookup']:
+            return
+
+        lookup = compile_lookup_table(model)
+        if lookup is None:
+            self.stdout.write(self.style.WARNING('⚠️ La rejilla del modelo es demasiado grande para compilarla'))
+            return
+
+        lookup_dir = os.path.join(model_path, LOOKUP_DIR)
+        save_lookup_table(lookup, lookup_dir, source_sha256=file_sha256(model_file))
+        self.stdout.write(self.style.SUCCESS(f'✅ Tabla compilada {lookup.shape} guardada en {lookup_dir}'))
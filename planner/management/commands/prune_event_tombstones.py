@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from planner.event_sync import TOMBSTONE_RETENTION, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Borra los registros de eventos eliminados más viejos que la retención de la sincronización incremental'
+
+    def handle(self, *args, **options):
+        borrados = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {borrados} eventos eliminados de más de {TOMBSTONE_RETENTION.days} días borrados"
+        ))
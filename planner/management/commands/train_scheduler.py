@@ -0,0 +1,116 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.model_registry import DEFAULT_MODEL_PATH
+from planner.scheduler_training import (
+    build_metadata, next_version, publish_version, read_metadata, save_version,
+    stream_training_arrays, train_scheduler_model, users_with_history,
+)
+from planner.user_models import USER_MODEL_PARAMS, focus_hours_from_history, user_model_path
+
+
+class Command(BaseCommand):
+    help = 'Entrena el modelo del optimizador con el historial de eventos y bloques de estudio y publica una nueva versión'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model-path',
+            default=DEFAULT_MODEL_PATH,
+            help='Carpeta con los artefactos del modelo (default: planner/trained_models)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Filas por lectura de la base de datos (default: 2000)')
+        parser.add_argument('--min-rows', type=int, default=200,
+                            help='Mínimo de filas de historial para entrenar (default: 200)')
+        parser.add_argument('--max-rows', type=int, default=1_000_000,
+                            help='Máximo de filas usadas para entrenar; si hay más se toma una muestra (default: 1000000)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-publish', action='store_true',
+                            help='Solo guardar la versión en versions/ sin reemplazar el modelo en uso')
+        parser.add_argument('--per-user', action='store_true',
+                            help='Entrenar un modelo propio para cada usuario con suficiente historial')
+        parser.add_argument('--user', type=int,
+                            help='Entrenar solo el modelo propio de este usuario (id)')
+        parser.add_argument('--min-user-rows', type=int, default=50,
+                            help='Mínimo de filas de historial de un usuario para su modelo propio (default: 50)')
+
+    def handle(self, *args, **options):
+        if options['per_user'] or options['user'] is not None:
+            return self.handle_per_user(options)
+
+        model_path = options['model_path']
+
+        arrays, sources = stream_training_arrays(chunk_size=options['chunk_size'], log=self.stdout.write)
+        if len(arrays) < options['min_rows']:
+            raise CommandError(
+                f"Historial insuficiente: {len(arrays)} filas (se necesitan al menos {options['min_rows']})"
+            )
+
+        self.stdout.write(f"🧠 Entrenando con {min(len(arrays), options['max_rows'])} de {len(arrays)} filas...")
+        try:
+            model, encoders, scaler, metricas = train_scheduler_model(
+                arrays, max_rows=options['max_rows'], seed=options['seed']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        del arrays
+
+        version = next_version(model_path)
+        metadata = build_metadata(read_metadata(model_path), version, sources, metricas, None)
+
+        def export(carpeta):
+            call_command('export_scheduler_model', model_path=carpeta, stdout=self.stdout)
+
+        version_dir = save_version(model, encoders, scaler, metadata, model_path=model_path, export=export)
+        self.stdout.write(self.style.SUCCESS(f'✅ Versión {version} guardada en {version_dir}'))
+        validation = metricas['validation_accuracy']
+        self.stdout.write(
+            f"- Exactitud entrenamiento: {metricas['train_accuracy']:.3f}"
+            + (f" | validación: {validation:.3f}" if validation is not None else '')
+        )
+
+        if options['no_publish']:
+            return
+        publish_version(version_dir, model_path=model_path)
+        self.stdout.write(self.style.SUCCESS(f'✅ Versión {version} publicada en {model_path}'))
+
+    def handle_per_user(self, options):
+        """Modelos chicos por usuario en trained_models/users/<id>/ (sin tabla compilada)"""
+        min_rows = options['min_user_rows']
+        if options['user'] is not None:
+            user_ids = [options['user']]
+        else:
+            user_ids = users_with_history(min_rows)
+            self.stdout.write(f"👥 {len(user_ids)} usuarios con al menos {min_rows} filas de historial")
+
+        def export(carpeta):
+            call_command('export_scheduler_model', model_path=carpeta, no_lookup=True, stdout=self.stdout)
+
+        for user_id in user_ids:
+            arrays, sources = stream_training_arrays(chunk_size=options['chunk_size'], user_id=user_id)
+            if len(arrays) < min_rows:
+                self.stdout.write(f"⚠️ Usuario {user_id}: historial insuficiente ({len(arrays)} filas)")
+                continue
+            try:
+                model, encoders, scaler, metricas = train_scheduler_model(
+                    arrays, params=USER_MODEL_PARAMS, max_rows=options['max_rows'], seed=options['seed']
+                )
+            except ValueError as e:
+                self.stdout.write(f"⚠️ Usuario {user_id}: {str(e)}")
+                continue
+
+            carpeta = user_model_path(user_id, options['model_path'])
+            columns = arrays.columns()
+            metadata = build_metadata(
+                read_metadata(carpeta), next_version(carpeta), sources, metricas, USER_MODEL_PARAMS
+            )
+            metadata['user_id'] = user_id
+            metadata['focus_hours'] = focus_hours_from_history(columns['start_hour'], columns['label'])
+
+            version_dir = save_version(model, encoders, scaler, metadata, model_path=carpeta, export=export)
+            if not options['no_publish']:
+                publish_version(version_dir, model_path=carpeta)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Usuario {user_id}: versión {metadata['version']} ({len(arrays)} filas, "
+                f"concentración {metadata['focus_hours']})"
+            ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from planner.feedback import FEEDBACK_MIN_UPDATE, FEEDBACK_TREES, incremental_update
+from planner.model_registry import DEFAULT_MODEL_PATH
+
+
+class Command(BaseCommand):
+    help = 'Actualiza el modelo del optimizador con las respuestas nuevas a las sugerencias, sin reentrenarlo completo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model-path',
+            default=DEFAULT_MODEL_PATH,
+            help='Carpeta con los artefactos del modelo (default: planner/trained_models)',
+        )
+        parser.add_argument('--min-rows', type=int, default=FEEDBACK_MIN_UPDATE,
+                            help=f'Mínimo de respuestas nuevas para actualizar (default: {FEEDBACK_MIN_UPDATE})')
+        parser.add_argument('--trees', type=int, default=FEEDBACK_TREES,
+                            help=f'Árboles que se agregan al modelo (default: {FEEDBACK_TREES})')
+        parser.add_argument('--no-publish', action='store_true',
+                            help='Solo guardar la versión en versions/ sin reemplazar el modelo en uso')
+
+    def handle(self, *args, **options):
+        def export(carpeta):
+            from django.core.management import call_command
+            call_command('export_scheduler_model', model_path=carpeta, stdout=self.stdout)
+
+        metadata = incremental_update(
+            model_path=options['model_path'],
+            min_rows=options['min_rows'],
+            n_trees=options['trees'],
+            export=export,
+            publish=not options['no_publish'],
+            log=self.stdout.write,
+        )
+        if metadata is None:
+            self.stdout.write('Sin cambios en el modelo')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Versión {metadata['version']} | respuestas acumuladas: {metadata['feedback_count']}"
+        ))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0002_optimizationjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionFeedback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=20, verbose_name='Tipo de Evento')),
+                ('priority', models.CharField(max_length=10, verbose_name='Prioridad')),
+                ('duration', models.FloatField(verbose_name='Duración (horas)')),
+                ('suggested_hour', models.FloatField(verbose_name='Hora Sugerida')),
+                ('weekday', models.PositiveSmallIntegerField(verbose_name='Día de la Semana')),
+                ('days_to_deadline', models.PositiveSmallIntegerField(default=999, verbose_name='Días al Vencimiento')),
+                ('accepted', models.BooleanField(verbose_name='Aceptada')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestion_feedback', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Respuesta a Sugerencia',
+                'verbose_name_plural': 'Respuestas a Sugerencias',
+            },
+        ),
+    ]
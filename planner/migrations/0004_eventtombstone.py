@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0003_suggestionfeedback'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.BigIntegerField(verbose_name='Evento')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Eliminación')),
+            ],
+            options={
+                'verbose_name': 'Evento Eliminado',
+                'verbose_name_plural': 'Eventos Eliminados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'updated_at'], name='planner_event_user_upd_idx'),
+        ),
+        migrations.AddField(
+            model_name='eventtombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_tombstones', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='eventtombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='planner_tomb_user_del_idx'),
+        ),
+    ]
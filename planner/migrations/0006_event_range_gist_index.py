@@ -0,0 +1,54 @@
+from django.db import migrations
+from django.db.models import F
+
+# Deben coincidir con planner/overlaps.py
+GIST_INDEX_NAME = 'planner_event_user_range_gist'
+RANGE_SQL = "tstzrange(start_time, end_time, '[)')"
+MAX_REPORTED_IDS = 50
+
+
+def check_inverted_times(apps, schema_editor):
+    """
+    tstzrange() falla si end_time < start_time: el índice no se crea si hay eventos así.
+    Los datos no se cambian: se informa qué eventos hay que corregir a mano.
+    """
+    Event = apps.get_model('planner', 'Event')
+    ids = list(
+        Event.objects.filter(end_time__lt=F('start_time')).order_by('pk').values_list('pk', flat=True)
+    )
+    if ids:
+        muestra = ', '.join(str(pk) for pk in ids[:MAX_REPORTED_IDS])
+        resto = f' y {len(ids) - MAX_REPORTED_IDS} más' if len(ids) > MAX_REPORTED_IDS else ''
+        raise RuntimeError(
+            f'{len(ids)} evento(s) de planner_event tienen end_time anterior a start_time '
+            f'(ids: {muestra}{resto}). Corrige sus horarios y vuelve a ejecutar migrate.'
+        )
+
+
+def create_range_index(apps, schema_editor):
+    # Solo PostgreSQL tiene tstzrange e índices GiST; en SQLite se consulta por columnas
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # btree_gist permite incluir user_id (igualdad) en el mismo índice GiST que el rango
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {GIST_INDEX_NAME} ON planner_event USING gist (user_id, {RANGE_SQL})'
+    )
+
+
+def drop_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {GIST_INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0005_event_window_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_inverted_times, migrations.RunPython.noop),
+        migrations.RunPython(create_range_index, drop_range_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0006_event_range_gist_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Último Inicio de la Serie'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_exdates',
+            field=models.JSONField(blank=True, default=list, verbose_name='Ocurrencias Canceladas'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_id',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Inicio Original de la Ocurrencia'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='overrides', to='planner.event', verbose_name='Serie'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_rule',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Regla de Repetición'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('recurrence_rule', ''), _negated=True), fields=['user', 'recurrence_end'], name='planner_event_series_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('recurrence_parent', 'recurrence_id'), name='planner_event_unique_override'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+MAX_REPORTED_IDS = 50
+
+
+def check_inverted_times(apps, schema_editor):
+    """
+    Igual que en 0006: la restricción no se agrega si hay eventos con el fin antes del inicio.
+    Los datos no se cambian: se informa qué eventos hay que corregir a mano.
+    """
+    Event = apps.get_model('planner', 'Event')
+    ids = list(
+        Event.objects.filter(end_time__lt=F('start_time')).order_by('pk').values_list('pk', flat=True)
+    )
+    if ids:
+        muestra = ', '.join(str(pk) for pk in ids[:MAX_REPORTED_IDS])
+        resto = f' y {len(ids) - MAX_REPORTED_IDS} más' if len(ids) > MAX_REPORTED_IDS else ''
+        raise RuntimeError(
+            f'{len(ids)} evento(s) de planner_event tienen end_time anterior a start_time '
+            f'(ids: {muestra}{resto}). Corrige sus horarios y vuelve a ejecutar migrate.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0007_recurring_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_inverted_times, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.CheckConstraint(condition=models.Q(('end_time__gte', models.F('start_time'))), name='planner_event_end_after_start'),
+        ),
+    ]
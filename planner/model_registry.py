@@ -0,0 +1,303 @@
+import os
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+
+from planner.flat_model import FLAT_MODEL_DIR, FLAT_META_FILE, file_sha256, load_flat_model, load_preprocessing
+from planner.lookup_table import LOOKUP_DIR, LOOKUP_META_FILE, compile_lookup_table, load_lookup_table
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = 'smart_scheduler_model.joblib'
+ENCODERS_FILE = 'smart_scheduler_encoders.joblib'
+SCALER_FILE = 'smart_scheduler_scaler.joblib'
+METADATA_FILE = 'smart_scheduler_metadata.json'
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'trained_models')
+
+
+@dataclass(frozen=True)
+class ModelArtifacts:
+    """Conjunto inmutable de artefactos cargados; se reemplaza completo en cada recarga"""
+    model: object
+    encoders: dict
+    scaler: object
+    lookup: object = None
+    # Encoders y scaler como tablas de NumPy (planner.flat_model.FlatPreprocessor)
+    preprocessor: object = None
+    metadata: dict = field(default_factory=dict)
+    signature: tuple = ()
+    load_seconds: float = 0.0
+    loaded_at: datetime = None
+
+    @property
+    def version(self):
+        return self.metadata.get('version') if self.metadata else None
+
+    @property
+    def engine(self):
+        return 'numpy' if self.preprocessor is not None else 'sklearn'
+
+    @property
+    def nbytes(self):
+        """
+        Memoria aproximada de los arreglos de NumPy del modelo, la tabla compilada y
+        los encoders (los objetos de sklearn solo se cuentan por sus arreglos visibles)
+        """
+        total = 0
+        pendientes = [self.model, self.lookup, self.preprocessor]
+        vistos = set()
+        while pendientes:
+            obj = pendientes.pop()
+            if obj is None or id(obj) in vistos or isinstance(obj, (str, bytes, int, float)):
+                continue
+            vistos.add(id(obj))
+            if isinstance(obj, np.ndarray):
+                total += obj.nbytes
+            elif isinstance(obj, (list, tuple)):
+                pendientes.extend(obj)
+            elif isinstance(obj, dict):
+                pendientes.extend(obj.values())
+            elif hasattr(obj, '__dict__'):
+                pendientes.extend(vars(obj).values())
+        return total
+
+
+class ModelRegistry:
+    """
+    Registro por proceso de los artefactos del SmartScheduleOptimizer.
+
+    Los archivos se cargan una sola vez y se comparten entre peticiones e hilos.
+    En cada acceso se revisa (con os.stat) si cambiaron los artefactos o la versión
+    en los metadatos; si es así se cargan de nuevo y se reemplazan de forma atómica.
+
+    Si existe una exportación plana del modelo (ver planner.flat_model) que
+    corresponde al .joblib actual, se usa esa versión mapeada en memoria para que
+    los workers del servidor compartan los arreglos del modelo. Si la exportación
+    incluye también los encoders y el scaler, el modelo se sirve solo con NumPy
+    (motor 'numpy') y no se cargan joblib ni sklearn.
+
+    Con settings.SMART_SCHEDULER_COMPILED activo también se prepara la tabla de
+    probabilidades precalculada (ver planner.lookup_table).
+    """
+
+    def __init__(self, model_path=None, compiled=None):
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        # None: según settings.SMART_SCHEDULER_COMPILED
+        self.compiled = compiled
+        self._artifacts = None
+        self._lock = threading.Lock()
+        self.reload_count = 0
+
+    def _path(self, filename):
+        return os.path.join(self.model_path, filename)
+
+    def _artifact_files(self):
+        return [self._path(MODEL_FILE), self._path(ENCODERS_FILE), self._path(SCALER_FILE)]
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _signature(self):
+        """
+        Huella (mtime y tamaño) de los archivos: (artefactos, metadatos).
+        Devuelve None si falta alguno de los artefactos obligatorios.
+        """
+        artefactos = [self._stat(path) for path in self._artifact_files()]
+        if None in artefactos:
+            return None
+        artefactos.append(self._stat(os.path.join(self._path(FLAT_MODEL_DIR), FLAT_META_FILE)))
+        artefactos.append(self._stat(os.path.join(self._path(LOOKUP_DIR), LOOKUP_META_FILE)))
+        return (tuple(artefactos), self._stat(self._path(METADATA_FILE)))
+
+    def _read_metadata(self):
+        metadata_file = self._path(METADATA_FILE)
+        if not os.path.exists(metadata_file):
+            return {}
+        with open(metadata_file, 'r') as f:
+            return json.load(f)
+
+    def _load(self, signature):
+        inicio = time.perf_counter()
+        model = self._load_flat_model()
+        preprocessor = self._load_preprocessor() if model is not None else None
+        encoders = scaler = None
+        if preprocessor is None:
+            # Sin la exportación completa se usan los objetos de sklearn
+            import joblib
+            if model is None:
+                model = joblib.load(self._path(MODEL_FILE))
+            encoders = joblib.load(self._path(ENCODERS_FILE))
+            scaler = joblib.load(self._path(SCALER_FILE))
+        lookup = self._load_lookup_table(model)
+        metadata = self._read_metadata()
+        artifacts = ModelArtifacts(
+            model=model,
+            encoders=encoders,
+            scaler=scaler,
+            lookup=lookup,
+            preprocessor=preprocessor,
+            metadata=metadata,
+            signature=signature,
+            load_seconds=time.perf_counter() - inicio,
+            loaded_at=datetime.now(),
+        )
+
+        print(f"✅ Modelo cargado exitosamente desde {self.model_path} (motor {artifacts.engine})")
+        if metadata:
+            print(f"📊 Versión del modelo: {metadata.get('version', 'N/A')}")
+            print(f"📅 Entrenado el: {metadata.get('trained_date', 'N/A')}")
+        return artifacts
+
+    def _load_flat_model(self):
+        """Modelo plano mapeado en memoria, o None si no existe o no coincide con el .joblib"""
+        flat_dir = self._path(FLAT_MODEL_DIR)
+        if not os.path.exists(os.path.join(flat_dir, FLAT_META_FILE)):
+            return None
+        try:
+            model = load_flat_model(flat_dir, mmap_mode='r')
+        except Exception as e:
+            logger.warning(f"No se pudo abrir el modelo plano en {flat_dir}: {str(e)}")
+            return None
+        if model.meta.get('source_sha256') != file_sha256(self._path(MODEL_FILE)):
+            logger.warning(f"El modelo plano en {flat_dir} no corresponde al modelo actual; se usa el .joblib")
+            return None
+        return model
+
+    def _load_preprocessor(self):
+        """Encoders y scaler exportados junto al modelo plano, si corresponden a los .joblib actuales"""
+        flat_dir = self._path(FLAT_MODEL_DIR)
+        try:
+            preprocessor = load_preprocessing(flat_dir)
+        except Exception as e:
+            logger.warning(f"No se pudieron abrir los encoders exportados en {flat_dir}: {str(e)}")
+            return None
+        if preprocessor is None:
+            return None
+        if (preprocessor.data.get('encoders_sha256') != file_sha256(self._path(ENCODERS_FILE))
+                or preprocessor.data.get('scaler_sha256') != file_sha256(self._path(SCALER_FILE))):
+            logger.warning(f"Los encoders exportados en {flat_dir} no corresponden a los actuales; se usa sklearn")
+            return None
+        return preprocessor
+
+    def _load_lookup_table(self, model):
+        """Tabla compilada guardada junto al modelo, o compilada en el momento si no existe"""
+        compiled = self.compiled if self.compiled is not None else getattr(settings, 'SMART_SCHEDULER_COMPILED', True)
+        if not compiled:
+            return None
+
+        lookup_dir = self._path(LOOKUP_DIR)
+        if os.path.exists(os.path.join(lookup_dir, LOOKUP_META_FILE)):
+            try:
+                lookup, meta = load_lookup_table(lookup_dir, mmap_mode='r')
+                if meta.get('source_sha256') == file_sha256(self._path(MODEL_FILE)):
+                    return lookup
+                logger.warning(f"La tabla compilada en {lookup_dir} no corresponde al modelo actual")
+            except Exception as e:
+                logger.warning(f"No se pudo abrir la tabla compilada en {lookup_dir}: {str(e)}")
+
+        inicio = time.perf_counter()
+        lookup = compile_lookup_table(model)
+        if lookup is None:
+            logger.warning("La rejilla del modelo es demasiado grande; se usará el modelo en vivo")
+        else:
+            print(f"⚙️ Tabla compilada {lookup.shape} en {time.perf_counter() - inicio:.2f}s")
+        return lookup
+
+    def _needs_reload(self, current, signature):
+        if current is None:
+            return True
+        if signature == current.signature:
+            return False
+        # Cambió algún artefacto: recarga completa
+        if signature[0] != current.signature[0]:
+            return True
+        # Solo cambiaron los metadatos: recargar únicamente si cambió la versión
+        return self._read_metadata().get('version') != current.version
+
+    def get(self):
+        """Devuelve los artefactos vigentes, cargándolos o recargándolos si es necesario"""
+        signature = self._signature()
+        if signature is None:
+            print(f"❌ No se encontraron todos los archivos del modelo en {self.model_path}")
+            return None
+
+        current = self._artifacts
+        if current is not None and signature == current.signature:
+            return current
+
+        with self._lock:
+            current = self._artifacts
+            if current is not None and signature == current.signature:
+                return current
+
+            if self._needs_reload(current, signature):
+                self._artifacts = self._load(signature)
+                self.reload_count += 1
+            else:
+                # Mismo modelo y misma versión: solo se actualizan los metadatos
+                self._artifacts = ModelArtifacts(
+                    model=current.model,
+                    encoders=current.encoders,
+                    scaler=current.scaler,
+                    lookup=current.lookup,
+                    preprocessor=current.preprocessor,
+                    metadata=self._read_metadata(),
+                    signature=signature,
+                    load_seconds=current.load_seconds,
+                    loaded_at=current.loaded_at,
+                )
+            return self._artifacts
+
+    def invalidate(self):
+        """Descarta los artefactos cargados; el próximo get() los vuelve a leer del disco"""
+        with self._lock:
+            self._artifacts = None
+
+    @property
+    def version(self):
+        return self._artifacts.version if self._artifacts else None
+
+    @property
+    def load_seconds(self):
+        return self._artifacts.load_seconds if self._artifacts else None
+
+    @property
+    def loaded_at(self):
+        return self._artifacts.loaded_at if self._artifacts else None
+
+    def stats(self):
+        return {
+            'model_path': self.model_path,
+            'loaded': self._artifacts is not None,
+            'compiled': self._artifacts is not None and self._artifacts.lookup is not None,
+            'engine': self._artifacts.engine if self._artifacts else None,
+            'version': self.version,
+            'load_seconds': self.load_seconds,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'reload_count': self.reload_count,
+        }
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(model_path=None):
+    """Registro compartido del proceso para la carpeta de modelos indicada"""
+    model_path = os.path.abspath(model_path or DEFAULT_MODEL_PATH)
+    registry = _registries.get(model_path)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(model_path, ModelRegistry(model_path))
+    return registry
@@ -4,6 +4,12 @@ from django.core.exceptions import ValidationError
 from datetime import timedelta
 from django.utils import timezone
 from django.contrib.auth.models import User
+import uuid
+
+from .recurrence import RecurrenceRule, parse_exdates, series_end
+
+END_AFTER_START_CONSTRAINT = "planner_event_end_after_start"
+
 
 class Event(models.Model):
     """
@@ -70,6 +76,27 @@ class Event(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name="Última Actualización"
     )
+    # Repetición (ver planner/recurrence.py): una serie se guarda una sola vez
+    recurrence_rule = models.CharField(
+        max_length=255, blank=True, default="", verbose_name="Regla de Repetición"
+    )
+    recurrence_end = models.DateTimeField(
+        blank=True, null=True, editable=False, verbose_name="Último Inicio de la Serie"
+    )
+    recurrence_exdates = models.JSONField(
+        blank=True, default=list, verbose_name="Ocurrencias Canceladas"
+    )
+    recurrence_parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="overrides",
+        verbose_name="Serie",
+    )
+    recurrence_id = models.DateTimeField(
+        blank=True, null=True, verbose_name="Inicio Original de la Ocurrencia"
+    )
 
     class Meta:
         verbose_name = "Evento"
@@ -78,12 +105,97 @@ class Event(models.Model):
             "start_time",
             "priority",
         ]  # Ordenar eventos por hora de inicio y luego prioridad
+        indexes = [
+            # Eventos de un rango de fechas (planner/date_windows.py)
+            models.Index(fields=["user", "start_time"], name="planner_event_user_start_idx"),
+            models.Index(fields=["user", "is_completed", "start_time"], name="planner_event_user_done_idx"),
+            # Cambios desde un cursor (planner/event_sync.py)
+            models.Index(fields=["user", "updated_at"], name="planner_event_user_upd_idx"),
+            # Series activas en una ventana (planner/recurrence.py)
+            models.Index(
+                fields=["user", "recurrence_end"],
+                condition=~models.Q(recurrence_rule=""),
+                name="planner_event_series_idx",
+            ),
+        ]
+        constraints = [
+            # Una sola modificación por ocurrencia de una serie
+            models.UniqueConstraint(
+                fields=["recurrence_parent", "recurrence_id"],
+                name="planner_event_unique_override",
+            ),
+            # tstzrange(start_time, end_time) (planner/overlaps.py) falla si el fin es anterior al inicio
+            models.CheckConstraint(
+                condition=models.Q(end_time__gte=models.F("start_time")),
+                name=END_AFTER_START_CONSTRAINT,
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.user.username})"
 
+    def get_constraints(self):
+        # clean() ya exige que el fin sea posterior al inicio; así full_clean no
+        # hace una consulta a la base de datos para revisar la misma condición
+        return [
+            (model, [c for c in constraints if c.name != END_AFTER_START_CONSTRAINT])
+            for model, constraints in super().get_constraints()
+        ]
+
+    @property
+    def is_recurring(self):
+        return bool(self.recurrence_rule)
+
+    def save(self, *args, **kwargs):
+        if getattr(self, "is_occurrence", False):
+            raise ValueError("Una ocurrencia generada no se guarda: usa detach_occurrence() en la serie")
+        if self.recurrence_rule:
+            self.recurrence_rule = str(RecurrenceRule.parse(self.recurrence_rule))
+            self.recurrence_end = series_end(self.recurrence_rule, self.start_time)
+        else:
+            self.recurrence_end = None
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"recurrence_rule", "recurrence_end"}
+        super().save(*args, **kwargs)
+
+    def detach_occurrence(self, original_start):
+        """
+        Evento propio para una ocurrencia de la serie (para moverla, completarla o
+        editarla sin cambiar las demás). Si ya existe se devuelve el mismo.
+        """
+        duracion = self.end_time - self.start_time
+        desfase = original_start - self.start_time
+        override, _ = Event.objects.get_or_create(
+            recurrence_parent=self,
+            recurrence_id=original_start,
+            defaults={
+                "user_id": self.user_id,
+                "title": self.title,
+                "description": self.description,
+                "event_type": self.event_type,
+                "priority": self.priority,
+                "category": self.category,
+                "start_time": original_start,
+                "end_time": original_start + duracion,
+                "due_date": self.due_date + timedelta(days=desfase.days) if self.due_date else None,
+                "is_completed": self.is_completed,
+            },
+        )
+        return override
+
+    def cancel_occurrence(self, original_start):
+        """Excepción: la ocurrencia que empieza en original_start ya no se muestra"""
+        if original_start not in parse_exdates(self.recurrence_exdates):
+            self.recurrence_exdates = self.recurrence_exdates + [original_start.isoformat()]
+            self.save(update_fields=["recurrence_exdates", "updated_at"])
+
     def clean(self):
         errors = {}
+        if self.recurrence_rule:
+            try:
+                RecurrenceRule.parse(self.recurrence_rule)
+            except ValueError as e:
+                errors["recurrence_rule"] = str(e)
         # Validar que ambos campos de tiempo existan antes de compararlos
         if self.start_time and self.end_time:
             # Validar que la hora de fin sea posterior a la de inicio
@@ -138,3 +250,105 @@ class BloqueEstudio(models.Model):
 
     def __str__(self):
         return f"{self.usuario.username} | {self.tipo} | {self.fecha} | {self.hora_inicio}-{self.hora_fin}"
+
+
+
+class OptimizationJob(models.Model):
+    """
+    Optimización de horario ejecutada en segundo plano; el cliente consulta su estado.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pendiente"),
+        ("running", "En ejecución"),
+        ("done", "Completado"),
+        ("failed", "Fallido"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="optimization_jobs",
+        verbose_name="Usuario",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default="pending",
+        verbose_name="Estado",
+    )
+    result = models.JSONField(blank=True, null=True, verbose_name="Resultado")
+    error = models.TextField(blank=True, default="", verbose_name="Error")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name="Inicio")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="Fin")
+
+    class Meta:
+        verbose_name = "Trabajo de Optimización"
+        verbose_name_plural = "Trabajos de Optimización"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.user.username} | {self.status} | {self.created_at}"
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed")
+
+
+class SuggestionFeedback(models.Model):
+    """
+    Respuesta del usuario a una sugerencia del optimizador (aceptada o descartada),
+    con las características del evento en el horario sugerido. Sirve para
+    actualizar el modelo sin reentrenarlo completo (ver planner/feedback.py).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="suggestion_feedback",
+        verbose_name="Usuario",
+    )
+    event_type = models.CharField(max_length=20, verbose_name="Tipo de Evento")
+    priority = models.CharField(max_length=10, verbose_name="Prioridad")
+    duration = models.FloatField(verbose_name="Duración (horas)")
+    suggested_hour = models.FloatField(verbose_name="Hora Sugerida")
+    weekday = models.PositiveSmallIntegerField(verbose_name="Día de la Semana")
+    days_to_deadline = models.PositiveSmallIntegerField(default=999, verbose_name="Días al Vencimiento")
+    accepted = models.BooleanField(verbose_name="Aceptada")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+
+    class Meta:
+        verbose_name = "Respuesta a Sugerencia"
+        verbose_name_plural = "Respuestas a Sugerencias"
+
+    def __str__(self):
+        estado = "aceptada" if self.accepted else "descartada"
+        return f"{self.user.username} | {self.event_type} {self.suggested_hour:g}h | {estado}"
+
+
+class EventTombstone(models.Model):
+    """
+    Registro de un evento eliminado, para que la sincronización incremental
+    (planner/event_sync.py) pueda informar las eliminaciones. Solo guarda el id.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="event_tombstones",
+        verbose_name="Usuario",
+    )
+    event_id = models.BigIntegerField(verbose_name="Evento")
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Eliminación")
+
+    class Meta:
+        verbose_name = "Evento Eliminado"
+        verbose_name_plural = "Eventos Eliminados"
+        indexes = [
+            models.Index(fields=["user", "deleted_at"], name="planner_tomb_user_del_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} | evento {self.event_id} | {self.deleted_at}"
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from django.utils import timezone
+
+from .models import Event
+from .date_windows import day_bounds
+from .recurrence import window_events
+from .suggestion_cache import fingerprint, get_cached_suggestions, set_cached_suggestions
+
+
+# Opciones por sugerencia que se envían al cliente si no pide el detalle completo
+TOP_OPTIONS = 5
+
+
+def get_optimizer(model_path=None, user=None):
+    """
+    Devuelve un SmartScheduleOptimizer listo para usar.
+
+    planner.ai_optimizer (y con él NumPy y, si no hay exportación plana, joblib y
+    sklearn) se importa recién aquí, la primera vez que se necesita calcular un
+    horario. Así las vistas, los comandos de manage.py y las pruebas que no
+    optimizan nada no pagan ese costo al arrancar.
+
+    Con `user` se usa su modelo personalizado si existe (ver planner.user_models).
+    """
+    from planner.ai_optimizer import SmartScheduleOptimizer
+    return SmartScheduleOptimizer(model_path, user_id=user.pk if user is not None else None)
+
+
+def compute_schedule_suggestions(user):
+    """
+    Calcula las sugerencias de optimización de los próximos 7 días del usuario.
+    Cada evento puede moverse a cualquier día de la ventana y a cualquier inicio
+    de la rejilla (granularidad en settings.SMART_SCHEDULER_SLOT_MINUTES).
+    Devuelve el mismo diccionario que responde la vista optimize_schedule.
+    """
+    optimizer = get_optimizer(user=user)
+    if not optimizer.is_loaded:
+        return {
+            'success': False,
+            'message': 'El modelo de IA no está disponible. Verifica que los archivos del modelo estén en la carpeta trained_models.'
+        }
+    today = timezone.localdate()
+    start_date = today
+    end_date = today + timedelta(days=7)
+    # Las ocurrencias de eventos recurrentes ocupan su horario pero no se mueven
+    busy_events = list(window_events(
+        Event.objects.filter(user=user, is_completed=False), *day_bounds(start_date, end_date)
+    ))
+    user_events = [event for event in busy_events if not getattr(event, 'is_occurrence', False)]
+    if not user_events:
+        return {
+            'success': True,
+            'suggestions': [],
+            'message': 'No hay eventos pendientes para optimizar en los próximos 7 días.'
+        }
+    if len(user_events) < 4:
+        return {
+            'success': True,
+            'suggestions': [],
+            'message': 'Se necesitan al menos 4 tareas programadas para generar sugerencias de optimización precisas.',
+            'insufficient_tasks': True,
+            'current_tasks': len(user_events)
+        }
+    # Inicios candidatos de toda la ventana; los que ya pasaron no se proponen
+    slots = optimizer.candidate_slots(start_date, end_date).after(timezone.localtime().replace(tzinfo=None))
+    # Mismo conjunto de eventos, mismo modelo y misma rejilla: se responde desde la caché sin llamar al modelo
+    huella = fingerprint(busy_events, start_date, optimizer.model_version, optimizer.personalized,
+                         slots.minutes, len(slots), *_productivity_key())
+    cached = get_cached_suggestions(user.pk, huella)
+    if cached is not None:
+        return cached
+    result = _compute_suggestions(optimizer, user_events, start_date, slots, busy_events)
+    set_cached_suggestions(user.pk, huella, result)
+    return result
+
+
+def _productivity_key():
+    """Peso y versión del regresor de productividad, si se usa en el score"""
+    from .productivity import productivity_version, productivity_weight
+    peso = productivity_weight()
+    return (peso, productivity_version()) if peso else ()
+
+
+def _compute_suggestions(optimizer, user_events, start_date, slots, busy_events=None):
+    suggestions = []
+    # Todas las predicciones de la ventana se calculan con una sola llamada al modelo
+    # (más una para los inicios actuales que no caen en la rejilla, si los hay)
+    events_data = [optimizer.event_to_data(event, start_date) for event in user_events]
+    slots, probs, scores, disponibles = optimizer.score_matrix(
+        events_data, user_events if busy_events is None else busy_events, slots
+    )
+    # Asignación global: las sugerencias del mismo día no se solapan entre sí
+    current_starts = [optimizer._local_naive(event.start_time) for event in user_events]
+    asignacion = optimizer.assign_schedule(
+        events_data, slots, scores, disponibles, current_starts,
+        user_events=user_events if busy_events is None else busy_events,
+    )
+    for i, (event, event_data) in enumerate(zip(user_events, events_data)):
+        if asignacion[i] < 0:
+            continue
+        prediction = optimizer._build_prediction(
+            slots, probs[i], scores[i], disponibles[i], elegido=asignacion[i]
+        )
+        suggested_datetime = prediction['mejor_inicio']
+        suggested_end_datetime = suggested_datetime + timedelta(hours=event_data['duration'])
+        suggestions.append({
+            'event_id': event.id,
+            'title': event.title,
+            'current_time': current_starts[i].strftime('%d/%m %H:%M'),
+            'suggested_time': suggested_datetime.strftime('%d/%m %H:%M'),
+            'suggested_end_time': suggested_end_datetime.strftime('%H:%M'),
+            'current_time_iso': event.start_time.isoformat(),
+            'suggested_time_iso': suggested_datetime.isoformat(),
+            'suggested_end_time_iso': suggested_end_datetime.isoformat(),
+            'improvement_score': round((prediction['score'] - 0.5) * 100, 1),
+            'confianza': round(prediction['confianza'] * 100),
+            'mejor_hora': prediction['mejor_hora'],
+            'todas_opciones': prediction['todas_opciones'],
+            'reason': optimizer._generate_reason(event_data, prediction)
+        })
+    if not suggestions:
+        return {
+            'success': True,
+            'suggestions': [],
+            'message': 'Tu horario ya está optimizado. No se encontraron mejoras significativas.'
+        }
+    return {
+        'success': True,
+        'suggestions': suggestions,
+        'message': f'Se encontraron {len(suggestions)} sugerencias de optimización.'
+    }
+
+
+def summarize_suggestions(result, top_k=TOP_OPTIONS):
+    """
+    Copia del resultado con todas_opciones reducido a los top_k inicios de mayor
+    score (siempre incluye el sugerido), en orden de hora
+    """
+    if not result.get('suggestions'):
+        return result
+    suggestions = []
+    for suggestion in result['suggestions']:
+        opciones = suggestion.get('todas_opciones') or []
+        mejores = sorted(opciones, key=lambda o: o['score'], reverse=True)[:top_k]
+        elegida = [o for o in opciones if o['hora'] == suggestion['mejor_hora'] and o not in mejores]
+        suggestions.append({
+            **suggestion,
+            'todas_opciones': sorted(mejores + elegida[:1], key=lambda o: o['hora']),
+        })
+    return {**result, 'suggestions': suggestions}
@@ -0,0 +1,61 @@
+"""
+Consultas de eventos que se cruzan con un intervalo.
+
+En PostgreSQL el intervalo de cada evento es tstzrange(start_time, end_time, '[)')
+y la migración 0006 crea un índice GiST sobre (user_id, ese rango), así que
+"eventos del usuario que se cruzan con (inicio, fin)" es una búsqueda en el
+índice con el operador &&. El rango es una expresión sobre las dos columnas, no
+una columna aparte, de modo que siempre coincide con start_time/end_time.
+tstzrange() falla si end_time es anterior a start_time, por eso Event.Meta
+declara la restricción CHECK (end_time >= start_time).
+
+En otras bases de datos (SQLite en desarrollo y pruebas) se usa la condición
+equivalente start_time < fin AND end_time > inicio.
+
+El comando event_overlap_constraint agrega (o quita) una restricción de exclusión
+para que la base de datos rechace eventos que se cruzan de un mismo usuario.
+"""
+from django.db import connections
+from django.db.models import DateTimeField, Func, Q, Value
+
+GIST_INDEX_NAME = 'planner_event_user_range_gist'
+EXCLUSION_CONSTRAINT_NAME = 'planner_event_no_overlap'
+# Misma expresión que usan el índice y la restricción, para que PostgreSQL use el índice
+RANGE_SQL = "tstzrange(start_time, end_time, '[)')"
+
+
+class TsTzRange(Func):
+    function = 'TSTZRANGE'
+
+    def __init__(self, *expressions, **extra):
+        from django.contrib.postgres.fields import DateTimeRangeField
+        extra.setdefault('output_field', DateTimeRangeField())
+        super().__init__(*expressions, **extra)
+
+
+def supports_ranges(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def overlap_condition(queryset, start, end):
+    """
+    (queryset, condición Q) para combinar el cruce con [start, end) con otras
+    condiciones (por ejemplo con |); la condición solo vale sobre ese queryset.
+    """
+    if not supports_ranges(queryset.db):
+        return queryset, Q(start_time__lt=end, end_time__gt=start)
+
+    from django.contrib.postgres.fields import RangeBoundary
+
+    queryset = queryset.alias(time_range=TsTzRange('start_time', 'end_time', RangeBoundary()))
+    # El intervalo consultado también es tstzrange(inicio, fin, '[)'), armado en SQL
+    intervalo = TsTzRange(
+        Value(start, output_field=DateTimeField()), Value(end, output_field=DateTimeField()), RangeBoundary()
+    )
+    return queryset, Q(time_range__overlap=intervalo)
+
+
+def overlapping(queryset, start, end):
+    """Eventos de `queryset` que se cruzan con el intervalo [start, end)"""
+    queryset, condicion = overlap_condition(queryset, start, end)
+    return queryset.filter(condicion)
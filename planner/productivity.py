@@ -0,0 +1,181 @@
+"""
+Servicio del modelo de productividad (planner/ml/productividad_model.pkl).
+
+El RandomForestRegressor de planner/ml/entrenar_modelo_productividad.py predice
+la productividad (0-100) de un bloque a partir de (duracion_min,
+hora_inicio_decimal, dia_semana). El modelo se carga una vez por proceso y se
+vuelve a leer si el archivo cambia. Todas las funciones arman las filas de todos
+los inicios que se quieren evaluar y hacen una sola llamada a predict.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PRODUCTIVITY_MODEL_FILE = os.path.join(os.path.dirname(__file__), 'ml', 'productividad_model.pkl')
+FEATURES = ['duracion_min', 'hora_inicio_decimal', 'dia_semana']
+
+
+class ProductivityModelCache:
+    """Regresor cargado en memoria, compartido por los hilos del proceso"""
+
+    def __init__(self, model_file=None):
+        self.model_file = model_file or PRODUCTIVITY_MODEL_FILE
+        self._model = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self.load_count = 0
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.model_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def get(self):
+        """Devuelve el regresor, o None si no existe el archivo o no se pudo cargar"""
+        signature = self._stat()
+        if signature is None:
+            return None
+        if signature == self._signature:
+            return self._model
+
+        with self._lock:
+            if signature != self._signature:
+                if self._signature is not None:
+                    logger.info(f"El modelo de productividad cambió en disco, se vuelve a cargar: {self.model_file}")
+                import joblib
+                try:
+                    self._model = joblib.load(self.model_file)
+                    self.load_count += 1
+                except Exception as e:
+                    # La firma del archivo que falló también se guarda: no se reintenta hasta que cambie
+                    self._model = None
+                    logger.error(f"Error al cargar el modelo de productividad {self.model_file}: {str(e)}")
+                self._signature = signature
+            return self._model
+
+    def is_current(self):
+        """True si el archivo actual ya se intentó cargar (con o sin éxito) o no existe"""
+        return self._stat() == self._signature
+
+    @property
+    def version(self):
+        """Huella del archivo cargado (sirve para las claves de caché)"""
+        return self._signature
+
+
+_cache = ProductivityModelCache()
+
+
+def get_productivity_model():
+    return _cache.get()
+
+
+def productivity_model_current():
+    return _cache.is_current()
+
+
+def warm_up_productivity_model():
+    """Carga el regresor y pandas (lo que usa predict_productivity) fuera de una petición"""
+    import pandas  # noqa: F401
+
+    get_productivity_model()
+
+
+def productivity_version():
+    _cache.get()
+    return _cache.version
+
+
+def predict_productivity(duracion_min, hora_inicio_decimal, dia_semana):
+    """
+    Productividad estimada (0-100) de cada combinación. Los argumentos pueden ser
+    escalares o arreglos que se combinan con broadcasting de NumPy; se hace una
+    sola llamada al modelo. Devuelve None si el modelo no está disponible.
+    """
+    import numpy as np
+    import pandas as pd
+
+    model = get_productivity_model()
+    if model is None:
+        return None
+
+    columnas = np.broadcast_arrays(
+        np.asarray(duracion_min, dtype=float),
+        np.asarray(hora_inicio_decimal, dtype=float),
+        np.asarray(dia_semana, dtype=float),
+    )
+    forma = columnas[0].shape
+    if not columnas[0].size:
+        return np.empty(forma)
+    X = pd.DataFrame({name: columna.ravel() for name, columna in zip(FEATURES, columnas)})
+    return np.clip(model.predict(X), 0, 100).reshape(forma)
+
+
+def score_slots(slots, durations):
+    """
+    Matriz duraciones x inicios de `slots` (CandidateSlots) con la productividad
+    estimada. Las duraciones repetidas se evalúan una sola vez.
+    """
+    import numpy as np
+
+    durations = np.asarray(durations, dtype=float)
+    unicas, posicion = np.unique(durations, return_inverse=True)
+    por_duracion = predict_productivity(
+        unicas[:, np.newaxis], slots.hours[np.newaxis, :], slots.weekdays[np.newaxis, :]
+    )
+    if por_duracion is None:
+        return None
+    return por_duracion[posicion.reshape(durations.shape)]
+
+
+def score_free_slots(user, start_date, end_date, duracion_min, minutes=None):
+    """
+    Inicios libres de la semana del usuario (sin cruzarse con sus eventos) con su
+    productividad estimada para un bloque de `duracion_min` minutos, ordenados por
+    fecha y hora. Devuelve None si el modelo no está disponible.
+    """
+    import numpy as np
+    from django.utils import timezone
+
+    from .availability import BusyIntervalIndex
+    from .candidate_slots import CandidateSlots
+    from .date_windows import day_bounds
+    from .models import Event
+    from .overlaps import overlap_condition
+    from .recurrence import expand_overlapping, overlap_candidates
+
+    slots = CandidateSlots.window(start_date, end_date, minutes).after(timezone.localtime().replace(tzinfo=None))
+    inicio, fin = day_bounds(start_date, end_date)
+    # Las ocurrencias de las series también ocupan su horario
+    eventos, condicion = overlap_condition(Event.objects.filter(user=user), inicio, fin)
+    eventos = eventos.filter(condicion | overlap_candidates(inicio, fin))
+    index = BusyIntervalIndex(expand_overlapping(eventos, inicio, fin))
+    libres = np.ones(len(slots), dtype=bool)
+    if index:
+        libres = index.free_matrix(slots, [duracion_min / 60])[0]
+
+    libres = np.flatnonzero(libres)
+    productividad = predict_productivity(duracion_min, slots.hours[libres], slots.weekdays[libres])
+    if productividad is None:
+        return None
+    return [
+        {
+            'fecha': slots.date(j).isoformat(),
+            'hora': float(slots.hours[j]),
+            'hora_formateada': slots.label(j),
+            'inicio': slots.datetime(j).isoformat(),
+            'productividad': round(float(p), 2),
+        }
+        for j, p in zip(libres, productividad)
+    ]
+
+
+def productivity_weight():
+    """Peso de la productividad estimada en el score del optimizador (0 = desactivado)"""
+    return float(getattr(settings, 'SMART_SCHEDULER_PRODUCTIVITY_WEIGHT', 0.0))
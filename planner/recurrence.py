@@ -0,0 +1,323 @@
+"""
+Eventos recurrentes y su expansión por ventana de tiempo.
+
+Un evento con recurrence_rule es una serie: su start_time/end_time son los de la
+primera ocurrencia y la regla dice cuándo se repite. Se admite el subconjunto de
+RRULE (RFC 5545) que necesita un horario de clases:
+
+    FREQ=DAILY|WEEKLY;INTERVAL=n;BYDAY=MO,WE,...;COUNT=n  (o UNTIL=AAAAMMDD[THHMMSS])
+
+Las ocurrencias no se guardan en la tabla. window_events() devuelve, ordenados por
+inicio, los eventos normales de la ventana y las ocurrencias de las series que
+caen en ella; las ocurrencias salen de generadores que saltan directo al primer
+periodo de la ventana, así una serie de un año cuesta lo mismo que una de una
+semana. Las repeticiones se calculan en la hora local (zona horaria actual), así
+una clase de las 10:00 sigue a las 10:00 aunque cambie el horario de verano.
+
+- Excepción: el inicio de una ocurrencia cancelada en recurrence_exdates.
+- Modificación: un Event normal con recurrence_parent (la serie) y recurrence_id
+  (el inicio original de la ocurrencia) que la reemplaza; se crea con
+  Event.detach_occurrence().
+
+Para las consultas de cruces (conflictos de EventForm, inicios libres) se agrega
+overlap_candidates() a la condición de la consulta y expand_overlapping() cambia
+cada serie leída por sus ocurrencias que se cruzan con el intervalo;
+expand_overlapping_values() hace lo mismo con filas de values_list().
+"""
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.db.models import Q
+from django.utils import timezone
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+FREQUENCIES = ('DAILY', 'WEEKLY')
+MAX_COUNT = 1000
+# Duración máxima de un evento (Event.clean): una ocurrencia que empieza antes no llega al intervalo
+MAX_EVENT_DURATION = timedelta(days=1)
+# Columnas que expand_overlapping_values() lee después de las pedidas por el llamador
+RECURRENCE_VALUES = ('pk', 'recurrence_rule', 'recurrence_exdates', 'recurrence_parent_id', 'recurrence_id')
+
+REPEAT_CHOICES = [
+    ('', 'No se repite'),
+    ('DAILY', 'Cada día'),
+    ('WEEKLY', 'Cada semana'),
+]
+
+
+class RecurrenceRule:
+    """Regla de repetición ya validada; str() la devuelve en formato RRULE"""
+
+    def __init__(self, freq, interval=1, byday=(), count=None, until=None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Frecuencia no admitida: {freq or '(vacía)'}")
+        if interval < 1:
+            raise ValueError("INTERVAL debe ser 1 o más")
+        if count is not None and not 1 <= count <= MAX_COUNT:
+            raise ValueError(f"COUNT debe estar entre 1 y {MAX_COUNT}")
+        if count is not None and until is not None:
+            raise ValueError("Usa COUNT o UNTIL, no ambos")
+        if byday and freq != 'WEEKLY':
+            raise ValueError("BYDAY solo se admite con FREQ=WEEKLY")
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(set(byday)))
+        self.count = count
+        # Hora local sin zona horaria, incluida
+        self.until = until
+
+    @classmethod
+    def parse(cls, text):
+        partes = {}
+        for parte in text.strip().upper().removeprefix('RRULE:').split(';'):
+            if parte:
+                clave, _, valor = parte.partition('=')
+                partes[clave.strip()] = valor.strip()
+        try:
+            freq = partes.pop('FREQ', '')
+            interval = int(partes.pop('INTERVAL', 1))
+            byday = [WEEKDAYS.index(dia) for dia in partes.pop('BYDAY').split(',')] if 'BYDAY' in partes else ()
+            count = int(partes.pop('COUNT')) if 'COUNT' in partes else None
+            until = _parse_until(partes.pop('UNTIL')) if 'UNTIL' in partes else None
+        except ValueError:
+            raise ValueError(f"Regla de repetición inválida: {text}")
+        if partes:
+            raise ValueError(f"Partes no admitidas en la regla: {', '.join(partes)}")
+        return cls(freq, interval, byday, count, until)
+
+    def __str__(self):
+        partes = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            partes.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            partes.append('BYDAY=' + ','.join(WEEKDAYS[dia] for dia in self.byday))
+        if self.count is not None:
+            partes.append(f'COUNT={self.count}')
+        if self.until is not None:
+            partes.append(f"UNTIL={self.until.strftime('%Y%m%dT%H%M%S')}")
+        return ';'.join(partes)
+
+    def local_starts(self, dtstart, desde=None):
+        """
+        Inicios (hora local sin zona) desde `dtstart`, en orden, empezando por el
+        primero que no es anterior a `desde`. Respeta COUNT y UNTIL.
+        """
+        if self.freq == 'DAILY':
+            paso = timedelta(days=self.interval)
+            k = 0
+            if desde is not None and desde > dtstart:
+                k = -((dtstart - desde) // paso)
+            while True:
+                inicio = dtstart + k * paso
+                if (self.count is not None and k >= self.count) or (self.until is not None and inicio > self.until):
+                    return
+                yield inicio
+                k += 1
+
+        dias = self.byday or (dtstart.weekday(),)
+        lunes = dtstart - timedelta(days=dtstart.weekday())
+        # Días de la primera semana que no son anteriores a dtstart
+        omitidos = sum(1 for dia in dias if dia < dtstart.weekday())
+        p = 0
+        if desde is not None and desde > lunes:
+            p = (desde - lunes).days // (7 * self.interval)
+        while True:
+            for posicion, dia in enumerate(dias):
+                if p == 0 and dia < dtstart.weekday():
+                    continue
+                inicio = lunes + timedelta(weeks=p * self.interval, days=dia)
+                indice = p * len(dias) + posicion - omitidos
+                if (self.count is not None and indice >= self.count) or (self.until is not None and inicio > self.until):
+                    return
+                if desde is None or inicio >= desde:
+                    yield inicio
+            p += 1
+
+    def last_start(self, dtstart):
+        """Último inicio local de la serie, o None si no termina"""
+        if self.until is not None:
+            return self.until
+        if self.count is not None:
+            ultimo = None
+            for ultimo in self.local_starts(dtstart):
+                pass
+            return ultimo
+        return None
+
+
+def _parse_until(valor):
+    if valor.endswith('Z'):
+        moment = datetime.strptime(valor, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+        return timezone.localtime(moment).replace(tzinfo=None)
+    if 'T' in valor:
+        return datetime.strptime(valor, '%Y%m%dT%H%M%S')
+    # Solo fecha: incluye todo ese día
+    return datetime.combine(datetime.strptime(valor, '%Y%m%d').date(), time.max)
+
+
+def _local_naive(moment):
+    return timezone.localtime(moment).replace(tzinfo=None)
+
+
+def series_end(rule_text, start_time):
+    """Fin del último inicio de la serie (datetime con zona), o None si no termina"""
+    ultimo = RecurrenceRule.parse(rule_text).last_start(_local_naive(start_time))
+    return timezone.make_aware(ultimo) if ultimo is not None else None
+
+
+def parse_exdates(values):
+    exdates = set()
+    for valor in values or ():
+        moment = datetime.fromisoformat(valor)
+        exdates.add(moment if timezone.is_aware(moment) else timezone.make_aware(moment))
+    return exdates
+
+
+def make_occurrence(series, start):
+    """Event sin guardar con los datos de la serie empezando en `start`"""
+    from .models import Event
+
+    desfase = start - series.start_time
+    ocurrencia = Event(
+        id=series.pk,
+        user_id=series.user_id,
+        title=series.title,
+        description=series.description,
+        event_type=series.event_type,
+        priority=series.priority,
+        category=series.category,
+        start_time=start,
+        end_time=series.end_time + desfase,
+        due_date=series.due_date + timedelta(days=desfase.days) if series.due_date else None,
+        is_completed=series.is_completed,
+        created_at=series.created_at,
+        updated_at=series.updated_at,
+        recurrence_rule=series.recurrence_rule,
+    )
+    ocurrencia.is_occurrence = True
+    ocurrencia.occurrence_start = start
+    return ocurrencia
+
+
+def occurrence_starts(pk, rule_text, exdates, dtstart, start, end=None, replaced=frozenset()):
+    """
+    Generador de los inicios (con zona) de la serie `pk` que caen en [start, end),
+    sin los cancelados ni los reemplazados (pares (serie, inicio original) de `replaced`).
+    """
+    rule = RecurrenceRule.parse(rule_text)
+    exdates = parse_exdates(exdates)
+    fin = _local_naive(end) if end is not None else None
+    for local in rule.local_starts(_local_naive(dtstart), _local_naive(start)):
+        if fin is not None and local >= fin:
+            return
+        inicio = timezone.make_aware(local)
+        if inicio in exdates or (pk, inicio) in replaced:
+            continue
+        yield inicio
+
+
+def iter_occurrences(series, start, end=None, replaced=frozenset()):
+    """
+    Generador de las ocurrencias de `series` que empiezan en [start, end), sin las
+    canceladas ni las reemplazadas (pares (serie, inicio original) de `replaced`).
+    """
+    for inicio in occurrence_starts(series.pk, series.recurrence_rule, series.recurrence_exdates,
+                                    series.start_time, start, end, replaced):
+        yield make_occurrence(series, inicio)
+
+
+def window_events(queryset, start, end=None, limit=None):
+    """
+    Generador de los eventos de `queryset` que empiezan en [start, end) ordenados
+    por inicio: los eventos normales (incluidas las ocurrencias modificadas) y las
+    ocurrencias de las series. Sin `end` no hay límite superior; `limit` corta el
+    resultado (y la consulta de eventos normales) a esa cantidad.
+    """
+    from .models import Event
+
+    normales = queryset.filter(recurrence_rule='', start_time__gte=start)
+    series = queryset.exclude(recurrence_rule='').exclude(recurrence_end__lt=start)
+    if end is not None:
+        normales = normales.filter(start_time__lt=end)
+        series = series.filter(start_time__lt=end)
+    normales = normales.order_by('start_time', 'pk')
+    if limit is not None:
+        normales = normales[:limit]
+
+    series = list(series)
+    if not series:
+        yield from normales
+        return
+
+    reemplazadas = Event.objects.filter(recurrence_parent__in=series, recurrence_id__gte=start)
+    if end is not None:
+        reemplazadas = reemplazadas.filter(recurrence_id__lt=end)
+    replaced = set(reemplazadas.values_list('recurrence_parent_id', 'recurrence_id'))
+
+    eventos = heapq.merge(
+        normales, *(iter_occurrences(serie, start, end, replaced) for serie in series),
+        key=lambda evento: evento.start_time,
+    )
+    yield from (islice(eventos, limit) if limit is not None else eventos)
+
+
+def overlap_candidates(start, end):
+    """
+    Condición para leer, en la misma consulta que los eventos normales que se
+    cruzan con [start, end), las series que pueden tener ocurrencias en el
+    intervalo y las ocurrencias modificadas que reemplazan a alguna de ellas.
+    """
+    desde = start - MAX_EVENT_DURATION
+    series = ~Q(recurrence_rule='') & Q(start_time__lt=end) & (
+        Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=desde)
+    )
+    reemplazos = Q(recurrence_parent__isnull=False, recurrence_id__gte=desde, recurrence_id__lt=end)
+    return series | reemplazos
+
+
+def expand_overlapping(events, start, end, replaced=()):
+    """
+    Generador de los eventos de `events` (leídos con overlap_candidates) que se
+    cruzan con [start, end): los normales tal cual y, en lugar de cada serie, sus
+    ocurrencias. `replaced` agrega pares (serie, inicio original) que no se generan.
+    """
+    events = list(events)
+    replaced = set(replaced) | {
+        (event.recurrence_parent_id, event.recurrence_id) for event in events if event.recurrence_parent_id
+    }
+    for event in events:
+        if not event.recurrence_rule:
+            if event.start_time < end and event.end_time > start:
+                yield event
+            continue
+        duracion = event.end_time - event.start_time
+        for ocurrencia in iter_occurrences(event, start - duracion, end, replaced):
+            if ocurrencia.end_time > start:
+                yield ocurrencia
+
+
+def expand_overlapping_values(rows, fields, start, end, replaced=()):
+    """
+    Igual que expand_overlapping() pero con filas de values_list(*fields,
+    *RECURRENCE_VALUES), sin armar instancias de Event. `fields` debe incluir
+    start_time y end_time; devuelve tuplas de `fields` y en las ocurrencias cambia
+    el inicio y el fin por los de cada repetición.
+    """
+    n = len(fields)
+    i_inicio, i_fin = fields.index('start_time'), fields.index('end_time')
+    rows = list(rows)
+    replaced = set(replaced) | {(row[n + 3], row[n + 4]) for row in rows if row[n + 3]}
+    for row in rows:
+        valores, (pk, regla, exdates, _, _) = row[:n], row[n:]
+        inicio, fin = valores[i_inicio], valores[i_fin]
+        if not regla:
+            if inicio < end and fin > start:
+                yield valores
+            continue
+        duracion = fin - inicio
+        for ocurrencia in occurrence_starts(pk, regla, exdates, inicio, start - duracion, end, replaced):
+            if ocurrencia + duracion > start:
+                fila = list(valores)
+                fila[i_inicio], fila[i_fin] = ocurrencia, ocurrencia + duracion
+                yield tuple(fila)
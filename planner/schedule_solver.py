@@ -0,0 +1,216 @@
+"""
+Asignación global de horarios sin solapamientos para las sugerencias del optimizador.
+
+Recibe la matriz de ganancias eventos x inicios candidatos (cuánto mejora el
+score de cada evento si se mueve a ese día y hora) y elige a lo sumo un inicio por
+evento de modo que las sugerencias del mismo día no se crucen y la ganancia total
+sea máxima.
+
+El problema general es NP-difícil, así que se resuelve con una búsqueda local
+acotada:
+
+1. Dos soluciones iniciales voraces (en el orden recibido y por mayor ganancia);
+   se conserva la mejor.
+2. Pasadas de mejora: cada evento se reubica en su mejor hora compatible y, si
+   conviene, desplaza a los eventos con los que choca, que luego se reinsertan
+   donde quepan. Solo se aceptan movimientos que aumentan la ganancia total.
+
+Todo se recorre en un orden fijo y los empates se resuelven por índice, por lo
+que el resultado es determinista. El costo se acota con un número máximo de
+pasadas, de opciones por evento y de movimientos evaluados (límites deterministas); el presupuesto de
+tiempo es solo una protección adicional y, si se alcanza, se devuelve la mejor
+asignación encontrada hasta ese momento.
+"""
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+SIN_ASIGNAR = -1
+
+
+class DiaOcupado:
+    """
+    Intervalos asignados en un día, ordenados por inicio.
+
+    Las sugerencias de un mismo día nunca se tocan entre sí, así que los inicios y
+    los fines quedan ordenados a la vez y los intervalos que chocan con (a, b) son
+    un tramo contiguo que se ubica con dos búsquedas binarias.
+    """
+
+    def __init__(self):
+        self.inicios = []
+        self.fines = []
+        self.eventos = []
+
+    def agregar(self, i, inicio, fin):
+        pos = bisect_left(self.inicios, inicio)
+        self.inicios.insert(pos, inicio)
+        self.fines.insert(pos, fin)
+        self.eventos.insert(pos, i)
+
+    def quitar(self, i, inicio):
+        pos = bisect_left(self.inicios, inicio)
+        while self.eventos[pos] != i:
+            pos += 1
+        del self.inicios[pos], self.fines[pos], self.eventos[pos]
+
+    def _tramo(self, inicio, fin):
+        return bisect_left(self.fines, inicio), bisect_right(self.inicios, fin)
+
+    def conflictos(self, i, inicio, fin):
+        desde, hasta = self._tramo(inicio, fin)
+        return [k for k in self.eventos[desde:hasta] if k != i]
+
+    def libre(self, i, inicio, fin):
+        desde, hasta = bisect_left(self.fines, inicio), bisect_right(self.inicios, fin)
+        return hasta <= desde or (hasta - desde == 1 and self.eventos[desde] == i)
+
+
+class ScheduleSolver:
+    def __init__(self, gains, allowed, horas, durations, slot_days,
+                 max_passes=10, max_evaluations=5_000, max_options=32, time_budget=1.0):
+        gains = np.asarray(gains, dtype=np.float64)
+        allowed = np.asarray(allowed, dtype=bool) & (gains > 0)
+        self.gains = gains.tolist()
+        self.horas = [float(h) for h in horas]
+        self.durations = [float(d) for d in durations]
+        # Día de cada columna: solo pueden chocar sugerencias del mismo día
+        self.slot_days = list(slot_days)
+        self.max_passes = max_passes
+        self.max_evaluations = max_evaluations
+        self.time_budget = time_budget
+        self.n_eventos = gains.shape[0]
+
+        # Opciones de cada evento ordenadas por ganancia (desc) y luego por columna; con
+        # rejillas finas de varios días solo se conservan las max_options mejores
+        self.opciones = [
+            [int(j) for j in np.lexsort((np.arange(len(self.horas)), -gains[i])) if allowed[i, j]][:max_options]
+            for i in range(self.n_eventos)
+        ]
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.asignacion = [SIN_ASIGNAR] * self.n_eventos
+        # Intervalos ya asignados por día
+        self.ocupados = {dia: DiaOcupado() for dia in self.slot_days}
+
+    def _intervalo(self, i, j):
+        return self.horas[j], self.horas[j] + self.durations[i]
+
+    def _asignar(self, i, j):
+        previo = self.asignacion[i]
+        if previo != SIN_ASIGNAR:
+            self.ocupados[self.slot_days[previo]].quitar(i, self.horas[previo])
+        self.asignacion[i] = j
+        if j != SIN_ASIGNAR:
+            self.ocupados[self.slot_days[j]].agregar(i, *self._intervalo(i, j))
+
+    def _conflictos(self, i, j):
+        """Mismo criterio que usaba la vista: intervalos del mismo día que se tocan o cruzan"""
+        return self.ocupados[self.slot_days[j]].conflictos(i, *self._intervalo(i, j))
+
+    def _libre(self, i, j):
+        return self.ocupados[self.slot_days[j]].libre(i, *self._intervalo(i, j))
+
+    def _ganancia(self, i, j):
+        return self.gains[i][j] if j != SIN_ASIGNAR else 0.0
+
+    def _total(self):
+        return sum(self._ganancia(i, j) for i, j in enumerate(self.asignacion))
+
+    def _mejor_opcion_libre(self, i):
+        duracion = self.durations[i]
+        for j in self.opciones[i]:
+            inicio = self.horas[j]
+            if self.ocupados[self.slot_days[j]].libre(i, inicio, inicio + duracion):
+                return j
+        return SIN_ASIGNAR
+
+    def _voraz(self, orden):
+        self._reiniciar()
+        for i in orden:
+            self._asignar(i, self._mejor_opcion_libre(i))
+        return list(self.asignacion)
+
+    def _voraz_original(self):
+        """Criterio anterior: en el orden recibido, solo la mejor hora de cada evento o ninguna"""
+        self._reiniciar()
+        for i in range(self.n_eventos):
+            if self.opciones[i] and self._libre(i, self.opciones[i][0]):
+                self._asignar(i, self.opciones[i][0])
+        return list(self.asignacion)
+
+    def _intentar_desplazar(self, i, j):
+        """Asigna i->j expulsando a los que chocan y reinsertándolos; False si no mejora"""
+        expulsados = self._conflictos(i, j)
+        previos = [self.asignacion[k] for k in expulsados]
+        actual = self.asignacion[i]
+        delta = self._ganancia(i, j) - self._ganancia(i, actual)
+        delta -= sum(self._ganancia(k, m) for k, m in zip(expulsados, previos))
+
+        # Cota optimista: ni reinsertando a todos en su mejor opción se gana algo
+        cota = delta + sum(self._ganancia(k, self.opciones[k][0]) for k in expulsados if self.opciones[k])
+        if cota <= 1e-12:
+            return False
+
+        for k in expulsados:
+            self._asignar(k, SIN_ASIGNAR)
+        self._asignar(i, j)
+        for k in expulsados:
+            self._asignar(k, self._mejor_opcion_libre(k))
+            delta += self._ganancia(k, self.asignacion[k])
+
+        if delta > 1e-12:
+            return True
+
+        # Deshacer el movimiento
+        for k in expulsados:
+            self._asignar(k, SIN_ASIGNAR)
+        self._asignar(i, actual)
+        for k, m in zip(expulsados, previos):
+            self._asignar(k, m)
+        return False
+
+    def solve(self):
+        inicio = time.perf_counter()
+        por_ganancia = sorted(
+            range(self.n_eventos),
+            key=lambda i: (-(self._ganancia(i, self.opciones[i][0]) if self.opciones[i] else 0.0), i)
+        )
+        original = self._voraz_original()
+        total_original = self._total()
+        self._voraz(por_ganancia)
+        if total_original > self._total():
+            self._reiniciar()
+            for i, j in enumerate(original):
+                self._asignar(i, j)
+
+        evaluaciones = 0
+        for _ in range(self.max_passes):
+            mejoro = False
+            for i in range(self.n_eventos):
+                if evaluaciones >= self.max_evaluations or time.perf_counter() - inicio > self.time_budget:
+                    return list(self.asignacion)
+                actual = self.asignacion[i]
+                for j in self.opciones[i]:
+                    if j == actual:
+                        # Las opciones están ordenadas: las siguientes ganan menos para i
+                        break
+                    evaluaciones += 1
+                    if self._intentar_desplazar(i, j):
+                        mejoro = True
+                        break
+            if not mejoro:
+                break
+
+        return list(self.asignacion)
+
+
+def solve_schedule(gains, allowed, horas, durations, slot_days, **limites):
+    """
+    Devuelve, por evento, el índice de la columna elegida o -1 si no se sugiere
+    moverlo. `horas` y `slot_days` son la hora del día y el día de cada columna;
+    los inicios elegidos en un mismo día no se solapan entre sí.
+    """
+    return ScheduleSolver(gains, allowed, horas, durations, slot_days, **limites).solve()
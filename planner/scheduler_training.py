@@ -0,0 +1,314 @@
+"""
+Entrenamiento del modelo del SmartScheduleOptimizer con el historial real.
+
+Los eventos ya terminados (completados o no) y los bloques de estudio se leen
+por partes con iterator(chunk_size=...) y se copian a arreglos compactos de NumPy
+reservados de antemano, así la memoria depende solo de la cantidad de filas y
+no de los objetos del ORM. La etiqueta es si el evento o bloque se completó.
+
+Cada entrenamiento se guarda como una versión en trained_models/versions/<versión>
+y luego se publica en trained_models/ reemplazando los archivos con os.replace;
+el ModelRegistry detecta el cambio y recarga el modelo en cada worker.
+"""
+import os
+import json
+import shutil
+from datetime import datetime
+
+import numpy as np
+from django.utils import timezone
+
+from planner.flat_model import FLAT_MODEL_DIR, atomic_output_dir
+from planner.lookup_table import LOOKUP_DIR
+from planner.model_registry import (
+    DEFAULT_MODEL_PATH, MODEL_FILE, ENCODERS_FILE, SCALER_FILE, METADATA_FILE,
+)
+
+VERSIONS_DIR = 'versions'
+
+EVENT_TYPES = ["tarea", "clase", "examen", "proyecto", "estudio", "descanso", "personal", "otro"]
+PRIORITIES = ["alta", "media", "baja"]
+NUMERIC_FEATURES = ['start_hour', 'duration', 'weekday', 'days_to_deadline']
+FEATURES = ['start_hour', 'duration', 'event_type_encoded', 'priority_encoded', 'weekday', 'days_to_deadline']
+
+# Mismos hiperparámetros que el modelo original
+DEFAULT_PARAMS = {
+    'n_estimators': 200,
+    'learning_rate': 0.1,
+    'max_depth': 5,
+    'random_state': 42,
+}
+
+
+class TrainingArrays:
+    """Columnas de entrenamiento con tipos compactos (unos 16 bytes por fila)"""
+
+    def __init__(self, n_rows, event_types=EVENT_TYPES, priorities=PRIORITIES):
+        # Los códigos siguen el orden alfabético, igual que LabelEncoder
+        self.event_types = sorted(event_types)
+        self.priorities = sorted(priorities)
+        self._type_codes = {valor: codigo for codigo, valor in enumerate(self.event_types)}
+        self._priority_codes = {valor: codigo for codigo, valor in enumerate(self.priorities)}
+
+        self.start_hour = np.empty(n_rows, dtype=np.float32)
+        self.duration = np.empty(n_rows, dtype=np.float32)
+        self.event_type = np.empty(n_rows, dtype=np.int8)
+        self.priority = np.empty(n_rows, dtype=np.int8)
+        self.weekday = np.empty(n_rows, dtype=np.int8)
+        self.days_to_deadline = np.empty(n_rows, dtype=np.int16)
+        self.label = np.empty(n_rows, dtype=np.uint8)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.label)
+
+    def append(self, start_hour, duration, event_type, priority, weekday, days_to_deadline, label):
+        i = self.size
+        self.start_hour[i] = start_hour
+        self.duration[i] = duration
+        self.event_type[i] = self._type_codes.get(event_type, self._type_codes['otro'])
+        self.priority[i] = self._priority_codes.get(priority, self._priority_codes['media'])
+        self.weekday[i] = weekday
+        self.days_to_deadline[i] = min(days_to_deadline, 999)
+        self.label[i] = 1 if label else 0
+        self.size += 1
+
+    def columns(self, indices=None):
+        """Diccionario columna -> arreglo (solo las filas cargadas o las indicadas)"""
+        seleccion = slice(0, self.size) if indices is None else indices
+        return {
+            'start_hour': self.start_hour[seleccion],
+            'duration': self.duration[seleccion],
+            'event_type': self.event_type[seleccion],
+            'priority': self.priority[seleccion],
+            'weekday': self.weekday[seleccion],
+            'days_to_deadline': self.days_to_deadline[seleccion],
+            'label': self.label[seleccion],
+        }
+
+
+def _local(dt):
+    return timezone.localtime(dt) if timezone.is_aware(dt) else dt
+
+
+def history_querysets(now=None, user_id=None):
+    """
+    Eventos ya terminados y bloques de días pasados: son los únicos con resultado
+    conocido. Con user_id solo los de ese usuario.
+    """
+    from planner.models import Event, BloqueEstudio
+
+    now = now or timezone.now()
+    events = Event.objects.filter(end_time__lte=now).order_by()
+    bloques = BloqueEstudio.objects.filter(fecha__lt=timezone.localdate(now)).order_by()
+    if user_id is not None:
+        events = events.filter(user_id=user_id)
+        bloques = bloques.filter(usuario_id=user_id)
+    return events, bloques
+
+
+def stream_training_arrays(chunk_size=2000, now=None, log=None, user_id=None):
+    """Lee el historial por partes y lo copia a un TrainingArrays reservado de antemano"""
+    events, bloques = history_querysets(now, user_id)
+    n_events, n_bloques = events.count(), bloques.count()
+    arrays = TrainingArrays(n_events + n_bloques)
+
+    filas = events.values_list(
+        'start_time', 'end_time', 'event_type', 'priority', 'due_date', 'is_completed'
+    ).iterator(chunk_size=chunk_size)
+    for start_time, end_time, event_type, priority, due_date, is_completed in filas:
+        if len(arrays) >= arrays.capacity:
+            # Se crearon filas después del conteo; se entrenan en la próxima ejecución
+            break
+        inicio = _local(start_time)
+        days_to_deadline = max(0, (due_date - inicio.date()).days) if due_date else 999
+        arrays.append(
+            inicio.hour + inicio.minute / 60,
+            (end_time - start_time).total_seconds() / 3600,
+            event_type, priority, inicio.weekday(), days_to_deadline, is_completed,
+        )
+    total_events = len(arrays)
+    if log:
+        log(f"📥 {total_events} eventos leídos")
+
+    filas = bloques.values_list(
+        'tipo', 'fecha', 'hora_inicio', 'duracion_min', 'completado'
+    ).iterator(chunk_size=chunk_size)
+    for tipo, fecha, hora_inicio, duracion_min, completado in filas:
+        if len(arrays) >= arrays.capacity:
+            break
+        arrays.append(
+            hora_inicio.hour + hora_inicio.minute / 60,
+            duracion_min / 60,
+            tipo, 'media', fecha.weekday(), 999, completado,
+        )
+    if log:
+        log(f"📥 {len(arrays) - total_events} bloques de estudio leídos")
+
+    return arrays, {'events': total_events, 'bloques': len(arrays) - total_events}
+
+
+def feature_frame(columns, scaler):
+    """Características del modelo (mismas columnas que transform_data) a partir de TrainingArrays.columns()"""
+    import pandas as pd
+
+    numeric = pd.DataFrame({name: columns[name].astype(np.float64) for name in NUMERIC_FEATURES})
+    scaled = scaler.transform(numeric)
+    return pd.DataFrame({
+        'start_hour': scaled[:, 0],
+        'duration': scaled[:, 1],
+        'event_type_encoded': columns['event_type'].astype(np.int64),
+        'priority_encoded': columns['priority'].astype(np.int64),
+        'weekday': scaled[:, 2],
+        'days_to_deadline': scaled[:, 3],
+    })[FEATURES]
+
+
+def users_with_history(min_rows, now=None):
+    """Ids de los usuarios con al menos min_rows filas de historial (eventos + bloques)"""
+    from collections import Counter
+    from django.db.models import Count
+
+    events, bloques = history_querysets(now)
+    filas = Counter()
+    for user_id, n in events.values_list('user_id').annotate(n=Count('id')):
+        filas[user_id] += n
+    for user_id, n in bloques.values_list('usuario_id').annotate(n=Count('id')):
+        filas[user_id] += n
+    return sorted(user_id for user_id, n in filas.items() if n >= min_rows)
+
+
+def train_scheduler_model(arrays, params=None, max_rows=None, validation_fraction=0.1, seed=42):
+    """
+    Entrena el GradientBoostingClassifier con las columnas de `arrays`.
+    Devuelve (model, encoders, scaler, metricas). Si hay más de max_rows filas se
+    entrena con una muestra aleatoria de ese tamaño.
+    """
+    import pandas as pd
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    rng = np.random.default_rng(seed)
+    indices = np.arange(len(arrays))
+    if max_rows and len(indices) > max_rows:
+        indices = np.sort(rng.choice(indices, size=max_rows, replace=False))
+    columns = arrays.columns(indices)
+
+    encoders = {
+        'event_type': LabelEncoder().fit(arrays.event_types),
+        'priority': LabelEncoder().fit(arrays.priorities),
+    }
+    scaler = StandardScaler().fit(
+        pd.DataFrame({name: columns[name].astype(np.float64) for name in NUMERIC_FEATURES})
+    )
+    X = feature_frame(columns, scaler)
+    y = columns['label'].astype(np.int64)
+    if len(np.unique(y)) < 2:
+        raise ValueError("El historial necesita eventos completados y no completados para entrenar")
+
+    orden = rng.permutation(len(y))
+    n_validacion = int(len(y) * validation_fraction)
+    validacion, entrenamiento = orden[:n_validacion], orden[n_validacion:]
+
+    model = GradientBoostingClassifier(**{**DEFAULT_PARAMS, **(params or {})})
+    model.fit(X.iloc[entrenamiento], y[entrenamiento])
+
+    metricas = {
+        'train_rows': int(len(entrenamiento)),
+        'validation_rows': int(n_validacion),
+        'positive_rate': float(y.mean()),
+        'train_accuracy': float(model.score(X.iloc[entrenamiento], y[entrenamiento])),
+        'validation_accuracy': float(model.score(X.iloc[validacion], y[validacion])) if n_validacion else None,
+    }
+    return model, encoders, scaler, metricas
+
+
+def read_metadata(model_path=DEFAULT_MODEL_PATH):
+    path = os.path.join(model_path, METADATA_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def next_version(model_path=DEFAULT_MODEL_PATH):
+    """Siguiente versión menor (2.0 -> 2.1) que todavía no exista en versions/"""
+    actual = str(read_metadata(model_path).get('version') or '1.0')
+    try:
+        mayor, menor = (int(parte) for parte in actual.split('.')[:2])
+    except ValueError:
+        mayor, menor = 1, 0
+    while True:
+        menor += 1
+        version = f'{mayor}.{menor}'
+        if not os.path.exists(os.path.join(model_path, VERSIONS_DIR, version)):
+            return version
+
+
+def save_version(model, encoders, scaler, metadata, model_path=DEFAULT_MODEL_PATH, export=None):
+    """
+    Escribe todos los artefactos de una versión en versions/<versión> de forma atómica.
+    `export(carpeta)` permite agregar la exportación plana y la tabla compilada
+    antes de que la carpeta quede visible.
+    """
+    import joblib
+
+    version_dir = os.path.join(model_path, VERSIONS_DIR, metadata['version'])
+    os.makedirs(os.path.dirname(version_dir), exist_ok=True)
+    with atomic_output_dir(version_dir) as tmp_dir:
+        joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+        joblib.dump(encoders, os.path.join(tmp_dir, ENCODERS_FILE))
+        joblib.dump(scaler, os.path.join(tmp_dir, SCALER_FILE))
+        with open(os.path.join(tmp_dir, METADATA_FILE), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        if export:
+            export(tmp_dir)
+    return version_dir
+
+
+def _replace_file(origen, destino):
+    tmp = f'{destino}.tmp-{os.getpid()}'
+    shutil.copy2(origen, tmp)
+    os.replace(tmp, destino)
+
+
+def publish_version(version_dir, model_path=DEFAULT_MODEL_PATH):
+    """
+    Copia una versión guardada a trained_models/. Cada archivo se reemplaza con
+    os.replace y los metadatos van al final: los workers ven una mezcla de archivos
+    como mucho durante una petición, y la huella del registro los recarga completos.
+    """
+    for carpeta in (FLAT_MODEL_DIR, LOOKUP_DIR):
+        origen = os.path.join(version_dir, carpeta)
+        destino = os.path.join(model_path, carpeta)
+        if os.path.isdir(origen):
+            with atomic_output_dir(destino) as tmp_dir:
+                shutil.rmtree(tmp_dir)
+                shutil.copytree(origen, tmp_dir)
+        elif os.path.isdir(destino):
+            # La versión nueva no trae esta exportación: la anterior ya no corresponde
+            shutil.rmtree(destino)
+    for filename in (MODEL_FILE, ENCODERS_FILE, SCALER_FILE, METADATA_FILE):
+        _replace_file(os.path.join(version_dir, filename), os.path.join(model_path, filename))
+
+
+def build_metadata(previous, version, sources, metricas, params):
+    metadata = dict(previous)
+    metadata.update({
+        'version': version,
+        'trained_date': datetime.now().isoformat(),
+        'event_types': EVENT_TYPES,
+        'priorities': PRIORITIES,
+        'is_trained': True,
+        'feedback_count': previous.get('feedback_count', 0),
+        'training': {
+            'sources': sources,
+            'params': {**DEFAULT_PARAMS, **(params or {})},
+            **metricas,
+        },
+    })
+    return metadata
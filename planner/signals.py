@@ -0,0 +1,29 @@
+# planner/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Event
+from .suggestion_cache import invalidate_user_suggestions
+from .event_sync import record_tombstone
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_suggestions_on_event_change(sender, instance, **kwargs):
+    """Descartar las sugerencias en caché del usuario cuando cambia uno de sus eventos"""
+    invalidate_user_suggestions(instance.user_id)
+
+@receiver(post_delete, sender=Event)
+def record_event_tombstone(sender, instance, origin=None, **kwargs):
+    """Registrar la eliminación para la sincronización incremental"""
+    # Si se está eliminando el usuario, sus registros también se eliminan
+    if origin is not None and not isinstance(origin, Event) and getattr(origin, 'model', None) is not Event:
+        return
+    record_tombstone(instance)
+
+@receiver(post_delete, sender=Event)
+def cancel_deleted_occurrence(sender, instance, origin=None, **kwargs):
+    """Al eliminar una ocurrencia modificada, la ocurrencia original no vuelve a aparecer"""
+    if not instance.recurrence_parent_id or origin is not instance:
+        return
+    serie = Event.objects.filter(pk=instance.recurrence_parent_id).first()
+    if serie is not None:
+        serie.cancel_occurrence(instance.recurrence_id)
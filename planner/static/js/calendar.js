@@ -9,6 +9,7 @@ function initializeCalendar() {
     setupKeyboardShortcuts();
     setupHoverEffects();
     setupQuickActions();
+    initializeEventSync();
 }
 
 function scrollToCurrentTime() {
@@ -277,7 +278,7 @@ function showContextMenu(event, clickEvent) {
     const options = [
         { icon: 'fas fa-eye', text: 'Ver detalles', action: () => window.location.href = `/planner/event/${eventId}/` },
         { icon: 'fas fa-edit', text: 'Editar', action: () => window.location.href = `/planner/event/${eventId}/edit/` },
-        { icon: 'fas fa-check', text: isCompleted ? 'Marcar pendiente' : 'Marcar completado', action: () => toggleEventCompletion(eventId) },
+        { icon: 'fas fa-check', text: isCompleted ? 'Marcar pendiente' : 'Marcar completado', action: () => toggleEventCompletion(eventId, event.dataset.occurrence) },
         { icon: 'fas fa-trash', text: 'Eliminar', action: () => window.location.href = `/planner/event/${eventId}/delete/`, class: 'danger' }
     ];
     options.forEach(option => {
@@ -318,7 +319,7 @@ function showContextMenu(event, clickEvent) {
     }, 100);
 }
 
-function toggleEventCompletion(eventId) {
+function toggleEventCompletion(eventId, occurrence) {
     showLoading('Actualizando evento...');
     fetch(`/planner/event/${eventId}/toggle-completion/`, {
         method: 'POST',
@@ -326,11 +327,17 @@ function toggleEventCompletion(eventId) {
             'X-CSRFToken': getCSRFToken(),
             'Content-Type': 'application/json',
         },
+        // Las ocurrencias de una serie envían su inicio original
+        body: JSON.stringify(occurrence ? { occurrence } : {}),
     })
     .then(response => response.json())
     .then(data => {
         hideLoading();
-        if (data.success) {
+        if (data.success && occurrence) {
+            // La ocurrencia pasó a ser un evento propio: se trae la rejilla actualizada
+            showNotification(data.message, 'success');
+            syncEvents().catch(error => console.error('Error al sincronizar:', error));
+        } else if (data.success) {
             document.querySelectorAll(`[data-event-id="${eventId}"]`).forEach(eventElement => {
                 // Actualizar clases y estilos
                 if (data.is_completed) {
@@ -352,6 +359,8 @@ function toggleEventCompletion(eventId) {
                 }
             });
             showNotification(data.message, 'success');
+            // La rejilla ya está al día; solo se avanza el cursor
+            syncEvents({ refreshGrid: false }).catch(error => console.error('Error al sincronizar:', error));
         } else {
             showNotification('Error al actualizar el evento', 'error');
         }
@@ -363,6 +372,70 @@ function toggleEventCompletion(eventId) {
     });
 }
 
+// Sincronización incremental: después de mover o completar eventos se piden solo
+// los cambios desde el último cursor y se reemplaza la rejilla si tocan la semana
+const eventSync = { cursor: null, events: new Map() };
+
+function initializeEventSync() {
+    const calendar = document.querySelector('[data-sync-cursor]');
+    if (calendar) {
+        eventSync.cursor = calendar.dataset.syncCursor;
+    }
+}
+
+function changesTouchVisibleWeek(data, calendar) {
+    const weekStart = new Date(`${calendar.dataset.weekStart}T00:00:00`);
+    const weekEnd = new Date(weekStart);
+    weekEnd.setDate(weekStart.getDate() + 7);
+    const shown = id => document.querySelector(`[data-event-id="${id}"]`) !== null;
+    return data.events.some(event => {
+        const start = new Date(event.start_time);
+        return shown(event.id) || (start >= weekStart && start < weekEnd);
+    }) || data.deleted.some(shown);
+}
+
+async function refreshWeekGrid() {
+    const url = new URL(window.location);
+    url.searchParams.set('fragment', 'grid');
+    const response = await fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const tbody = document.querySelector('[data-sync-cursor] tbody');
+    const template = document.createElement('template');
+    template.innerHTML = (await response.text()).trim();
+    const grid = template.content.querySelector('tbody');
+    if (tbody && grid) {
+        tbody.replaceWith(grid);
+        initializeTooltips();
+    }
+}
+
+async function syncEvents({ refreshGrid = true } = {}) {
+    const calendar = document.querySelector('[data-sync-cursor]');
+    if (!calendar) {
+        location.reload();
+        return null;
+    }
+    const params = new URLSearchParams({ since: eventSync.cursor || '' });
+    const response = await fetch(`/planner/events/changes/?${params}`);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    if (data.reset) {
+        location.reload();
+        return data;
+    }
+    eventSync.cursor = data.cursor;
+    data.events.forEach(event => eventSync.events.set(event.id, event));
+    data.deleted.forEach(id => eventSync.events.delete(id));
+    if (refreshGrid && changesTouchVisibleWeek(data, calendar)) {
+        await refreshWeekGrid();
+    }
+    return data;
+}
+
 function getCSRFToken() {
     const token = document.querySelector('[name=csrfmiddlewaretoken]');
     return token ? token.value : '';
@@ -553,5 +626,6 @@ window.calendarUtils = {
     showNotification,
     showLoading,
     hideLoading,
-    optimizeSchedule
+    optimizeSchedule,
+    syncEvents
 };
\ No newline at end of file
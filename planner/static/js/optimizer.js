@@ -21,7 +21,7 @@ document.addEventListener('DOMContentLoaded', function () {
             'Content-Type': 'application/json',
             'X-CSRFToken': getCookie('csrftoken'),
           },
-          body: JSON.stringify({}),
+          body: JSON.stringify({ async: true, render: true }),
         });
 
         console.log('Respuesta recibida:', response.status);
@@ -29,12 +29,19 @@ document.addEventListener('DOMContentLoaded', function () {
           throw new Error(`Error HTTP: ${response.status}`);
         }
 
-        const data = await response.json();
+        let data = await response.json();
         console.log('Datos recibidos:', data);
 
+        // La optimización corre en segundo plano: consultar hasta que termine
+        if (data.job_id) {
+          data = await waitForOptimizationJob(data.status_url + '?render=1');
+          console.log('Resultado del trabajo:', data);
+        }
+
         if (data.success) {
-          if (data.suggestions && data.suggestions.length > 0) {
-            await showSuggestions(data.suggestions);
+          // El servidor devuelve el modal ya renderizado (html) en lugar de la lista de sugerencias
+          if (data.html) {
+            showSuggestions(data.html);
           } else {
             if (data.insufficient_tasks) {
               const currentTasks = data.current_tasks || 0;
@@ -66,26 +73,26 @@ document.addEventListener('DOMContentLoaded', function () {
   }
 });
 
-async function showSuggestions(suggestions) {
-  console.log('Mostrando sugerencias:', suggestions);
-
-  try {
-    const response = await fetch('/planner/suggestions_template/', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'X-CSRFToken': getCookie('csrftoken'),
-        'X-Requested-With': 'XMLHttpRequest',
-      },
-      body: JSON.stringify({ suggestions: suggestions }),
+async function waitForOptimizationJob(statusUrl, intervalMs = 1000, maxAttempts = 120) {
+  for (let attempt = 0; attempt < maxAttempts; attempt++) {
+    const response = await fetch(statusUrl, {
+      headers: { 'X-Requested-With': 'XMLHttpRequest' },
     });
-
     if (!response.ok) {
-      throw new Error('No se pudo cargar la plantilla del modal: ' + response.status);
+      throw new Error(`Error HTTP: ${response.status}`);
     }
 
-    const modalHtml = await response.text();
-    
+    const data = await response.json();
+    if (data.status === 'done' || data.status === 'failed') {
+      return data;
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+  throw new Error('La optimización tardó demasiado en completarse');
+}
+
+function showSuggestions(modalHtml) {
+  try {
     // Buscar el contenedor del modal o usar el body como fallback
     const modalContainer = document.getElementById('modal-container') || document.body;
     
@@ -109,7 +116,34 @@ async function showSuggestions(suggestions) {
     // Mostrar el modal
     modal.style.display = 'flex';
 
+    // Los horarios sugeridos vienen en los atributos data-* de cada casilla
+    const suggestions = Array.from(modal.querySelectorAll('input[name="suggestion"]'), box => ({
+      event_id: box.value,
+      suggested_time_iso: box.dataset.start,
+      suggested_end_time_iso: box.dataset.end,
+    }));
+
+    // Las sugerencias que no se aplican se registran como descartadas (una sola vez)
+    let feedbackSent = false;
+    const dismissSuggestions = (dismissed) => {
+      if (feedbackSent) return;
+      feedbackSent = true;
+      if (dismissed.length === 0) return;
+      fetch('/planner/suggestions/dismiss/', {
+        method: 'POST',
+        keepalive: true,
+        headers: {
+          'Content-Type': 'application/json',
+          'X-CSRFToken': getCookie('csrftoken'),
+        },
+        body: JSON.stringify({
+          suggestions: dismissed.map(s => ({ event_id: s.event_id, suggested_time_iso: s.suggested_time_iso })),
+        }),
+      }).catch(error => console.error('Error al registrar sugerencias descartadas:', error));
+    };
+
     const closeModal = () => {
+      dismissSuggestions(suggestions);
       if (modal && modal.parentNode) {
         modal.style.display = 'none';
         modal.remove();
@@ -162,9 +196,18 @@ async function showSuggestions(suggestions) {
             }
           }
 
-          alert('Cambios aplicados exitosamente. La página se recargará para mostrar los cambios.');
+          const appliedIds = Array.from(checkedBoxes, box => box.value);
+          dismissSuggestions(suggestions.filter(s => !appliedIds.includes(String(s.event_id))));
+
           closeModal();
-          location.reload();
+          if (window.calendarUtils) {
+            // Solo se piden los eventos que cambiaron; si falla se recarga la página
+            await window.calendarUtils.syncEvents().catch(() => location.reload());
+            window.calendarUtils.showNotification('Cambios aplicados exitosamente', 'success');
+          } else {
+            alert('Cambios aplicados exitosamente. La página se recargará para mostrar los cambios.');
+            location.reload();
+          }
         } catch (error) {
           console.error('Error al aplicar cambios:', error);
           alert('Hubo un error al aplicar los cambios. Por favor, intenta de nuevo.');
@@ -198,6 +241,7 @@ async function applySuggestionWithTimes(eventId, newTime, newEndTime) {
     body: JSON.stringify({
       start_time: newTime,
       end_time: newEndTime,
+      from_suggestion: true,
     }),
   });
 
@@ -0,0 +1,58 @@
+"""
+Caché de las sugerencias del optimizador por usuario.
+
+Cada entrada guarda el resultado junto con una huella del conjunto de eventos
+pendientes de la ventana (ids y updated_at), la fecha de inicio, la versión del
+modelo y la rejilla de inicios candidatos. Si al volver a optimizar la huella coincide, se responde sin llamar al
+modelo. Las señales de Event eliminan la entrada del usuario apenas cambia uno
+de sus eventos, y el backend de caché limita el número de entradas (MAX_ENTRIES).
+
+Los resultados que se entregan al cliente con un id para renderizar el modal no
+se guardan aquí sino en OptimizationJob (ver planner.jobs.store_result), porque
+esta caché es local a cada proceso.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_ALIAS = 'optimizer'
+# Las sugerencias dependen de la fecha de inicio, así que no tiene sentido guardarlas más de un día
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache():
+    alias = CACHE_ALIAS if CACHE_ALIAS in getattr(settings, 'CACHES', {}) else 'default'
+    return caches[alias]
+
+
+def _key(user_id):
+    return f'planner:suggestions:{user_id}'
+
+
+def fingerprint(events, start_date, model_version, *extra):
+    """
+    Huella del conjunto de eventos (id y updated_at), la fecha de inicio, la versión
+    del modelo y cualquier otro parámetro que cambie el resultado (`extra`)
+    """
+    sha = hashlib.sha1()
+    sha.update('|'.join(str(v) for v in (start_date, model_version) + extra).encode())
+    for event_id, updated_at in sorted((e.pk, e.updated_at.isoformat()) for e in events):
+        sha.update(f'|{event_id}:{updated_at}'.encode())
+    return sha.hexdigest()
+
+
+def get_cached_suggestions(user_id, huella):
+    entrada = _cache().get(_key(user_id))
+    if entrada and entrada.get('fingerprint') == huella:
+        return entrada['result']
+    return None
+
+
+def set_cached_suggestions(user_id, huella, result):
+    _cache().set(_key(user_id), {'fingerprint': huella, 'result': result}, CACHE_TIMEOUT)
+
+
+def invalidate_user_suggestions(user_id):
+    _cache().delete(_key(user_id))
+
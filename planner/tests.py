@@ -1,3 +1,841 @@
-from django.test import TestCase
+import json
+import os
+import re
+import subprocess
+import sys
+import unittest
+from datetime import datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from planner.availability import BusyIntervalIndex
+from planner.candidate_slots import CandidateSlots
+from planner.event_sync import TOMBSTONE_RETENTION, current_sync_cursor, encode_sync_cursor
+from planner.forms import EventForm
+from planner.jobs import enqueue_optimization, get_stored_result, run_optimization_job, store_result
+from planner.models import Event, EventTombstone, OptimizationJob, SuggestionFeedback
+from planner.schedule_solver import ScheduleSolver, solve_schedule
+from planner.week_layout import layout_week
+
+HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'scipy', 'joblib')
+# Tiempo acumulado (python -X importtime) para importar planner.views. Hoy toma
+# unos 10 ms; el margen es amplio para no fallar en máquinas cargadas, pero importar
+# numpy/pandas/sklearn lo supera
+VIEWS_IMPORT_BUDGET_SECONDS = 1.0
+
+
+class ViewsImportTests(SimpleTestCase):
+    """planner.views no debe cargar el stack científico al importarse"""
+
+    def _import_views(self):
+        codigo = (
+            "import sys, django; django.setup(); import planner.views; "
+            f"print('HEAVY=' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'PLANIFICADOR_IA.settings'))
+        resultado = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', codigo],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(resultado.returncode, 0, resultado.stderr[-2000:])
+        return resultado
+
+    def test_views_import_does_not_load_ml_stack(self):
+        resultado = self._import_views()
+        heavy = re.search(r'^HEAVY=(.*)$', resultado.stdout, re.MULTILINE).group(1)
+        self.assertEqual(heavy, '', f"planner.views importó: {heavy}")
+
+    def test_views_import_time(self):
+        resultado = self._import_views()
+        # Formato: "import time: self [us] | cumulative | nombre"
+        importados = re.findall(r'^import time:\s*\d+ \|\s*(\d+) \| *(\S+)$', resultado.stderr, re.MULTILINE)
+        pesados = sorted({nombre for _, nombre in importados if nombre.split('.')[0] in HEAVY_MODULES})
+        self.assertEqual(pesados, [], f"Se importaron durante el arranque: {', '.join(pesados)}")
+
+        vistas = [int(acumulado) for acumulado, nombre in importados if nombre == 'planner.views']
+        self.assertEqual(len(vistas), 1, "No se encontró planner.views en la salida de -X importtime")
+        segundos = vistas[0] / 1e6
+        self.assertLess(
+            segundos, VIEWS_IMPORT_BUDGET_SECONDS,
+            f"Importar planner.views tomó {segundos:.3f}s (presupuesto {VIEWS_IMPORT_BUDGET_SECONDS}s)"
+        )
+
+
+class EventFormQueryCountTests(TestCase):
+    """EventForm valida conflictos y carga diaria con una sola consulta"""
+
+    FORMAT = '%Y-%m-%dT%H:%M'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('estudiante', password='clave-segura')
+        cls.day = timezone.localdate() + timedelta(days=1)
+        # 10 horas de tareas ese día, una de ellas a las 10:00
+        for hora, titulo in ((6, 'Lectura uno'), (10, 'Lectura dos'), (14, 'Lectura tres')):
+            Event.objects.create(
+                user=cls.user, title=titulo, event_type='tarea',
+                start_time=cls._at(cls.day, hora), end_time=cls._at(cls.day, hora) + timedelta(hours=3, minutes=20),
+            )
+
+    @staticmethod
+    def _at(day, hour):
+        return timezone.make_aware(datetime.combine(day, time(hour)))
+
+    def _form(self, start, end, event_type='tarea', instance=None):
+        return EventForm(data={
+            'title': 'Repaso de álgebra',
+            'event_type': event_type,
+            'priority': 'media',
+            'category': 'General',
+            'start_time': timezone.localtime(start).strftime(self.FORMAT),
+            'end_time': timezone.localtime(end).strftime(self.FORMAT),
+        }, instance=instance, user=self.user)
+
+    def test_conflicts_and_workload_use_one_query(self):
+        start = self._at(self.day, 11)
+        form = self._form(start, start + timedelta(hours=1))
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+        errores = form.errors['start_time']
+        self.assertIn('Conflicto de horario con: Lectura dos', errores)
+        self.assertTrue(any('horas de trabajo/estudio' in error for error in errores))
+
+    def test_free_slot_without_workload_check(self):
+        start = self._at(self.day + timedelta(days=1), 9)
+        form = self._form(start, start + timedelta(hours=1), event_type='personal')
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid(), form.errors)
+
+    def test_editing_excludes_the_event_itself(self):
+        evento = Event.objects.get(title='Lectura dos')
+        form = self._form(evento.start_time, evento.end_time, instance=evento)
+        with self.assertNumQueries(1):
+            form.is_valid()
+        self.assertNotIn('Conflicto de horario con: Lectura dos', form.errors.get('start_time', []))
+
+
+class RecurringEventOverlapTests(TestCase):
+    """Las validaciones y los inicios libres ven las ocurrencias de las series, no solo la primera"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('horario', password='clave-segura')
+        # El día de la prueba es una ocurrencia posterior de una clase semanal de 8:00 a 14:30
+        cls.day = timezone.localdate() + timedelta(days=8)
+        primera = EventFormQueryCountTests._at(cls.day - timedelta(weeks=2), 8)
+        cls.series = Event.objects.create(
+            user=cls.user, title='Clase de anatomía', event_type='clase',
+            start_time=primera, end_time=primera + timedelta(hours=6, minutes=30),
+            recurrence_rule='FREQ=WEEKLY',
+        )
+
+    def _form(self, start, end, event_type='tarea'):
+        return EventForm(data={
+            'title': 'Repaso de álgebra',
+            'event_type': event_type,
+            'priority': 'media',
+            'start_time': timezone.localtime(start).strftime(EventFormQueryCountTests.FORMAT),
+            'end_time': timezone.localtime(end).strftime(EventFormQueryCountTests.FORMAT),
+        }, user=self.user)
+
+    def test_conflict_with_later_occurrence(self):
+        start = EventFormQueryCountTests._at(self.day, 9)
+        form = self._form(start, start + timedelta(hours=1), event_type='personal')
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+        self.assertIn('Conflicto de horario con: Clase de anatomía', form.errors['start_time'])
+
+    def test_workload_counts_later_occurrence(self):
+        start = EventFormQueryCountTests._at(self.day, 15)
+        form = self._form(start, start + timedelta(hours=4))
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+        self.assertTrue(any('horas de trabajo/estudio' in error for error in form.errors['start_time']))
+
+    def test_cancelled_occurrence_is_free(self):
+        self.series.cancel_occurrence(EventFormQueryCountTests._at(self.day, 8))
+        start = EventFormQueryCountTests._at(self.day, 9)
+        form = self._form(start, start + timedelta(hours=1), event_type='personal')
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_free_slots_skip_later_occurrence(self):
+        from planner.productivity import get_productivity_model, score_free_slots
+        if get_productivity_model() is None:
+            self.skipTest("No hay modelo de productividad")
+        libres = score_free_slots(self.user, self.day, self.day, 60)
+        horas = {slot['hora'] for slot in libres}
+        self.assertFalse(horas & {8.0, 9.0, 14.0})
+        self.assertIn(15.0, horas)
+
+
+class CalendarWeekVersionTests(TestCase):
+    """La versión de la rejilla semanal sale de la base de datos, no de la caché de un proceso"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('calendario', password='clave-segura')
+        cls.monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+        inicio = timezone.make_aware(datetime.combine(cls.monday, time(10)))
+        cls.event = Event.objects.create(
+            user=cls.user, title='Clase de química', event_type='clase',
+            start_time=inicio, end_time=inicio + timedelta(hours=1),
+        )
+
+    def _version(self):
+        from planner.calendar_cache import week_version
+        from planner.date_windows import day_bounds
+        return week_version(self.user.pk, *day_bounds(self.monday, self.monday + timedelta(days=6)))
+
+    def test_version_changes_on_edit_and_delete(self):
+        inicial = self._version()
+        self.assertEqual(inicial, self._version())
+        self.event.title = 'Clase de física'
+        self.event.save()
+        editado = self._version()
+        self.assertNotEqual(inicial, editado)
+        self.event.delete()
+        self.assertNotIn(self._version(), (inicial, editado))
+
+    def test_grid_shows_edit_without_clearing_cache(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get('/planner/horarios/'), 'Clase de química')
+        # Otro proceso guarda el cambio: aquí no se invalida nada de la caché local
+        Event.objects.filter(pk=self.event.pk).update(title='Clase de física', updated_at=timezone.now())
+        self.assertContains(self.client.get('/planner/horarios/'), 'Clase de física')
+
+
+class WeekLayoutLaneTests(SimpleTestCase):
+    """Los eventos que se cruzan en un día comparten el ancho en carriles"""
+
+    def setUp(self):
+        hoy = timezone.localdate()
+        self.lunes = hoy - timedelta(days=hoy.weekday())
+        self.tz = timezone.get_current_timezone()
+
+    def _event(self, pk, dia, inicio, fin):
+        fecha = self.lunes + timedelta(days=dia)
+        return Event(id=pk, user_id=1, title=f'Evento {pk}', event_type='tarea',
+                     start_time=timezone.make_aware(datetime.combine(fecha, inicio)),
+                     end_time=timezone.make_aware(datetime.combine(fecha, fin)))
+
+    def test_overlapping_events_get_distinct_lanes(self):
+        eventos, filas = layout_week([
+            self._event(1, 0, time(9), time(11)),
+            self._event(2, 0, time(10), time(12)),
+            self._event(3, 0, time(10, 30), time(11)),
+            # Empieza cuando termina el 2: no se cruza, vuelve a un solo carril
+            self._event(4, 0, time(12), time(13)),
+            self._event(5, 1, time(10), time(11)),
+        ], self.lunes, self.tz)
+        carriles = {e['id']: (e['lane'], e['lanes']) for e in eventos}
+        self.assertEqual(carriles, {1: (0, 3), 2: (1, 3), 3: (2, 3), 4: (0, 1), 5: (0, 1)})
+
+        # Cada celda lista sus eventos en orden de carril y marca las continuaciones
+        celda = filas[10]['cells'][0]['entries']
+        self.assertEqual([(c['event']['id'], c['is_continuation']) for c in celda],
+                         [(1, True), (2, False), (3, False)])
+        self.assertEqual([c['event']['id'] for c in filas[12]['cells'][0]['entries']], [4])
+
+    def test_lane_is_reused_when_free(self):
+        eventos, _ = layout_week([
+            self._event(1, 2, time(8), time(12)),
+            self._event(2, 2, time(8), time(9)),
+            self._event(3, 2, time(10), time(11)),
+        ], self.lunes, self.tz)
+        carriles = {e['id']: (e['lane'], e['lanes']) for e in eventos}
+        # El 3 usa el carril que dejó libre el 2; el grupo sigue teniendo dos carriles
+        self.assertEqual(carriles, {1: (0, 2), 2: (1, 2), 3: (1, 2)})
+
+
+class OptimizerEventMappingTests(SimpleTestCase):
+    """El optimizador recibe los mismos tipos y prioridades con los que se entrena"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from planner.optimization import get_optimizer
+        cls.optimizer = get_optimizer()
+        if not cls.optimizer.is_loaded:
+            raise unittest.SkipTest("No hay modelo entrenado en trained_models")
+
+    def test_scores_clase_alta_with_its_own_features(self):
+        inicio = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(10)))
+        evento = Event(id=1, user_id=1, title='Clase de cálculo', event_type='clase', priority='alta',
+                       start_time=inicio, end_time=inicio + timedelta(hours=2))
+        datos = self.optimizer.event_to_data(evento, inicio.date())
+        self.assertEqual((datos['event_type'], datos['priority']), ('clase', 'alta'))
+
+        generico = dict(datos, event_type='otro', priority='media')
+        slots = self.optimizer.candidate_slots(inicio.date(), inicio.date() + timedelta(days=1))
+        _, probs, _, _ = self.optimizer.score_matrix([datos, generico], [], slots)
+        self.assertFalse((probs[0] == probs[1]).all())
+
+
+class OptimizerAssignmentTests(SimpleTestCase):
+    """La mejora de cada sugerencia se mide contra el score del inicio actual"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from planner.optimization import get_optimizer
+        cls.optimizer = get_optimizer()
+        if not cls.optimizer.is_loaded:
+            raise unittest.SkipTest("No hay modelo entrenado en trained_models")
+
+    def test_off_grid_start_already_at_its_best_time(self):
+        dia = timezone.localdate() + timedelta(days=1)
+        actual = datetime.combine(dia, time(9, 15))
+        datos = {'event_id': 1, 'event_type': 'tarea', 'priority': 'media', 'duration': 1.0,
+                 'weekday': dia.weekday(), 'due_date': None, 'start_date': dia}
+        slots = self.optimizer.candidate_slots(dia, dia)
+        self.assertEqual(slots.index_of([actual])[0], -1)
+
+        # El mejor momento posible es justo las 09:15, fuera de la rejilla
+        def score_por_hora(prob, hora, event_dict):
+            return np.broadcast_to(1.0 - np.abs(hora - 9.25) / 24.0, np.shape(prob)).copy()
+
+        with mock.patch.object(self.optimizer, '_calculate_score', side_effect=score_por_hora), \
+                mock.patch.object(self.optimizer, '_productivity_factor', return_value=1.0):
+            slots, _, scores, disponibles = self.optimizer.score_matrix([datos], [], slots)
+            asignacion = self.optimizer.assign_schedule([datos], slots, scores, disponibles, [actual])
+        self.assertEqual(list(asignacion), [-1])
+
+
+class ScheduleSolverTests(SimpleTestCase):
+    """Asignación global de sugerencias: sin choques en el día, determinista y no peor que la voraz"""
+
+    def _instancia(self, semilla):
+        rng = np.random.default_rng(semilla)
+        horas = np.tile(np.arange(6, 22.5, 0.5), 3)
+        dias = np.repeat(np.arange(3), len(horas) // 3)
+        gains = rng.normal(0.0, 1.0, (25, len(horas)))
+        allowed = rng.random(gains.shape) > 0.2
+        durations = rng.choice([0.5, 1.0, 1.5, 2.0, 3.0], size=25)
+        return gains, allowed, horas, durations, dias
+
+    def test_same_day_suggestions_do_not_overlap(self):
+        for semilla in range(5):
+            gains, allowed, horas, durations, dias = self._instancia(semilla)
+            asignacion = solve_schedule(gains, allowed, horas, durations, dias)
+            intervalos = sorted(
+                (dias[j], horas[j], horas[j] + durations[i]) for i, j in enumerate(asignacion) if j >= 0
+            )
+            for (dia_a, _, fin_a), (dia_b, inicio_b, _) in zip(intervalos, intervalos[1:]):
+                if dia_a == dia_b:
+                    self.assertLess(fin_a, inicio_b)
+            for i, j in enumerate(asignacion):
+                if j >= 0:
+                    self.assertTrue(allowed[i, j])
+                    self.assertGreater(gains[i, j], 0)
+
+    def test_is_deterministic(self):
+        instancia = self._instancia(7)
+        self.assertEqual(solve_schedule(*instancia), solve_schedule(*instancia))
+
+    def test_total_gain_not_below_greedy(self):
+        for semilla in range(5):
+            gains, allowed, horas, durations, dias = self._instancia(semilla)
+            voraz = ScheduleSolver(gains, allowed, horas, durations, dias)
+            voraz._voraz_original()
+            asignacion = solve_schedule(gains, allowed, horas, durations, dias)
+            total = sum(gains[i, j] for i, j in enumerate(asignacion) if j >= 0)
+            self.assertGreaterEqual(total, voraz._total() - 1e-9)
+
+
+class BusyIntervalIndexTests(SimpleTestCase):
+    """El índice de intervalos da lo mismo que revisar evento por evento"""
+
+    def setUp(self):
+        self.dia = timezone.localdate() + timedelta(days=1)
+
+    def _at(self, dia, hora, minuto=0):
+        return timezone.make_aware(datetime.combine(dia, time(hora, minuto)))
+
+    def _event(self, pk, inicio, fin):
+        return Event(id=pk, user_id=1, title=f'Evento {pk}', start_time=inicio, end_time=fin)
+
+    @staticmethod
+    def _loop_busy(events, inicio, fin, exclude_pk=None):
+        # Criterio anterior: recorrer todos los eventos del usuario
+        return any(e.start_time < fin and e.end_time > inicio for e in events if e.pk != exclude_pk)
+
+    def _busy(self, index, inicio, fin, exclude_pk=None):
+        return bool(index.count_overlaps([inicio.timestamp()], [fin.timestamp()], exclude_pk)[0] > 0)
+
+    def test_touching_intervals_are_free(self):
+        index = BusyIntervalIndex([self._event(1, self._at(self.dia, 9), self._at(self.dia, 10))])
+        self.assertFalse(self._busy(index, self._at(self.dia, 10), self._at(self.dia, 11)))
+        self.assertFalse(self._busy(index, self._at(self.dia, 8), self._at(self.dia, 9)))
+        self.assertTrue(self._busy(index, self._at(self.dia, 9, 59), self._at(self.dia, 11)))
+
+    def test_zero_length_events(self):
+        eventos = [self._event(1, self._at(self.dia, 10, 30), self._at(self.dia, 10, 30)),
+                   self._event(2, self._at(self.dia, 12), self._at(self.dia, 12))]
+        index = BusyIntervalIndex(eventos)
+        for inicio, fin in [(10, 11), (11, 12), (12, 13), (9, 10)]:
+            a, b = self._at(self.dia, inicio), self._at(self.dia, fin)
+            self.assertEqual(self._busy(index, a, b), self._loop_busy(eventos, a, b), (inicio, fin))
+        self.assertTrue(self._busy(index, self._at(self.dia, 10), self._at(self.dia, 11)))
+        self.assertFalse(self._busy(index, self._at(self.dia, 12), self._at(self.dia, 13)))
+
+    def test_exclude_pks_ignores_only_the_event_itself(self):
+        eventos = [self._event(1, self._at(self.dia, 9), self._at(self.dia, 11)),
+                   self._event(2, self._at(self.dia, 10), self._at(self.dia, 12))]
+        index = BusyIntervalIndex(eventos)
+        a, b = self._at(self.dia, 9), self._at(self.dia, 10)
+        self.assertTrue(self._busy(index, a, b))
+        self.assertFalse(self._busy(index, a, b, exclude_pk=1))
+        self.assertTrue(self._busy(index, self._at(self.dia, 10), self._at(self.dia, 11), exclude_pk=1))
+
+        slots = CandidateSlots.window(self.dia, self.dia, 60)
+        libres = index.free_matrix(slots, [1.0, 1.0, 1.0], exclude_pks=[1, 2, 99])
+        for j in range(len(slots)):
+            inicio = timezone.make_aware(slots.datetime(j))
+            for fila, pk in enumerate([1, 2, 99]):
+                fin = inicio + timedelta(hours=1)
+                self.assertEqual(libres[fila, j], not self._loop_busy(eventos, inicio, fin, pk))
+
+    def test_multi_day_window_matches_event_loop(self):
+        rng = np.random.default_rng(3)
+        dias = [self.dia + timedelta(days=k) for k in range(3)]
+        eventos = []
+        for pk in range(1, 31):
+            inicio = self._at(dias[int(rng.integers(3))], int(rng.integers(6, 22)), int(rng.choice([0, 15, 30, 45])))
+            eventos.append(self._event(pk, inicio, inicio + timedelta(minutes=int(rng.choice([0, 30, 60, 90, 240])))))
+        # Un evento que cruza la medianoche ocupa el final de un día y el inicio del siguiente
+        eventos.append(self._event(31, self._at(dias[0], 21), self._at(dias[1], 7)))
+        index = BusyIntervalIndex(eventos)
+
+        slots = CandidateSlots.window(dias[0], dias[-1], 30)
+        duraciones = [0.5, 1.0, 2.5]
+        pks = [eventos[0].pk, eventos[30].pk, None]
+        libres = index.free_matrix(slots, duraciones, exclude_pks=pks)
+        for j in range(len(slots)):
+            inicio = timezone.make_aware(slots.datetime(j))
+            for fila, (duracion, pk) in enumerate(zip(duraciones, pks)):
+                fin = inicio + timedelta(hours=duracion)
+                self.assertEqual(libres[fila, j], not self._loop_busy(eventos, inicio, fin, pk),
+                                 (slots.datetime(j), duracion))
+
+
+class EventUpdateAjaxTests(TestCase):
+    """event_update_ajax rechaza un fin que no es posterior al inicio"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('arrastre', password='clave-segura')
+        inicio = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(9)))
+        self.event = Event.objects.create(
+            user=self.user, title='Lectura de historia', event_type='tarea',
+            start_time=inicio, end_time=inicio + timedelta(hours=1),
+        )
+        self.client.force_login(self.user)
+
+    def test_end_before_start_returns_400(self):
+        respuesta = self.client.post(
+            f'/planner/event/{self.event.pk}/update-ajax/',
+            data=json.dumps({
+                'start_time': (self.event.start_time + timedelta(hours=2)).isoformat(),
+                'end_time': self.event.start_time.isoformat(),
+            }),
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.event.refresh_from_db()
+        self.assertLess(self.event.start_time, self.event.end_time)
+
+
+class SuggestionFeedbackTests(TestCase):
+    """Las respuestas a sugerencias se guardan con un solo INSERT por petición"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('respuestas', password='clave-segura')
+        inicio = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(9)))
+        self.events = [
+            Event.objects.create(
+                user=self.user, title=f'Tarea {k}', event_type='tarea',
+                start_time=inicio + timedelta(hours=2 * k), end_time=inicio + timedelta(hours=2 * k + 1),
+            )
+            for k in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def _inserts(self, contexto):
+        return [q for q in contexto.captured_queries if 'planner_suggestionfeedback' in q['sql']
+                and q['sql'].lstrip().upper().startswith('INSERT')]
+
+    def test_dismiss_saves_all_rows_with_one_insert(self):
+        sugerencias = [
+            {'event_id': event.pk, 'suggested_time_iso': (event.start_time + timedelta(days=1)).isoformat()}
+            for event in self.events
+        ]
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.post('/planner/suggestions/dismiss/', data=json.dumps(
+                {'suggestions': sugerencias}), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(self._inserts(contexto)), 1)
+        self.assertEqual(SuggestionFeedback.objects.filter(accepted=False).count(), 3)
+
+    def test_applied_suggestion_saves_one_row(self):
+        event = self.events[0]
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.post(f'/planner/event/{event.pk}/update-ajax/', data=json.dumps({
+                'start_time': (event.start_time + timedelta(days=2)).isoformat(),
+                'end_time': (event.end_time + timedelta(days=2)).isoformat(),
+                'from_suggestion': True,
+            }), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(self._inserts(contexto)), 1)
+        self.assertTrue(SuggestionFeedback.objects.get().accepted)
+
+
+class OptimizationJobTests(TestCase):
+    """Trabajos de optimización en segundo plano y resultados guardados"""
+
+    RESULTADO = {
+        'success': True,
+        'message': 'Se encontraron 1 sugerencias de optimización.',
+        'suggestions': [{'event_id': 1, 'title': 'Tarea', 'mejor_hora': 9.0,
+                         'todas_opciones': [{'hora': 9.0, 'score': 0.8}]}],
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user('trabajos', password='clave-segura')
+        self.client.force_login(self.user)
+
+    def _enqueue(self):
+        # El envío al pool queda en on_commit y no se ejecuta: el trabajo se corre a mano
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            job = enqueue_optimization(self.user)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(job.status, 'pending')
+        return job
+
+    def _run(self, job, **calculo):
+        with mock.patch('planner.optimization.compute_schedule_suggestions', **calculo), \
+                mock.patch('planner.jobs.close_old_connections'), mock.patch('planner.jobs.connection'):
+            run_optimization_job(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def _status(self, job, client=None):
+        return (client or self.client).get(f'/planner/optimize/jobs/{job.pk}/')
+
+    def test_pending_running_done(self):
+        job = self._enqueue()
+        estados = []
+
+        def calcular(user):
+            estados.append(OptimizationJob.objects.get(pk=job.pk).status)
+            return self.RESULTADO
+
+        job = self._run(job, side_effect=calcular)
+        self.assertEqual(estados, ['running'])
+        self.assertEqual(job.status, 'done')
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.finished_at)
+
+        datos = self._status(job).json()
+        self.assertEqual((datos['status'], datos['count'], datos['result_id']), ('done', 1, str(job.pk)))
+
+    def test_failed_job_reports_error(self):
+        job = self._run(self._enqueue(), side_effect=RuntimeError('sin modelo'))
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('sin modelo', job.error)
+
+        datos = self._status(job).json()
+        self.assertEqual(datos['status'], 'failed')
+        self.assertFalse(datos['success'])
+
+    def test_job_that_is_no_longer_pending_is_not_run(self):
+        job = self._enqueue()
+        OptimizationJob.objects.filter(pk=job.pk).update(status='failed')
+        calculo = mock.Mock(return_value=self.RESULTADO)
+        job = self._run(job, new=calculo)
+        calculo.assert_not_called()
+        self.assertEqual(job.status, 'failed')
+
+    def test_other_user_gets_404(self):
+        job = self._run(self._enqueue(), return_value=self.RESULTADO)
+        otro = User.objects.create_user('intruso', password='clave-segura')
+        cliente = self.client_class()
+        cliente.force_login(otro)
+        self.assertEqual(self._status(job, cliente).status_code, 404)
+        self.assertEqual(cliente.get(f'/planner/suggestions/{job.pk}/modal/').status_code, 410)
+        self.assertEqual(self._status(job).status_code, 200)
+
+    def test_delivered_results_are_kept(self):
+        result_id = store_result(self.user, self.RESULTADO)
+        self.assertEqual(get_stored_result(self.user, result_id), self.RESULTADO)
+
+        # Consultar el resultado (modal o estado) no lo borra
+        for _ in range(2):
+            self.assertEqual(self.client.get(f'/planner/suggestions/{result_id}/modal/').status_code, 200)
+        job = OptimizationJob.objects.get(pk=result_id)
+        for _ in range(2):
+            self.assertEqual(self._status(job).json()['count'], 1)
+        self.assertEqual(get_stored_result(self.user, result_id), self.RESULTADO)
+
+        self.assertIsNone(get_stored_result(self.user, 'no-es-un-uuid'))
+        otro = User.objects.create_user('ajeno', password='clave-segura')
+        self.assertIsNone(get_stored_result(otro, result_id))
+
+
+class SuggestionCacheTests(TestCase):
+    """Las sugerencias se sirven desde la caché mientras no cambien los eventos"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from planner.optimization import get_optimizer
+        if not get_optimizer().is_loaded:
+            raise unittest.SkipTest("No hay modelo entrenado en trained_models")
+
+    def setUp(self):
+        from planner.ai_optimizer import SmartScheduleOptimizer
+        from planner.suggestion_cache import invalidate_user_suggestions
+
+        self.user = User.objects.create_user('cache', password='clave-segura')
+        invalidate_user_suggestions(self.user.pk)
+        self.addCleanup(invalidate_user_suggestions, self.user.pk)
+        manana = timezone.localdate() + timedelta(days=1)
+        self.events = [
+            Event.objects.create(
+                user=self.user, title=f'Tarea {hora}', event_type='tarea', priority='alta',
+                start_time=timezone.make_aware(datetime.combine(manana, time(hora))),
+                end_time=timezone.make_aware(datetime.combine(manana, time(hora + 1))),
+            )
+            for hora in (7, 10, 13, 16, 19, 21)
+        ]
+        original = SmartScheduleOptimizer._predict_proba
+        patcher = mock.patch.object(SmartScheduleOptimizer, '_predict_proba', autospec=True, side_effect=original)
+        self.predict = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _compute(self):
+        from planner.optimization import compute_schedule_suggestions
+        return compute_schedule_suggestions(self.user)
+
+    def test_repeated_request_makes_no_model_calls(self):
+        primero = self._compute()
+        self.assertGreater(self.predict.call_count, 0)
+        self.predict.reset_mock()
+
+        self.assertEqual(self._compute(), primero)
+        self.assertEqual(self.predict.call_count, 0)
+
+    def test_editing_an_event_misses_the_cache(self):
+        from planner.suggestion_cache import fingerprint
+
+        self._compute()
+        self.predict.reset_mock()
+        antes = fingerprint(self.events, timezone.localdate(), 1)
+
+        evento = self.events[0]
+        evento.start_time += timedelta(hours=1)
+        evento.end_time += timedelta(hours=1)
+        evento.save()
+        self.assertNotEqual(fingerprint(self.events, timezone.localdate(), 1), antes)
+
+        self._compute()
+        self.assertGreater(self.predict.call_count, 0)
+
+
+class EventListApiTests(TestCase):
+    """list_user_events: ETag con 304 y paginación por cursor (start_time, id)"""
+
+    URL = '/planner/list-user-events/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('api', password='clave-segura')
+        self.client.force_login(self.user)
+        self.dia = timezone.localdate() + timedelta(days=1)
+        # Dos eventos con el mismo inicio: el id decide el orden entre ellos
+        self.events = [
+            Event.objects.create(user=self.user, title=f'Evento {k}', event_type='tarea',
+                                 start_time=self._at(hora), end_time=self._at(hora) + timedelta(minutes=30))
+            for k, hora in enumerate((8, 9, 9, 11, 12))
+        ]
+
+    def _at(self, hora):
+        return timezone.make_aware(datetime.combine(self.dia, time(hora)))
+
+    def _pages(self, **params):
+        ids, cursor, paginas = [], None, 0
+        while True:
+            consulta = dict(params, **({'cursor': cursor} if cursor else {}))
+            datos = self.client.get(self.URL, consulta).json()
+            paginas += 1
+            ids += [e['id'] for e in datos['events']]
+            cursor = datos['next_cursor']
+            if cursor is None:
+                return ids, paginas
+
+    def test_etag_returns_304_until_the_window_changes(self):
+        respuesta = self.client.get(self.URL)
+        etag = respuesta['ETag']
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        evento = self.events[0]
+        evento.title = 'Evento editado'
+        evento.save()
+        respuesta = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+        etag = respuesta['ETag']
+        self.events[1].delete()
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_the_parameters(self):
+        etag = self.client.get(self.URL, {'limit': 2})['ETag']
+        self.assertEqual(self.client.get(self.URL, {'limit': 3}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cursor_pages_cover_every_event_once(self):
+        esperado = [e.pk for e in sorted(self.events, key=lambda e: (e.start_time, e.pk))]
+        for limite, paginas in [(1, 5), (2, 3), (4, 2), (5, 1), (6, 1)]:
+            ids, total_paginas = self._pages(limit=limite)
+            self.assertEqual(ids, esperado, limite)
+            self.assertEqual(total_paginas, paginas, limite)
+
+    def test_cursor_between_equal_start_times(self):
+        datos = self.client.get(self.URL, {'limit': 2}).json()
+        # La página termina en el primero de los dos eventos de las 09:00
+        self.assertEqual([e['id'] for e in datos['events']], [self.events[0].pk, self.events[1].pk])
+        siguiente = self.client.get(self.URL, {'limit': 2, 'cursor': datos['next_cursor']}).json()
+        self.assertEqual(siguiente['events'][0]['id'], self.events[2].pk)
+
+    def test_window_bounds(self):
+        ids, _ = self._pages(start=self._at(9).isoformat(), end=self._at(12).isoformat(), limit=2)
+        self.assertEqual(ids, [e.pk for e in self.events[1:4]])
+
+    def test_invalid_parameters_return_400(self):
+        for params in [{'cursor': 'no-es-un-cursor'}, {'limit': 0}, {'limit': 1001}, {'fields': 'user_id'}]:
+            self.assertEqual(self.client.get(self.URL, params).status_code, 400, params)
+
+
+class EventSyncTests(TestCase):
+    """Sincronización incremental: cambios y eliminaciones desde un cursor"""
+
+    URL = '/planner/events/changes/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('sync', password='clave-segura')
+        self.client.force_login(self.user)
+        inicio = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(9)))
+        self.events = [
+            Event.objects.create(user=self.user, title=f'Evento {k}', event_type='tarea',
+                                 start_time=inicio + timedelta(hours=2 * k),
+                                 end_time=inicio + timedelta(hours=2 * k + 1))
+            for k in range(3)
+        ]
+        # Sin el margen hacia atrás, la respuesta trae solo lo que cambió después del cursor
+        patcher = mock.patch('planner.event_sync.SYNC_OVERLAP', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cursor = current_sync_cursor()
+
+    def _changes(self, since, **params):
+        respuesta = self.client.get(self.URL, dict(params, since=since))
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_since_returns_only_updated_events(self):
+        self.assertEqual(self._changes(self.cursor)['events'], [])
+
+        evento = self.events[1]
+        evento.title = 'Evento movido'
+        evento.start_time += timedelta(days=1)
+        evento.end_time += timedelta(days=1)
+        evento.save()
+        datos = self._changes(self.cursor, fields='title,start_time')
+        self.assertFalse(datos['reset'])
+        self.assertEqual(len(datos['events']), 1)
+        cambio = datos['events'][0]
+        self.assertEqual((cambio['id'], cambio['title']), (evento.pk, 'Evento movido'))
+        self.assertEqual(datetime.fromisoformat(cambio['start_time']), evento.start_time)
+        self.assertEqual(self._changes(datos['cursor'])['events'], [])
+
+    def test_delete_creates_tombstone_in_next_delta(self):
+        evento = self.events[0]
+        respuesta = self.client.post(f'/planner/event/{evento.pk}/delete/')
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertTrue(EventTombstone.objects.filter(user=self.user, event_id=evento.pk).exists())
+
+        datos = self._changes(self.cursor)
+        self.assertEqual(datos['deleted'], [evento.pk])
+        self.assertEqual(datos['events'], [])
+        # Con el cursor de esa respuesta la eliminación ya no vuelve
+        self.assertEqual(self._changes(datos['cursor'])['deleted'], [])
+
+    def test_missing_old_or_invalid_cursor(self):
+        self.assertTrue(self.client.get(self.URL).json()['reset'])
+        viejo = encode_sync_cursor(timezone.now() - TOMBSTONE_RETENTION - timedelta(days=1))
+        self.assertTrue(self._changes(viejo)['reset'])
+        self.assertEqual(self.client.get(self.URL, {'since': 'no-es-un-cursor'}).status_code, 400)
+
+
+class CompiledModelEquivalenceTests(SimpleTestCase):
+    """La tabla compilada y el modelo plano dan lo mismo que el modelo de sklearn"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from planner.flat_model import FLAT_MODEL_DIR
+        from planner.lookup_table import LOOKUP_DIR, load_lookup_table
+        from planner.model_registry import DEFAULT_MODEL_PATH, MODEL_FILE
+
+        try:
+            import joblib
+        except ImportError:
+            raise unittest.SkipTest("joblib/sklearn no están instalados")
+        cls.model_file = os.path.join(DEFAULT_MODEL_PATH, MODEL_FILE)
+        lookup_dir = os.path.join(DEFAULT_MODEL_PATH, LOOKUP_DIR)
+        flat_dir = os.path.join(DEFAULT_MODEL_PATH, FLAT_MODEL_DIR)
+        if not all(os.path.exists(p) for p in (cls.model_file, lookup_dir, flat_dir)):
+            raise unittest.SkipTest("No hay modelo exportado en trained_models")
+        cls.model = joblib.load(cls.model_file)
+        cls.lookup, cls.lookup_meta = load_lookup_table(lookup_dir)
+        cls.flat_dir = flat_dir
+
+        rng = np.random.default_rng(5)
+        # Valores al azar dentro y fuera del rango de los umbrales, más los umbrales exactos
+        aleatorios = np.column_stack([
+            rng.uniform(umbrales.min() - 1, umbrales.max() + 1, 2000) for umbrales in cls.lookup.thresholds
+        ])
+        bordes = np.column_stack([rng.choice(umbrales, 500) for umbrales in cls.lookup.thresholds])
+        cls.X = np.vstack([aleatorios, bordes])
+
+    def _sklearn(self, metodo):
+        import warnings
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            return getattr(self.model, metodo)(self.X)
+
+    def test_lookup_table_matches_predict_proba(self):
+        np.testing.assert_allclose(self.lookup.predict_proba(self.X), self._sklearn('predict_proba'),
+                                   rtol=0, atol=1e-15)
+
+    def test_flat_model_matches_decision_function(self):
+        from planner.flat_model import load_flat_model
+
+        esperado = self._sklearn('decision_function')
+        flat = load_flat_model(self.flat_dir)
+        np.testing.assert_allclose(flat.decision_function(self.X), esperado, rtol=0, atol=1e-15)
+        # Sin vectores de bits se recorren los árboles nivel por nivel
+        flat._bitvectors = None
+        np.testing.assert_allclose(flat.decision_function(self.X), esperado, rtol=0, atol=1e-15)
+
+    def test_committed_lookup_table_belongs_to_the_model(self):
+        from planner.flat_model import file_sha256
+        self.assertEqual(self.lookup_meta['source_sha256'], file_sha256(self.model_file),
+                         "Regenera la tabla con: python manage.py export_scheduler_model")
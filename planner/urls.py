@@ -15,8 +15,13 @@ urlpatterns = [
    # Rutas AJAX
    path('event/<int:pk>/update-ajax/', views.event_update_ajax, name='event_update_ajax'),
    path('list-user-events/', views.list_user_events, name='list_user_events'),
+   path('events/changes/', views.event_changes, name='event_changes'),
    path('optimize/',    views.optimize_schedule, name='optimize_schedule'),
+   path('optimize/jobs/<uuid:job_id>/', views.optimization_job_status, name='optimization_job_status'),
+   path('optimize/stats/', views.optimizer_stats, name='optimizer_stats'),
    path('suggestions_template/', views.suggestions_template, name='suggestions_template'),
+   path('suggestions/<str:result_id>/modal/', views.suggestions_modal, name='suggestions_modal'),
+   path('suggestions/dismiss/', views.dismiss_suggestions, name='dismiss_suggestions'),
    
    # Tareas
    path('tareas/', views.tareas_view, name='tareas'),
@@ -26,5 +31,6 @@ urlpatterns = [
    path("productividad/", views.productividad_view, name="productividad"),
    path('registrar-bloque-temporizador/', views.registrar_bloque_temporizador, name='registrar_bloque_temporizador'),
    path("api/productividad/", views.productividad_api, name="productividad_api"),
+   path('api/productividad/slots/', views.productividad_slots_api, name='productividad_slots_api'),
    path('obtener-estadisticas-productividad/', views.obtener_estadisticas_productividad, name='obtener_estadisticas_productividad'),
 ]
@@ -0,0 +1,203 @@
+"""
+Modelos personalizados del SmartScheduleOptimizer por usuario.
+
+Cada usuario con suficiente historial puede tener su propio modelo en
+trained_models/users/<user_id>/ (mismos archivos que el modelo global, entrenado
+con train_scheduler --per-user). Además del clasificador, los metadatos guardan
+las horas de concentración del usuario ('focus_hours'), calculadas con la tasa de
+eventos completados por hora, que reemplazan a las 9-11 y 15-17 fijas del score.
+
+Los modelos por usuario son pequeños (pocos árboles, poca profundidad), se sirven
+con el motor NumPy y sin tabla compilada, y se guardan en una caché LRU del
+proceso con un límite de memoria (settings.SMART_SCHEDULER_USER_MODEL_CACHE_MB):
+al superarlo se descartan los menos usados. Los usuarios sin modelo propio usan
+el modelo global.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from planner.model_registry import DEFAULT_MODEL_PATH, METADATA_FILE, ModelRegistry
+
+USER_MODELS_DIR = 'users'
+DEFAULT_CACHE_MB = 64
+
+# Horas de concentración por defecto: (desde, hasta) incluidas, en horas decimales
+DEFAULT_FOCUS_HOURS = ((9, 11), (15, 17))
+# Eventos mínimos en una hora para considerarla, y horas de concentración como máximo
+FOCUS_MIN_SAMPLES = 3
+FOCUS_MAX_HOURS = 6
+
+# Modelos chicos: se cargan rápido y ocupan poca memoria aunque haya muchos usuarios
+USER_MODEL_PARAMS = {
+    'n_estimators': 60,
+    'max_depth': 3,
+}
+
+
+def user_model_path(user_id, model_path=None):
+    return os.path.join(model_path or DEFAULT_MODEL_PATH, USER_MODELS_DIR, str(int(user_id)))
+
+
+def has_user_model(user_id, model_path=None):
+    return os.path.exists(os.path.join(user_model_path(user_id, model_path), METADATA_FILE))
+
+
+def focus_hours_from_history(start_hours, labels):
+    """
+    Horas de concentración del usuario: las horas (con al menos FOCUS_MIN_SAMPLES
+    eventos) cuya tasa de completados supera la tasa general, hasta FOCUS_MAX_HOURS.
+    Las horas consecutivas se unen en rangos (desde, hasta) como DEFAULT_FOCUS_HOURS.
+    """
+    import numpy as np
+
+    horas = np.floor(np.asarray(start_hours, dtype=float)).astype(np.int64)
+    labels = np.asarray(labels, dtype=float)
+    if not len(horas):
+        return [list(rango) for rango in DEFAULT_FOCUS_HOURS]
+
+    conteo = np.bincount(horas, minlength=24)
+    completados = np.bincount(horas, weights=labels, minlength=24)
+    tasa = np.divide(completados, conteo, out=np.zeros(len(conteo)), where=conteo > 0)
+    candidatas = np.flatnonzero((conteo >= FOCUS_MIN_SAMPLES) & (tasa > labels.mean()))
+    if not len(candidatas):
+        return [list(rango) for rango in DEFAULT_FOCUS_HOURS]
+
+    elegidas = sorted(candidatas[np.argsort(-tasa[candidatas], kind='stable')][:FOCUS_MAX_HOURS])
+    rangos = []
+    for hora in elegidas:
+        if rangos and rangos[-1][1] == hora - 1:
+            rangos[-1][1] = int(hora)
+        else:
+            rangos.append([int(hora), int(hora)])
+    return rangos
+
+
+class UserModelCache:
+    """
+    Caché LRU de los modelos por usuario con un límite de memoria en bytes.
+
+    Cada entrada es un ModelRegistry de la carpeta del usuario, así un modelo
+    reentrenado se recarga igual que el global. La memoria de cada entrada se
+    estima con ModelArtifacts.nbytes al cargarla.
+    """
+
+    def __init__(self, model_path=None, max_bytes=None):
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        if max_bytes is None:
+            max_bytes = int(getattr(settings, 'SMART_SCHEDULER_USER_MODEL_CACHE_MB', DEFAULT_CACHE_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Consultas de usuarios sin modelo propio: no son fallos de la caché
+        self.no_model = 0
+        self.fallbacks = 0
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+        self.load_seconds_max = 0.0
+
+    def get(self, user_id):
+        """Artefactos del modelo del usuario, o None si no tiene (se usa el global)"""
+        with self._lock:
+            entrada = self._entries.get(user_id)
+            if entrada is not None:
+                self._entries.move_to_end(user_id)
+
+        if entrada is not None:
+            registry, artifacts, _ = entrada
+            if registry.get() is artifacts:
+                with self._lock:
+                    self.hits += 1
+                return artifacts
+            # El modelo se reentrenó o se eliminó: se carga de nuevo y se vuelve a medir
+            with self._lock:
+                self._descartar(user_id)
+
+        if not has_user_model(user_id, self.model_path):
+            with self._lock:
+                self.no_model += 1
+            return None
+
+        with self._lock:
+            self.misses += 1
+        registry = ModelRegistry(user_model_path(user_id, self.model_path), compiled=False)
+        inicio = time.perf_counter()
+        artifacts = registry.get()
+        segundos = time.perf_counter() - inicio
+        if artifacts is None:
+            # El modelo existe pero no se pudo cargar: se usa el global
+            with self._lock:
+                self.fallbacks += 1
+            return None
+
+        tamano = artifacts.nbytes
+        with self._lock:
+            self.load_seconds_total += segundos
+            self.load_seconds_max = max(self.load_seconds_max, segundos)
+            self._descartar(user_id)
+            if tamano <= self.max_bytes:
+                self._entries[user_id] = (registry, artifacts, tamano)
+                self.bytes += tamano
+            # Si no entra en la caché se usa solo para esta petición
+            while self.bytes > self.max_bytes:
+                _, (_, _, tamano_viejo) = self._entries.popitem(last=False)
+                self.bytes -= tamano_viejo
+                self.evictions += 1
+        return artifacts
+
+    def _descartar(self, user_id):
+        entrada = self._entries.pop(user_id, None)
+        if entrada is not None:
+            self.bytes -= entrada[2]
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                self._descartar(user_id)
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / consultas if consultas else None,
+                'no_model': self.no_model,
+                'fallbacks': self.fallbacks,
+                'evictions': self.evictions,
+                'load_seconds_total': self.load_seconds_total,
+                'load_seconds_max': self.load_seconds_max,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_user_model_cache():
+    """Caché compartida del proceso"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = UserModelCache()
+    return _cache
+
+
+def get_user_artifacts(user_id):
+    """Artefactos del modelo propio del usuario si los modelos por usuario están activos"""
+    if user_id is None or not getattr(settings, 'SMART_SCHEDULER_USER_MODELS', False):
+        return None
+    return get_user_model_cache().get(user_id)
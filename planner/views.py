@@ -5,18 +5,30 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from datetime import datetime, time, timedelta, date
 from django.utils import timezone
-from planner.ai_optimizer import SmartScheduleOptimizer
 from django.views.decorators.http import require_POST
-from .models import Event
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from .models import Event, OptimizationJob
+from .optimization import compute_schedule_suggestions, summarize_suggestions
+from .jobs import enqueue_optimization, expire_stale_jobs, get_stored_result, store_result
+from .feedback import feedback_row, record_feedback
 from .forms import EventForm
 from django.http import HttpResponse, JsonResponse
-from django.views.decorators.http import require_GET
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
 import json
 import pytz
 from core.models import UserSettings
 from .models import BloqueEstudio
 from .ia_generador import generar_bloques_enfocados_semana
+from .calendar_cache import get_week_fragment, set_week_fragment, week_fragment_key
+from .event_api import EventQuery, EventQueryError, parse_fields
+from .event_sync import changes_since, current_sync_cursor
+from .date_windows import date_window, day_bounds
+from .recurrence import window_events
+from .week_layout import layout_week
+from django.utils.safestring import mark_safe
 
 def get_productividad_hoy(usuario):
     hoy = date.today()
@@ -27,7 +39,7 @@ def get_productividad_hoy(usuario):
     )
     eventos = Event.objects.filter(
         user=usuario,
-        start_time__date=hoy,
+        **date_window(hoy),
         is_completed=True,
         event_type__in=['tarea', 'clase']
     )
@@ -66,8 +78,6 @@ def calendar_view(request):
     today = timezone.now().date()
     start_of_week = base_date - timedelta(days=base_date.weekday())
     end_of_week = start_of_week + timedelta(days=6)
-    start_of_week_dt = user_tz.localize(datetime.combine(start_of_week, datetime.min.time()))
-    end_of_week_dt = user_tz.localize(datetime.combine(end_of_week, datetime.max.time()))
     day_names_es = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
     week_days_data = []
     for i in range(7):
@@ -79,46 +89,18 @@ def calendar_view(request):
             'day_name_short': day_names_es[current_day.weekday()][:3],
             'is_today': is_today,
         })
-    user_events = Event.objects.filter(
-        user=request.user,
-        start_time__gte=start_of_week_dt,
-        start_time__lte=end_of_week_dt
-    ).order_by('start_time')
-    for event in user_events:
-        event.start_time = event.start_time.astimezone(user_tz)
-        event.end_time = event.end_time.astimezone(user_tz)
-        if event.due_date:
-            pass
-    CALENDAR_START_HOUR = 0
-    CALENDAR_END_HOUR = 23
-    events_by_day = {i: {f"{h:02d}:00": [] for h in range(CALENDAR_START_HOUR, CALENDAR_END_HOUR + 1)} for i in range(7)}
-    for event in user_events:
-        start_time_local = event.start_time
-        end_time_local = event.end_time
-        weekday = start_time_local.weekday()
-        css_class_type = f"event-{event.event_type}"
-        current_time = start_time_local.replace(minute=0, second=0, microsecond=0)
-        end_time_ceiled = end_time_local.replace(minute=0, second=0, microsecond=0)
-        if end_time_local > end_time_ceiled:
-            end_time_ceiled += timedelta(hours=1)
-        is_first_slot = True
-        while current_time < end_time_ceiled and current_time.date() == start_time_local.date():
-            hour_slot = current_time.strftime("%H:00")
-            events_by_day[weekday][hour_slot].append({
-                'id': event.pk,
-                'title': event.title,
-                'description': event.description,
-                'start_time': start_time_local,
-                'end_time': end_time_local,
-                'event_type': event.event_type,
-                'is_completed': event.is_completed,
-                'priority': event.priority,
-                'due_date': event.due_date,
-                'css_class': css_class_type,
-                'is_continuation': not is_first_slot,
-            })
-            current_time += timedelta(hours=1)
-            is_first_slot = False
+    # La rejilla se renderiza solo si cambió la semana (ver planner/calendar_cache.py)
+    week_bounds = day_bounds(start_of_week, end_of_week, user_tz)
+    grid_key = week_fragment_key(request.user.pk, start_of_week, week_bounds, user_tz.zone, today)
+    week_grid = get_week_fragment(grid_key)
+    if week_grid is None:
+        user_events = window_events(Event.objects.filter(user=request.user), *week_bounds)
+        _, rows = layout_week(user_events, start_of_week, user_tz, today)
+        week_grid = render_to_string('week_grid.html', {'rows': rows, 'today': today})
+        set_week_fragment(grid_key, week_grid)
+    if request.GET.get('fragment') == 'grid':
+        # Solo la rejilla, para actualizarla después de sincronizar cambios (calendar.js)
+        return HttpResponse(week_grid)
     months_es = {
         'January': 'enero',
         'February': 'febrero',
@@ -140,8 +122,8 @@ def calendar_view(request):
         'start_of_week': start_of_week,
         'end_of_week': end_of_week,
         'week_days_data': week_days_data,
-        'events_by_day': events_by_day,
-        'time_slots': [f"{h:02d}:00" for h in range(CALENDAR_START_HOUR, CALENDAR_END_HOUR + 1)],
+        'week_grid': mark_safe(week_grid),
+        'sync_cursor': current_sync_cursor(),
         'current_month_name': month_name_es,
         'current_week_range': f"{start_of_week.day:02d}-{end_of_week.day:02d} de {month_name_es} de {start_of_week.year}",
     }
@@ -159,7 +141,16 @@ def event_update_ajax(request, pk):
             end_time_str = data['end_time'].replace('Z', '+00:00')
             event.start_time = datetime.fromisoformat(start_time_str)
             event.end_time = datetime.fromisoformat(end_time_str)
-            event.save()
+            if event.end_time <= event.start_time:
+                return JsonResponse({'success': False, 'error': 'La hora de fin debe ser posterior a la hora de inicio'}, status=400)
+            try:
+                with transaction.atomic():
+                    event.save()
+            except IntegrityError:
+                # Con event_overlap_constraint activo la base de datos rechaza los cruces
+                return JsonResponse({'success': False, 'error': 'El horario se cruza con otro evento'}, status=409)
+            if data.get('from_suggestion'):
+                record_feedback([feedback_row(event, event.start_time, accepted=True)])
             return JsonResponse({'success': True})
         except json.JSONDecodeError:
             return JsonResponse({'success': False, 'error': 'Datos JSON inválidos'}, status=400)
@@ -167,20 +158,59 @@ def event_update_ajax(request, pk):
             return JsonResponse({'success': False, 'error': str(e)}, status=500)
     return JsonResponse({'error': 'Método no permitido'}, status=405)
 
+@login_required
+@require_POST
+def dismiss_suggestions(request):
+    """Registra como descartadas las sugerencias que el usuario no aplicó"""
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        sugeridos = {}
+        for item in data.get('suggestions', []):
+            inicio = datetime.fromisoformat(item['suggested_time_iso'].replace('Z', '+00:00'))
+            sugeridos[int(item['event_id'])] = inicio
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Datos JSON inválidos'}, status=400)
+
+    events = Event.objects.filter(user=request.user, pk__in=sugeridos)
+    record_feedback(feedback_row(event, sugeridos[event.pk], accepted=False) for event in events)
+    return JsonResponse({'success': True})
+
+def _events_etag(request):
+    try:
+        return EventQuery(request.GET).etag(request.user)
+    except EventQueryError:
+        return None
+
 @login_required
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_events_etag)
 def list_user_events(request):
-    events = Event.objects.filter(user=request.user).order_by('start_time')
-    events_data = []
-    for event in events:
-        events_data.append({
-            'id': event.id,
-            'title': event.title,
-            'start_time': event.start_time.isoformat(),
-            'end_time': event.end_time.isoformat(),
-            'is_completed': event.is_completed,
-        })
-    return JsonResponse({'events': events_data})
+    """
+    Eventos del usuario en formato JSON. Parámetros opcionales: start y end (ventana
+    sobre start_time), limit, cursor (next_cursor de la página anterior) y fields
+    (campos separados por coma). Responde 304 si el ETag enviado sigue vigente.
+    """
+    try:
+        query = EventQuery(request.GET)
+    except EventQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    events, next_cursor = query.page(request.user)
+    return JsonResponse({'events': events, 'next_cursor': next_cursor})
+
+@login_required
+@require_GET
+def event_changes(request):
+    """
+    Eventos creados o modificados e ids eliminados desde el cursor `since` (ver
+    planner/event_sync.py). Sin cursor, o con uno vencido, responde reset=True.
+    """
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        changes = changes_since(request.user, request.GET.get('since'), fields)
+    except EventQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(changes)
 
 @login_required
 def event_create(request):
@@ -236,16 +266,30 @@ def event_detail(request, pk):
     event = get_object_or_404(Event, pk=pk, user=request.user)
     return render(request, 'pages/horarios/event_detail.html', {'event': event})
 
+def _occurrence_start(event):
+    """Inicio original de una ocurrencia generada (ISO), o '' si es un evento normal"""
+    inicio = getattr(event, 'occurrence_start', None)
+    return inicio.isoformat() if inicio else ''
+
 @login_required
 def toggle_event_completion(request, pk):
     if request.method == 'POST':
         try:
             event = get_object_or_404(Event, pk=pk, user=request.user)
+            try:
+                data = json.loads(request.body.decode('utf-8') or '{}')
+            except json.JSONDecodeError:
+                data = {}
+            occurrence = data.get('occurrence')
+            if occurrence and event.is_recurring:
+                # Solo cambia esa ocurrencia: pasa a ser un evento propio de la serie
+                event = event.detach_occurrence(datetime.fromisoformat(occurrence.replace('Z', '+00:00')))
             event.is_completed = not event.is_completed
             event.save()
             print(f"Evento {event.pk} actualizado. Completado: {event.is_completed}")
             return JsonResponse({
                 'success': True,
+                'event_id': event.pk,
                 'is_completed': event.is_completed,
                 'message': 'Completado' if event.is_completed else 'Pendiente'
             })
@@ -262,11 +306,7 @@ def tareas_view(request):
     today = timezone.localdate()
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=6)
-    user_events = Event.objects.filter(
-        user=request.user,
-        start_time__date__gte=start_of_week,
-        start_time__date__lte=end_of_week
-    ).order_by('start_time')
+    user_events = window_events(Event.objects.filter(user=request.user), *day_bounds(start_of_week, end_of_week))
     day_names_es = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
     events_by_day = {i: [] for i in range(7)}
     def extract_subject_from_title(title):
@@ -306,6 +346,7 @@ def tareas_view(request):
             'due_date': event.due_date,
             'css_class': f"event-{event.event_type}",
             'subject': subject,
+            'occurrence_start': _occurrence_start(event),
         })
     week_days_data = []
     for i in range(7):
@@ -344,96 +385,59 @@ def tareas_view(request):
     }
     return render(request, 'tareas.html', context)
 
+def _wants(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def _present_result(request, result, result_id, render_html=False, detail=False):
+    """
+    Respuesta de una optimización para el cliente: con render_html se devuelve el
+    modal ya renderizado en lugar de la lista; si no, las sugerencias con
+    todas_opciones resumido (top-k) salvo que se pida el detalle.
+    """
+    suggestions = result.get('suggestions') or []
+    response = {key: value for key, value in result.items() if key != 'suggestions'}
+    response['count'] = len(suggestions)
+    if suggestions:
+        response['result_id'] = result_id
+    if render_html:
+        if suggestions:
+            response['html'] = _render_suggestions_modal(request, result, detail)
+        return response
+    response['suggestions'] = suggestions if detail else summarize_suggestions(result)['suggestions']
+    return response
+
+
+def _render_suggestions_modal(request, result, detail=False):
+    if not detail:
+        result = summarize_suggestions(result)
+    return render_to_string('suggestions_modal.html', {'suggestions': result.get('suggestions', [])}, request=request)
+
+
 @csrf_exempt
 @login_required
+@transaction.non_atomic_requests
 def optimize_schedule(request):
     if request.method == 'POST':
         try:
-            optimizer = SmartScheduleOptimizer()
-            if not optimizer.is_loaded:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'El modelo de IA no está disponible. Verifica que los archivos del modelo estén en la carpeta trained_models.'
-                })
-            today = timezone.localdate()
-            start_date = today
-            end_date = today + timedelta(days=7)
-            user_events = Event.objects.filter(
-                user=request.user,
-                start_time__date__gte=start_date,
-                start_time__date__lte=end_date,
-                is_completed=False
-            )
-            if not user_events.exists():
-                return JsonResponse({
-                    'success': True,
-                    'suggestions': [],
-                    'message': 'No hay eventos pendientes para optimizar en los próximos 7 días.'
-                })
-            if user_events.count() < 4:
+            try:
+                data = json.loads(request.body.decode('utf-8') or '{}')
+            except json.JSONDecodeError:
+                data = {}
+            if data.get('async'):
+                # Modo trabajo: se encola y se responde de inmediato con el id para consultar
+                job = enqueue_optimization(request.user)
                 return JsonResponse({
                     'success': True,
-                    'suggestions': [],
-                    'message': 'Se necesitan al menos 4 tareas programadas para generar sugerencias de optimización precisas.',
-                    'insufficient_tasks': True,
-                    'current_tasks': user_events.count()
-                })
-            suggestions = []
-            for event in user_events:
-                other_events = user_events.exclude(pk=event.pk)
-                event_data = {
-                    'event_type': optimizer._map_django_event_type(event.event_type),
-                    'priority': optimizer._map_django_priority(event.priority),
-                    'duration': optimizer._calculate_duration(event.start_time, event.end_time),
-                    'weekday': event.start_time.weekday(),
-                    'due_date': event.due_date,
-                    'start_date': start_date
-                }
-                prediction = optimizer.predict_best_schedule(event_data, other_events)
-                current_date = event.start_time.date()
-                suggested_datetime = datetime.combine(
-                    current_date, 
-                    datetime.min.time().replace(hour=prediction['mejor_hora'])
-                )
-                suggested_end_datetime = suggested_datetime + timedelta(hours=event_data['duration'])
-                has_conflict = False
-                for existing_suggestion in suggestions:
-                    existing_start = datetime.fromisoformat(existing_suggestion['suggested_time_iso'])
-                    existing_end = datetime.fromisoformat(existing_suggestion['suggested_end_time_iso'])
-                    if (suggested_datetime <= existing_end and 
-                        suggested_end_datetime >= existing_start and
-                        existing_start.date() == suggested_datetime.date()):
-                        has_conflict = True
-                        break
-                if (suggested_datetime.hour != event.start_time.hour and 
-                    prediction.get('disponible', True) and 
-                    not has_conflict):
-                    suggestions.append({
-                        'event_id': event.id,
-                        'title': event.title,
-                        'current_time': event.start_time.strftime('%H:%M'),
-                        'suggested_time': suggested_datetime.strftime('%H:%M'),
-                        'suggested_end_time': suggested_end_datetime.strftime('%H:%M'),
-                        'current_time_iso': event.start_time.isoformat(),
-                        'suggested_time_iso': suggested_datetime.isoformat(),
-                        'suggested_end_time_iso': suggested_end_datetime.isoformat(),
-                        'improvement_score': round((prediction['score'] - 0.5) * 100, 1),
-                        'confianza': round(prediction['confianza'] * 100),
-                        'mejor_hora': prediction['mejor_hora'],
-                        'todas_opciones': prediction['todas_opciones'],
-                        'reason': optimizer._generate_reason(event_data, prediction)
-                    })
-            if not suggestions:
-                return JsonResponse({
-                    'success': True,
-                    'suggestions': [],
-                    'message': 'Tu horario ya está optimizado. No se encontraron mejoras significativas.'
-                })
-            return JsonResponse({
-                'success': True,
-                'suggestions': suggestions,
-                'message': f'Se encontraron {len(suggestions)} sugerencias de optimización.'
-            })
+                    'job_id': str(job.pk),
+                    'status': job.status,
+                    'status_url': reverse('planner:optimization_job_status', args=[job.pk]),
+                }, status=202)
+            result = compute_schedule_suggestions(request.user)
+            result_id = store_result(request.user, result) if result.get('suggestions') else None
+            return JsonResponse(_present_result(
+                request, result, result_id, _wants(data.get('render')), _wants(data.get('detail'))
+            ))
         except Exception as e:
             print(f"Error en optimización: {str(e)}")
             return JsonResponse({
@@ -442,15 +446,65 @@ def optimize_schedule(request):
             })
     return JsonResponse({'success': False, 'message': 'Método no permitido'})
 
+@login_required
+@require_GET
+@transaction.non_atomic_requests
+def optimization_job_status(request, job_id):
+    expire_stale_jobs(request.user)
+    job = get_object_or_404(OptimizationJob, pk=job_id, user=request.user)
+    response = {
+        'success': True,
+        'job_id': str(job.pk),
+        'status': job.status,
+    }
+    if job.status == 'done':
+        # El trabajo guarda el resultado completo: su id sirve para renderizar el modal
+        response.update(_present_result(
+            request, job.result or {}, str(job.pk),
+            _wants(request.GET.get('render')), _wants(request.GET.get('detail')),
+        ))
+    elif job.status == 'failed':
+        response.update({
+            'success': False,
+            'message': f'Error al optimizar el horario: {job.error}'
+        })
+    return JsonResponse(response)
+
+@login_required
+@require_GET
+def optimizer_stats(request):
+    """Estado del modelo global y de la caché de modelos por usuario (solo staff)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    from .model_registry import get_model_registry
+    from .user_models import get_user_model_cache
+    return JsonResponse({
+        'global_model': get_model_registry().stats(),
+        'user_models': get_user_model_cache().stats(),
+    })
+
+@login_required
+@require_GET
+def suggestions_modal(request, result_id):
+    """Modal de sugerencias renderizado a partir de un resultado guardado (?detail=1 para todas las opciones)"""
+    result = get_stored_result(request.user, result_id)
+    if result is None:
+        return HttpResponse('Las sugerencias expiraron, vuelve a optimizar el horario.', status=410)
+    return HttpResponse(_render_suggestions_modal(request, result, _wants(request.GET.get('detail'))))
+
 @login_required
 @require_POST
 def suggestions_template(request):
+    """Compatibilidad: renderiza el modal con la lista enviada o, mejor, con un result_id"""
     try:
         data = json.loads(request.body.decode('utf-8'))
-        suggestions = data.get('suggestions', [])
-        print(f"Sugerencias recibidas: {suggestions}")
+        if data.get('result_id'):
+            result = get_stored_result(request.user, data['result_id'])
+            if result is None:
+                return HttpResponse('Las sugerencias expiraron, vuelve a optimizar el horario.', status=410)
+            return HttpResponse(_render_suggestions_modal(request, result, _wants(data.get('detail'))))
         return render(request, 'suggestions_modal.html', {
-            'suggestions': suggestions
+            'suggestions': data.get('suggestions', [])
         })
     except json.JSONDecodeError as e:
         print(f"Error JSON: {e}")
@@ -515,9 +569,9 @@ def productividad_view(request):
     )
     eventos_completados = Event.objects.filter(
         user=usuario,
-        start_time__date__range=(inicio_semana, fin_semana),
         is_completed=True,
-        event_type__in=['tarea', 'clase']
+        event_type__in=['tarea', 'clase'],
+        **date_window(inicio_semana, fin_semana)
     ).order_by('start_time')
     print(f"🔍 Debug - Usuario: {usuario}")
     print(f"🔍 Debug - Fecha hoy: {hoy}")
@@ -715,9 +769,9 @@ def productividad_api(request):
     )
     eventos = Event.objects.filter(
         user=usuario,
-        start_time__date__range=(inicio_semana, fin_semana),
         is_completed=True,
-        event_type__in=['tarea', 'clase']
+        event_type__in=['tarea', 'clase'],
+        **date_window(inicio_semana, fin_semana)
     )
     productividad_dias = [0] * 7
     meta_diaria = 120
@@ -751,3 +805,29 @@ def productividad_api(request):
         "minutos_hoy": minutos_hoy,
         "meta_diaria": meta_diaria
     })
+
+@login_required
+@require_GET
+def productividad_slots_api(request):
+    """
+    Inicios libres de los próximos días con la productividad estimada por el modelo
+    de productividad, calculados con una sola predicción.
+    Parámetros: duracion (minutos, 25), dias (7, máximo 14) y limite (los mejores N).
+    """
+    from .productivity import score_free_slots
+    try:
+        duracion = int(request.GET.get('duracion', 25))
+        dias = min(int(request.GET.get('dias', 7)), 14)
+        limite = int(request.GET['limite']) if request.GET.get('limite') else None
+        if duracion <= 0 or dias <= 0 or (limite is not None and limite <= 0):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros inválidos'}, status=400)
+
+    hoy = timezone.localdate()
+    slots = score_free_slots(request.user, hoy, hoy + timedelta(days=dias - 1), duracion)
+    if slots is None:
+        return JsonResponse({'success': False, 'error': 'El modelo de productividad no está disponible'}, status=503)
+    if limite is not None:
+        slots = sorted(slots, key=lambda s: s['productividad'], reverse=True)[:limite]
+    return JsonResponse({'success': True, 'duracion': duracion, 'slots': slots})
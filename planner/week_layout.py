@@ -0,0 +1,107 @@
+"""
+Distribución de los eventos en la rejilla semanal de calendar_view.
+
+Cada evento se ubica una sola vez: columna (día de la semana), fila de inicio
+(hora), cantidad de filas que ocupa en su día y carril dentro de su grupo de
+eventos que se cruzan. La rejilla de 24 x 7 celdas solo guarda referencias a
+esos diccionarios, así la plantilla la recorre fila por fila sin buscar cada
+celda en un diccionario.
+"""
+from datetime import timedelta
+
+CALENDAR_START_HOUR = 0
+CALENDAR_END_HOUR = 23
+
+
+def _layout_event(event, start_of_week, tz):
+    inicio = event.start_time.astimezone(tz)
+    fin = event.end_time.astimezone(tz)
+    fila = inicio.hour - CALENDAR_START_HOUR
+    # Hasta la hora en que termina (redondeada hacia arriba), sin pasar al día siguiente
+    fin_redondeado = fin.replace(minute=0, second=0, microsecond=0)
+    if fin > fin_redondeado:
+        fin_redondeado += timedelta(hours=1)
+    if fin_redondeado.date() > inicio.date():
+        ultima_fila = CALENDAR_END_HOUR - CALENDAR_START_HOUR + 1
+    else:
+        ultima_fila = fin_redondeado.hour - CALENDAR_START_HOUR
+    return {
+        'id': event.pk,
+        'title': event.title,
+        'description': event.description,
+        'start_time': inicio,
+        'end_time': fin,
+        'event_type': event.event_type,
+        'is_completed': event.is_completed,
+        'priority': event.priority,
+        'due_date': event.due_date,
+        # Inicio original si es una ocurrencia generada de una serie
+        'occurrence_start': getattr(event, 'occurrence_start', None),
+        'css_class': f"event-{event.event_type}",
+        'day': (inicio.date() - start_of_week).days,
+        'row': fila,
+        'row_span': max(1, ultima_fila - fila),
+        'lane': 0,
+        'lanes': 1,
+    }
+
+
+def _assign_lanes(eventos_dia):
+    """
+    Carril de cada evento de un día: el primero libre cuando empieza. Los eventos
+    que se cruzan forman un grupo y todos comparten la cantidad de carriles del grupo.
+    """
+    eventos_dia.sort(key=lambda e: (e['row'], -e['row_span'], e['start_time']))
+    grupo, fin_grupo, fin_carriles = [], -1, []
+    for evento in eventos_dia + [None]:
+        if evento is None or evento['row'] >= fin_grupo:
+            for miembro in grupo:
+                miembro['lanes'] = len(fin_carriles)
+            if evento is None:
+                break
+            grupo, fin_carriles = [], []
+        carril = next((i for i, fin in enumerate(fin_carriles) if fin <= evento['row']), len(fin_carriles))
+        fin_evento = evento['row'] + evento['row_span']
+        if carril == len(fin_carriles):
+            fin_carriles.append(fin_evento)
+        else:
+            fin_carriles[carril] = fin_evento
+        evento['lane'] = carril
+        grupo.append(evento)
+        fin_grupo = max(fin_grupo, fin_evento)
+
+
+def layout_week(events, start_of_week, tz, today=None):
+    """
+    Devuelve (eventos, filas): los eventos ubicados y las filas de la rejilla,
+    cada una con su etiqueta de hora y 7 celdas. Cada celda lista sus entradas
+    ordenadas por carril como {'event': ..., 'is_continuation': ...}.
+    """
+    eventos = [_layout_event(event, start_of_week, tz) for event in events]
+    eventos = [e for e in eventos if 0 <= e['day'] < 7]
+
+    por_dia = [[] for _ in range(7)]
+    for evento in eventos:
+        por_dia[evento['day']].append(evento)
+    for eventos_dia in por_dia:
+        _assign_lanes(eventos_dia)
+
+    n_filas = CALENDAR_END_HOUR - CALENDAR_START_HOUR + 1
+    celdas = [[[] for _ in range(7)] for _ in range(n_filas)]
+    for eventos_dia in por_dia:
+        for evento in sorted(eventos_dia, key=lambda e: e['lane']):
+            for fila in range(evento['row'], min(n_filas, evento['row'] + evento['row_span'])):
+                celdas[fila][evento['day']].append({'event': evento, 'is_continuation': fila != evento['row']})
+
+    es_hoy = [start_of_week + timedelta(days=d) == today for d in range(7)]
+    filas = [
+        {
+            'hour_slot': f"{CALENDAR_START_HOUR + i:02d}:00",
+            'cells': [
+                {'day': d, 'is_today': es_hoy[d], 'entries': celdas[i][d]}
+                for d in range(7)
+            ],
+        }
+        for i in range(n_filas)
+    ]
+    return eventos, filas